@@ -0,0 +1,179 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from aiogram import Router
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# ========== ТИПИЗИРОВАННЫЕ CALLBACK DATA ==========
+# Формат строк совпадает со старыми ("city_Sochi", "sub_Студии", "cap:42:17"),
+# поэтому кнопки в уже отправленных сообщениях продолжают работать.
+
+class CityCallback(CallbackData, prefix="city", sep="_"):
+    """Выбор города: код города из catalog.cities"""
+    code: str
+
+class SubcategoryCallback(CallbackData, prefix="s", sep="_"):
+    """Выбор подкатегории недвижимости по короткому ID из catalog ("s_h")"""
+    id: str
+
+class LegacySubcategoryCallback(CallbackData, prefix="sub", sep="_"):
+    """Старый формат кнопок подкатегорий - по названию ("sub_Студии")"""
+    name: str
+
+class MoreCallback(CallbackData, prefix="more", sep="_"):
+    """Кнопка "Показать ещё": токен сохраненной выдачи и сдвиг следующей страницы"""
+    token: str
+    offset: int
+
+class WatchCallback(CallbackData, prefix="watch", sep="_"):
+    """Подписка на новые объекты по сохраненной выдаче"""
+    token: str
+
+class UnwatchCallback(CallbackData, prefix="unwatch", sep="_"):
+    """Отмена подписки по ее ID"""
+    id: int
+
+class CaptchaCallback(CallbackData, prefix="cap"):
+    """Ответ на капчу: для какого пользователя и какой вариант выбран"""
+    user_id: int
+    answer: int
+
+# ========== ТАБЛИЦА МАРШРУТОВ ==========
+
+# Разделители, после которых может заканчиваться префикс callback_data
+PREFIX_SEPARATORS = "_:"
+
+class Route:
+    """Обработчик из таблицы и параметры, которые он принимает"""
+
+    __slots__ = ('handler', 'name', 'params', 'accepts_all', 'callback_data')
+
+    def __init__(self, handler: Callable, callback_data: Optional[Type[CallbackData]] = None):
+        code = handler.__code__
+        self.handler = handler
+        self.name = f"{handler.__module__}.{handler.__name__}"
+        # Первый аргумент - сам CallbackQuery
+        self.params = code.co_varnames[1:code.co_argcount + code.co_kwonlyargcount]
+        self.accepts_all = bool(code.co_flags & 0x08)  # есть **kwargs
+        self.callback_data = callback_data
+
+class CallbackTable:
+    """
+    Маршрутизация callback-запросов роутера по словарю
+
+    Вместо десятков фильтров F.data == "..." / F.data.startswith("..."),
+    которые aiogram проверяет по очереди, на роутере регистрируется один
+    хендлер. Его фильтр находит обработчик по точному значению
+    callback_data, а если такого нет - по самому длинному префиксу,
+    заканчивающемуся на "_" или ":". Если маршрут не найден, апдейт
+    идет дальше к обычным хендлерам роутера (например, с фильтром по
+    состоянию FSM).
+    """
+
+    def __init__(self, router: Router):
+        self.router = router
+        self.exact_routes: Dict[str, Route] = {}
+        self.prefix_routes: Dict[str, Route] = {}
+        # Порядок регистрации - для бенчмарка маршрутизации
+        self.registrations: List[Tuple[str, str]] = []
+        router.callback_query.register(self._dispatch, self._match)
+
+    def _add(self, routes: Dict[str, Route], kind: str, key: str, route: Route):
+        """Добавляет маршрут; как и в aiogram, побеждает первый зарегистрированный"""
+        if key in routes:
+            logger.warning(f"Маршрут {key!r} уже занят {routes[key].name}, {route.name} не будет вызван")
+            return
+        routes[key] = route
+        self.registrations.append((kind, key))
+
+    def exact(self, value: str):
+        """Обработчик для callback_data, равного value"""
+        def decorator(handler: Callable) -> Callable:
+            self._add(self.exact_routes, 'exact', value, Route(handler))
+            return handler
+        return decorator
+
+    def prefix(self, prefix: str):
+        """Обработчик для callback_data, начинающегося с prefix (заканчивается на "_" или ":")"""
+        if not prefix or prefix[-1] not in PREFIX_SEPARATORS:
+            raise ValueError(f"Префикс должен заканчиваться на один из символов {PREFIX_SEPARATORS!r}: {prefix!r}")
+
+        def decorator(handler: Callable) -> Callable:
+            self._add(self.prefix_routes, 'prefix', prefix, Route(handler))
+            return handler
+        return decorator
+
+    def data(self, factory: Type[CallbackData]):
+        """Обработчик для CallbackData; распакованный объект передается как callback_data"""
+        prefix = factory.__prefix__ + factory.__separator__
+
+        def decorator(handler: Callable) -> Callable:
+            self._add(self.prefix_routes, 'prefix', prefix, Route(handler, factory))
+            return handler
+        return decorator
+
+    def resolve(self, data: Optional[str]) -> Optional[Route]:
+        """
+        Находит обработчик для callback_data
+
+        Сначала точное совпадение, затем префиксы от длинного к короткому.
+        Число проверок ограничено количеством разделителей в строке.
+        """
+        if data is None:
+            return None
+
+        route = self.exact_routes.get(data)
+        if route is not None:
+            return route
+
+        for index in range(len(data) - 1, -1, -1):
+            if data[index] in PREFIX_SEPARATORS:
+                route = self.prefix_routes.get(data[:index + 1])
+                if route is not None:
+                    return route
+
+        return None
+
+    async def _match(self, call: CallbackQuery):
+        """Фильтр: найден ли маршрут (и разбор CallbackData)"""
+        route = self.resolve(call.data)
+        if route is None:
+            return False
+
+        result = {'callback_route': route}
+        if route.callback_data is not None:
+            try:
+                result['callback_data'] = route.callback_data.unpack(call.data)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Неверный формат callback_data {call.data!r}: {e}")
+                return False
+        return result
+
+    async def _dispatch(self, call: CallbackQuery, callback_route: Route, **data: Any):
+        """Вызывает найденный обработчик с нужными ему аргументами"""
+        span = data.get('metrics_span')
+        if span is not None:
+            span['handler'] = callback_route.name
+
+        if callback_route.accepts_all:
+            kwargs = data
+        else:
+            kwargs = {name: data[name] for name in callback_route.params if name in data}
+
+        return await callback_route.handler(call, **kwargs)
+
+# Экспорт
+__all__ = [
+    'CallbackTable',
+    'CityCallback',
+    'SubcategoryCallback',
+    'LegacySubcategoryCallback',
+    'MoreCallback',
+    'WatchCallback',
+    'UnwatchCallback',
+    'CaptchaCallback'
+]
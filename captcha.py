@@ -7,6 +7,7 @@ from aiogram.fsm.storage.base import StorageKey
 
 from keyboards import get_main_bot_keyboard, make_captcha_kb
 from config import save_captcha, check_answer, save_user_city, get_user_city
+from callbacks import CallbackTable, CaptchaCallback
 import random
 from datetime import datetime, timedelta
 import logging
@@ -18,6 +19,9 @@ logger = logging.getLogger(__name__)
 # Создаем роутер для капчи
 start_router = Router()
 
+# Таблица маршрутов callback-запросов роутера
+start_callbacks = CallbackTable(start_router)
+
 # Состояния FSM
 class CaptchaStates(StatesGroup):
     waiting_for_captcha = State()
@@ -240,8 +244,8 @@ async def cmd_start(message: Message, state: FSMContext):
             reply_markup=None
         )
 
-@start_router.callback_query(F.data.startswith("cap:"))
-async def process_captcha(callback: CallbackQuery, state: FSMContext):
+@start_callbacks.data(CaptchaCallback)
+async def process_captcha(callback: CallbackQuery, state: FSMContext, callback_data: CaptchaCallback):
     """
     Обработчик нажатия на кнопку капчи
     
@@ -254,15 +258,9 @@ async def process_captcha(callback: CallbackQuery, state: FSMContext):
     logger.info(f"Пользователь {username} (ID: {user_id}) ответил на капчу")
     
     try:
-        # Парсим callback_data: "cap:user_id:answer"
-        parts = callback.data.split(":")
-        if len(parts) != 3:
-            await callback.answer("❌ Ошибка в данных капчи", show_alert=True)
-            return
-        
-        _, uid_str, ans_str = parts
-        uid = int(uid_str)
-        user_answer = int(ans_str)
+        # callback_data: "cap:user_id:answer", уже разобран CallbackTable
+        uid = callback_data.user_id
+        user_answer = callback_data.answer
         
         # Проверяем, что ответ принадлежит правильному пользователю
         if uid != user_id:
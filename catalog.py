@@ -0,0 +1,196 @@
+from typing import Dict, NamedTuple, Optional, Tuple
+
+# ========== ДАННЫЕ ДЛЯ КАТЕГОРИЙ НЕДВИЖИМОСТИ ==========
+
+# Основные категории недвижимости
+categories = {
+    "🏠 Квартиры": "kvartiry",
+    "🏡 Дома": "doma", 
+    "🏗️ Новостройки": "novostroyki",
+    "🏞️ Земельные участки": "zemelnie_uchastki",
+    "🏢 Коммерческая недвижимость": "commercy"
+}
+
+# Подкатегории для квартир
+quarters = {
+    "Студии": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/ctudii/",
+    "Комнаты": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/komnaty/",
+    "1-комнатные": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/odnokomnatnye/",
+    "2-комнатные": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/dvukhkomnatnye/",
+    "3-комнатные": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/3-komnatnye/",
+    "4-комнатные": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/4-komnatnye/",
+    "5+ комнат": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/5-komnat/"
+}
+
+# Подкатегории для домов
+houses = {
+    "Дома бизнес-класс": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/doma/doma-biznes-klass/",
+    "Дуплекс": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/doma/dupleks/",
+    "Коттеджи": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/doma/kottedzhi/",
+    "Таунхаус": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/doma/taunkhaus/",
+    "Часть дома": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/doma/chast-doma/",
+    "Дома эконом-класса": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/doma/doma-ekonom-klassa/"
+}
+
+# Подкатегории для новостроек
+newbuildings = {
+    "Бизнес-класса": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/novostroyki/biznes-klassa/",
+    "Новостройки эконом-класса": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/novostroyki/novostroyki-ekonom-klassa/"
+}
+
+# Земельные участки (без подкатегорий)
+land_plots = {
+    "Земельные участки": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/zemelnye-uchastki/"
+}
+
+# Коммерческая недвижимость (без подкатегорий)
+commercial = {
+    "Коммерческая недвижимость": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kommercheskaya-nedvizhimost/"
+}
+
+# Города для поиска
+cities = {
+    "Сочи": "Sochi",
+    "Геленджик": "Gelendzhik",
+    "Новороссийск": "Novorosiisk"
+}
+
+# Тип недвижимости (для логов и текстов) и подкатегории каждой категории
+_category_details = {
+    "kvartiry": ("квартиры", quarters),
+    "doma": ("дома", houses),
+    "novostroyki": ("новостройки", newbuildings),
+    "zemelnie_uchastki": ("земельные участки", land_plots),
+    "commercy": ("коммерческая недвижимость", commercial)
+}
+
+# Короткие ID подкатегорий для callback_data (Telegram ограничивает ее 64 байтами,
+# а кириллица в UTF-8 занимает по 2 байта на символ). ID не меняются и не
+# используются повторно: новые подкатегории получают следующий свободный номер,
+# иначе кнопки в уже отправленных сообщениях откроют не ту подкатегорию.
+_subcategory_ids = {
+    "Студии": 1,
+    "Комнаты": 2,
+    "1-комнатные": 3,
+    "2-комнатные": 4,
+    "3-комнатные": 5,
+    "4-комнатные": 6,
+    "5+ комнат": 7,
+    "Дома бизнес-класс": 8,
+    "Дуплекс": 9,
+    "Коттеджи": 10,
+    "Таунхаус": 11,
+    "Часть дома": 12,
+    "Дома эконом-класса": 13,
+    "Бизнес-класса": 14,
+    "Новостройки эконом-класса": 15,
+    "Земельные участки": 16,
+    "Коммерческая недвижимость": 17
+}
+
+_BASE36_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+def to_base36(number: int) -> str:
+    """Число в base36 (17 -> "h", 1000 -> "rs")"""
+    if number < 0:
+        raise ValueError(f"ID не может быть отрицательным: {number}")
+    digits = ""
+    while True:
+        number, remainder = divmod(number, 36)
+        digits = _BASE36_DIGITS[remainder] + digits
+        if not number:
+            return digits
+
+# ========== ИНДЕКСЫ КАТАЛОГА ==========
+
+class Category(NamedTuple):
+    """Категория недвижимости"""
+    code: str
+    title: str
+    property_type: str
+    subcategories: Dict[str, str]
+
+class Subcategory(NamedTuple):
+    """Подкатегория: страница каталога на сайте и категория, к которой она относится"""
+    name: str
+    url: str
+    property_type: str
+    category: str
+    id: str
+
+def _build_indexes() -> Tuple[Dict[str, Category], Dict[str, Subcategory], Dict[str, Subcategory], Dict[str, str]]:
+    """
+    Строит индексы каталога один раз при импорте
+
+    Returns:
+        Кортеж (код категории -> Category, название подкатегории -> Subcategory,
+        короткий ID -> Subcategory, код города -> название города)
+    """
+    category_by_code = {}
+    subcategory_by_name = {}
+    subcategory_by_id = {}
+
+    for title, code in categories.items():
+        property_type, subcategories = _category_details[code]
+        category_by_code[code] = Category(code, title, property_type, subcategories)
+
+        for name, url in subcategories.items():
+            if name in subcategory_by_name:
+                raise ValueError(
+                    f"Подкатегория '{name}' есть и в {subcategory_by_name[name].category}, и в {code}"
+                )
+            if name not in _subcategory_ids:
+                raise ValueError(f"Для подкатегории '{name}' не задан ID в _subcategory_ids")
+
+            subcategory_id = to_base36(_subcategory_ids[name])
+            if subcategory_id in subcategory_by_id:
+                raise ValueError(
+                    f"ID {subcategory_id} уже занят подкатегорией '{subcategory_by_id[subcategory_id].name}'"
+                )
+
+            subcategory = Subcategory(name, url, property_type, code, subcategory_id)
+            subcategory_by_name[name] = subcategory
+            subcategory_by_id[subcategory_id] = subcategory
+
+    city_by_code = {code: name for name, code in cities.items()}
+
+    return category_by_code, subcategory_by_name, subcategory_by_id, city_by_code
+
+CATEGORY_BY_CODE, SUBCATEGORY_BY_NAME, SUBCATEGORY_BY_ID, CITY_BY_CODE = _build_indexes()
+
+# Страница каталога на сайте -> подкатегория
+SUBCATEGORY_BY_URL = {subcategory.url: subcategory for subcategory in SUBCATEGORY_BY_NAME.values()}
+
+def get_category(code: str) -> Optional[Category]:
+    """Категория по коду из callback_data ("kvartiry", "doma", ...)"""
+    return CATEGORY_BY_CODE.get(code)
+
+def get_subcategory(name: str) -> Optional[Subcategory]:
+    """Подкатегория по названию"""
+    return SUBCATEGORY_BY_NAME.get(name)
+
+def subcategory_by_id(subcategory_id: str) -> Optional[Subcategory]:
+    """Подкатегория по короткому ID из callback_data"""
+    return SUBCATEGORY_BY_ID.get(subcategory_id)
+
+def subcategory_by_url(url: str) -> Optional[Subcategory]:
+    """Подкатегория по URL страницы каталога"""
+    return SUBCATEGORY_BY_URL.get(url)
+
+def city_by_code(code: str) -> Optional[str]:
+    """Название города по коду ("Sochi" -> "Сочи")"""
+    return CITY_BY_CODE.get(code)
+
+# Экспорт
+__all__ = [
+    # Данные
+    'categories', 'quarters', 'houses', 'newbuildings',
+    'land_plots', 'commercial', 'cities',
+
+    # Индексы
+    'Category', 'Subcategory',
+    'CATEGORY_BY_CODE', 'SUBCATEGORY_BY_NAME', 'SUBCATEGORY_BY_ID', 'SUBCATEGORY_BY_URL',
+    'CITY_BY_CODE', 'get_category', 'get_subcategory', 'subcategory_by_id',
+    'subcategory_by_url', 'city_by_code',
+    'to_base36'
+]
@@ -0,0 +1,278 @@
+import asyncio
+import hashlib
+import logging
+import struct
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence, Tuple
+
+from mortgage_calculator import MortgageCalculator
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Размеры графика (в пикселях)
+CHART_WIDTH = 720
+PANEL_HEIGHT = 200
+MARGIN = 20
+
+# Сколько готовых PNG держать в памяти
+CHART_CACHE_SIZE = 256
+
+# Палитра (PNG с индексированными цветами, один байт на пиксель)
+_PALETTE = (
+    (255, 255, 255),  # 0 - фон
+    (225, 225, 225),  # 1 - сетка
+    (66, 133, 244),   # 2 - остаток долга / вариант 1
+    (52, 168, 83),    # 3 - основной долг / вариант 2
+    (234, 67, 53),    # 4 - проценты / вариант 3
+    (251, 188, 5),    # 5 - вариант 4
+    (155, 81, 224),   # 6 - вариант 5
+    (90, 90, 90),     # 7 - оси
+    (46, 104, 200),   # 8 - сетка поверх остатка
+    (40, 140, 68),    # 9 - сетка поверх основного долга
+    (200, 52, 40),    # 10 - сетка поверх процентов
+)
+BACKGROUND, GRID, BALANCE, PRINCIPAL, INTEREST = 0, 1, 2, 3, 4
+AXIS = 7
+_GRID_SHADES = {BALANCE: 8, PRINCIPAL: 9, INTEREST: 10}
+_SCENARIO_COLORS = (2, 3, 4, 5, 6)
+
+# Легенды для подписи к картинке
+PAYMENT_CHART_LEGEND = (
+    "🔵 остаток долга\n"
+    "🟢 основной долг в платеже, 🔴 проценты в платеже\n"
+    "Вертикальные линии — годы, горизонтальные — 25/50/75% от максимума"
+)
+
+# Пул для отрисовки, чтобы не блокировать event loop
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chart")
+
+# Кеш готовых картинок: хеш входных данных -> PNG
+_chart_cache: "OrderedDict[str, bytes]" = OrderedDict()
+
+def _png(rows: List[bytes], width: int, height: int) -> bytes:
+    """
+    Кодирует изображение с палитрой в PNG
+
+    Args:
+        rows: Строки пикселей (индексы палитры)
+        width: Ширина
+        height: Высота
+
+    Returns:
+        Содержимое PNG-файла
+    """
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    raw = b''.join(b'\x00' + row for row in rows)
+    palette = b''.join(bytes(color) for color in _PALETTE)
+
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0))
+        + chunk(b'PLTE', palette)
+        + chunk(b'IDAT', zlib.compress(raw, 6))
+        + chunk(b'IEND', b'')
+    )
+
+def _transpose(columns: List[bytes]) -> List[bytes]:
+    """Превращает столбцы пикселей в строки"""
+    return [bytes(row) for row in zip(*columns)]
+
+def _panel_patterns(height: int) -> dict:
+    """
+    Заготовки столбцов панели: фон и заливки с горизонтальной сеткой
+
+    Returns:
+        Словарь цвет -> столбец высотой height
+    """
+    grid_rows = {height * quarter // 4 for quarter in (1, 2, 3)}
+    patterns = {}
+    for color in (BACKGROUND, BALANCE, PRINCIPAL, INTEREST):
+        grid_color = _GRID_SHADES.get(color, GRID)
+        patterns[color] = bytes(grid_color if y in grid_rows else color for y in range(height))
+    patterns[GRID] = bytes([GRID]) * height
+    return patterns
+
+def _frame(panels: List[List[bytes]], width: int) -> Tuple[List[bytes], int]:
+    """
+    Собирает панели в одно изображение с полями и осями
+
+    Args:
+        panels: Список панелей, каждая - список столбцов высотой PANEL_HEIGHT
+        width: Ширина области графика
+
+    Returns:
+        Кортеж (строки изображения, полная высота)
+    """
+    full_width = width + 2 * MARGIN
+    blank = bytes([BACKGROUND]) * full_width
+    axis_row = bytes([BACKGROUND]) * MARGIN + bytes([AXIS]) * width + bytes([BACKGROUND]) * MARGIN
+
+    rows = [blank] * MARGIN
+    for index, columns in enumerate(panels):
+        for row in _transpose(columns):
+            rows.append(bytes([BACKGROUND]) * (MARGIN - 1) + bytes([AXIS]) + row + bytes([BACKGROUND]) * MARGIN)
+        rows.append(axis_row)
+        rows.extend([blank] * (MARGIN if index < len(panels) - 1 else MARGIN - 1))
+
+    return rows, len(rows)
+
+def _year_columns(months: int, width: int) -> set:
+    """Номера столбцов, на которые приходятся границы лет"""
+    return {year * 12 * width // months for year in range(1, months // 12)}
+
+def render_payment_chart(loan_amount: float, annual_rate: float, years: int,
+                         payment_type: str = 'annuity') -> bytes:
+    """
+    Рисует график остатка долга и структуры платежа
+
+    Верхняя панель - остаток долга по месяцам, нижняя - платеж,
+    разложенный на основной долг и проценты.
+
+    Args:
+        loan_amount: Сумма кредита
+        annual_rate: Годовая процентная ставка (%)
+        years: Срок кредита в годах
+        payment_type: 'annuity' или 'differentiated'
+
+    Returns:
+        PNG-изображение
+    """
+    schedule = list(MortgageCalculator.amortization_schedule(loan_amount, annual_rate, years, payment_type))
+    months = len(schedule)
+    width = CHART_WIDTH
+    height = PANEL_HEIGHT
+    patterns = _panel_patterns(height)
+    year_columns = _year_columns(months, width)
+    max_payment = max(row[1] for row in schedule)
+
+    balance_columns = []
+    payment_columns = []
+
+    for x in range(width):
+        _, payment, principal, interest, remaining = schedule[x * months // width]
+        background = patterns[GRID] if x in year_columns else patterns[BACKGROUND]
+
+        # Остаток долга на начало месяца
+        balance_top = height - round((remaining + principal) / loan_amount * height)
+        balance_columns.append(background[:balance_top] + patterns[BALANCE][balance_top:])
+
+        # Платеж: снизу основной долг, сверху проценты
+        payment_top = height - round(payment / max_payment * height)
+        principal_top = height - round(principal / max_payment * height)
+        payment_columns.append(
+            background[:payment_top]
+            + patterns[INTEREST][payment_top:principal_top]
+            + patterns[PRINCIPAL][principal_top:]
+        )
+
+    rows, full_height = _frame([balance_columns, payment_columns], width)
+    return _png(rows, width + 2 * MARGIN, full_height)
+
+def render_comparison_chart(scenarios: Sequence[Tuple[float, float, int, str]]) -> bytes:
+    """
+    Рисует кривые остатка долга для нескольких вариантов ипотеки
+
+    Args:
+        scenarios: Кортежи (сумма кредита, ставка, срок в годах, тип платежа)
+
+    Returns:
+        PNG-изображение
+    """
+    width = CHART_WIDTH
+    height = PANEL_HEIGHT * 3 // 2
+    patterns = _panel_patterns(height)
+
+    balances = []
+    for loan_amount, annual_rate, years, payment_type in scenarios:
+        schedule = MortgageCalculator.amortization_schedule(loan_amount, annual_rate, years, payment_type)
+        balances.append([loan_amount] + [row[4] for row in schedule])
+
+    max_months = max(len(balance) - 1 for balance in balances)
+    max_amount = max(balance[0] for balance in balances)
+    year_columns = _year_columns(max_months, width)
+
+    columns = []
+    previous = [None] * len(balances)
+
+    for x in range(width):
+        column = bytearray(patterns[GRID] if x in year_columns else patterns[BACKGROUND])
+        month = x * max_months // width
+
+        for index, balance in enumerate(balances):
+            if month >= len(balance):
+                continue
+            y = min(height - 1, height - round(balance[month] / max_amount * height))
+            top, bottom = sorted((y, previous[index] if previous[index] is not None else y))
+            color = _SCENARIO_COLORS[index % len(_SCENARIO_COLORS)]
+            # Линия толщиной 3 пикселя
+            top, bottom = max(top - 1, 0), min(bottom + 2, height)
+            column[top:bottom] = bytes([color]) * (bottom - top)
+            previous[index] = y
+
+        columns.append(bytes(column))
+
+    rows, full_height = _frame([columns], width)
+    return _png(rows, width + 2 * MARGIN, full_height)
+
+def scenario_color_names(count: int) -> List[str]:
+    """Цветные метки для легенды сравнения вариантов"""
+    marks = ("🔵", "🟢", "🔴", "🟡", "🟣")
+    return [marks[index % len(marks)] for index in range(count)]
+
+def _cache_key(kind: str, params: tuple) -> str:
+    """Контентный адрес картинки: хеш типа графика и нормализованных входных данных"""
+    return hashlib.sha256(repr((kind, params)).encode('utf-8')).hexdigest()
+
+async def _render_cached(kind: str, params: tuple, renderer, *args) -> bytes:
+    """
+    Возвращает PNG из кеша или рисует его в пуле потоков
+    """
+    key = _cache_key(kind, params)
+
+    png = _chart_cache.get(key)
+    if png is not None:
+        _chart_cache.move_to_end(key)
+        return png
+
+    loop = asyncio.get_running_loop()
+    png = await loop.run_in_executor(_executor, renderer, *args)
+
+    _chart_cache[key] = png
+    if len(_chart_cache) > CHART_CACHE_SIZE:
+        _chart_cache.popitem(last=False)
+
+    logger.debug(f"Нарисован график {kind} ({len(png)} байт)")
+    return png
+
+async def get_payment_chart(loan_amount: float, annual_rate: float, years: int,
+                            payment_type: str = 'annuity') -> bytes:
+    """
+    График платежей для результата расчета (с кешем)
+    """
+    params = (round(loan_amount, 2), round(annual_rate, 6), years, payment_type)
+    return await _render_cached('payment', params, render_payment_chart, *params)
+
+async def get_comparison_chart(scenarios: Sequence[Tuple[float, float, int, str]]) -> bytes:
+    """
+    График сравнения вариантов (с кешем)
+    """
+    params = tuple(
+        (round(loan_amount, 2), round(annual_rate, 6), years, payment_type)
+        for loan_amount, annual_rate, years, payment_type in scenarios
+    )
+    return await _render_cached('comparison', params, render_comparison_chart, params)
+
+# Экспорт функций
+__all__ = [
+    'render_payment_chart',
+    'render_comparison_chart',
+    'get_payment_chart',
+    'get_comparison_chart',
+    'scenario_color_names',
+    'PAYMENT_CHART_LEGEND'
+]
@@ -1,22 +1,32 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.filters import Command, StateFilter
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 import asyncio
 import logging
-from typing import Dict, List, Any, Optional
+import time
+from typing import Dict, List, Any, Optional, Union
 
 from keyboards import (
-    make_subcategory_keyboard, quarters, houses, newbuildings, 
-    land_plots, commercial, make_main_keyboard, make_property_keyboard, 
-    back_kb, keyboard_of_cities, cities, make_city_selector_keyboard,
+    get_category_keyboard, make_main_keyboard, make_property_keyboard, 
+    back_kb, keyboard_of_cities, make_city_selector_keyboard,
     get_main_bot_keyboard, get_about_keyboard, get_contact_keyboard,
-    get_help_keyboard
+    get_help_keyboard, get_filter_skip_keyboard, make_more_keyboard
+)
+from textformat import (
+    format_property_message, format_error_message, format_success_message,
+    render_cache_stats, format_range
 )
-from textformat import format_property_message, format_error_message, format_success_message
-from parse_cards import fix_url, fetch_properties
 from config import save_user_city, get_user_city
+from callbacks import CallbackTable, CityCallback, SubcategoryCallback, LegacySubcategoryCallback, MoreCallback
+from catalog import get_category, get_subcategory, subcategory_by_id, city_by_code, SUBCATEGORY_BY_URL
+from media_cache import answer_cached_photo, media_cache_stats
+from listing_index import LISTINGS, INDEX_MAX_AGE
+from text_search import normalize_text
+from models import Property
+from pricing import parse_range
+from pagination import save_results, get_page, pagination_stats
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -24,13 +34,120 @@ logger = logging.getLogger(__name__)
 # Создаем роутер для категорий
 category_router = Router()
 
+# Таблица маршрутов callback-запросов роутера
+category_callbacks = CallbackTable(category_router)
+
+# Сколько объектов сохранять в выдаче /search
+SEARCH_MAX_RESULTS = 40
+
 # Состояния FSM
 class CategoryStates(StatesGroup):
     waiting_for_city = State()
     waiting_for_category = State()
     waiting_for_subcategory = State()
+    
+    # Подбор по цене и площади
+    waiting_for_price_range = State()
+    waiting_for_area_range = State()
 
 # Вспомогательные функции
+async def send_property_cards(message: Message, properties: List[Property], category_name: str = "") -> int:
+    """
+    Отправляет карточки недвижимости в чат
+    
+    Args:
+        message: Сообщение, в чат которого отправляем
+        properties: Объекты для отправки
+        category_name: Название категории для подписи
+        
+    Returns:
+        Количество отправленных карточек
+    """
+    sent_count = 0
+    
+    for prop in properties:
+        try:
+            message_text = format_property_message(prop, category_name)
+            property_keyboard = make_property_keyboard(prop.link)
+            
+            logger.debug(f"Отправка карточки: {prop.title[:50]}...")
+            
+            if prop.image:
+                await answer_cached_photo(
+                    message,
+                    prop.image,
+                    caption=message_text,
+                    reply_markup=property_keyboard,
+                    parse_mode='MarkdownV2'
+                )
+            else:
+                await message.answer(
+                    message_text,
+                    reply_markup=property_keyboard,
+                    parse_mode='MarkdownV2'
+                )
+            
+            sent_count += 1
+            await asyncio.sleep(0.5)  # Небольшая задержка между сообщениями
+            
+        except Exception as e:
+            logger.error(f"Ошибка при отправке карточки: {e}")
+    
+    return sent_count
+
+async def send_results_page(message: Message, token: str, offset: int = 0, details: str = "") -> bool:
+    """
+    Отправляет страницу сохраненной выдачи и итоговое сообщение с кнопкой "Показать ещё"
+    
+    Args:
+        message: Сообщение, в чат которого отправляем
+        token: Токен выдачи из save_results()
+        offset: Сдвиг страницы
+        details: Дополнительные строки итогового сообщения
+        
+    Returns:
+        False, если выдача устарела
+    """
+    page = get_page(token, offset)
+    if page is None:
+        return False
+    
+    result = page.result
+    logger.info(f"Выдача {token}: отправляю {len(page.properties)} объектов со сдвигом {offset}")
+    
+    sent_count = await send_property_cards(message, page.properties, result.title)
+    
+    if sent_count > 0:
+        await message.answer(
+            f"✅ *Показано {offset + 1}–{page.offset} из {len(result.properties)} объектов в {result.city}*\n"
+            f"{details}\n"
+            "Выберите следующее действие:",
+            reply_markup=make_more_keyboard(token, page.offset, page.remaining, watch=result.query is not None),
+            parse_mode="Markdown"
+        )
+    else:
+        await message.answer(
+            f"❌ *Не удалось загрузить объекты*\n\n"
+            f"Попробуйте позже или выберите другую категорию.",
+            reply_markup=back_kb,
+            parse_mode="Markdown"
+        )
+    
+    return True
+
+async def ensure_listing_index(message: Message):
+    """
+    Загружает в индекс страницы каталога, которых там нет или которые устарели
+    
+    Args:
+        message: Сообщение, в чат которого написать о загрузке
+    """
+    from parse_cards import refresh_listing_index
+    
+    if LISTINGS.missing_pages(SUBCATEGORY_BY_URL, INDEX_MAX_AGE):
+        await message.answer("⏳ *Обновляю каталог, это займет несколько секунд...*", parse_mode="Markdown")
+        await refresh_listing_index(SUBCATEGORY_BY_URL)
+
 async def get_user_city_from_state(state: FSMContext) -> Optional[str]:
     """Получает город пользователя из состояния"""
     data = await state.get_data()
@@ -84,6 +201,53 @@ async def cmd_start_after_captcha(message: Message, state: FSMContext):
             format_error_message("Не удалось загрузить главное меню. Попробуйте позже.")
         )
 
+@category_router.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject, state: FSMContext):
+    """
+    Полнотекстовый поиск по объектам: /search вид на море
+    """
+    query = normalize_text(command.args or "")
+    
+    if len(query) < 3:
+        await message.answer(
+            "🔎 *Поиск по описанию объектов*\n\n"
+            "Напишите запрос после команды, например:\n"
+            "/search вид на море\n"
+            "/search Ленина",
+            parse_mode="Markdown"
+        )
+        return
+    
+    current_city = await get_user_city_from_state(state)
+    
+    try:
+        await ensure_listing_index(message)
+        
+        start = time.perf_counter()
+        properties = LISTINGS.search_text(query, current_city, limit=SEARCH_MAX_RESULTS)
+        logger.info(
+            f"Поиск '{query}' в {current_city or 'всех городах'}: {len(properties)} объектов "
+            f"за {(time.perf_counter() - start) * 1000:.1f} мс"
+        )
+        
+        if not properties:
+            await message.answer(
+                f"🔎 *По запросу «{query}» ничего не найдено.*\n\n"
+                "Попробуйте другие слова или выберите категорию в меню.",
+                reply_markup=back_kb,
+                parse_mode="Markdown"
+            )
+            return
+        
+        token = save_results(properties, "", current_city or "всех городах")
+        await send_results_page(message, token, details=f"🔎 Запрос: {query}\n")
+        
+    except Exception as e:
+        logger.error(f"Ошибка при поиске '{query}': {e}", exc_info=True)
+        await message.answer(
+            format_error_message("Произошла ошибка при поиске. Попробуйте позже.")
+        )
+
 @category_router.message(Command("city"))
 async def cmd_city(message: Message, state: FSMContext):
     """
@@ -118,6 +282,8 @@ async def cmd_help(message: Message):
         "📋 *Основные команды:*\n"
         "• /start - Главное меню\n"
         "• /city - Выбрать город\n"
+        "• /search - Поиск по описанию (например, /search вид на море)\n"
+        "• /subscriptions - Подписки на новые объекты\n"
         "• /help - Эта справка\n"
         "• /debug - Отладочная информация\n\n"
         
@@ -162,7 +328,7 @@ async def cmd_debug(message: Message, state: FSMContext):
     await message.answer(debug_info, parse_mode="Markdown", reply_markup=debug_kb)
 
 # Обработчики callback-запросов для главного меню
-@category_router.callback_query(F.data == "search_real_estate")
+@category_callbacks.exact("search_real_estate")
 async def search_real_estate_handler(call: CallbackQuery, state: FSMContext):
     """
     Обработчик кнопки "Поиск недвижимости"
@@ -194,7 +360,7 @@ async def search_real_estate_handler(call: CallbackQuery, state: FSMContext):
         await call.message.answer(format_error_message(str(e)))
         await call.answer("❌ Произошла ошибка")
 
-@category_router.callback_query(F.data == "mortgage_calculator")
+@category_callbacks.exact("mortgage_calculator")
 async def mortgage_calculator_handler(call: CallbackQuery):
     """
     Обработчик кнопки "Ипотечный калькулятор"
@@ -209,7 +375,7 @@ async def mortgage_calculator_handler(call: CallbackQuery):
     )
     await call.answer()
 
-@category_router.callback_query(F.data == "about_us")
+@category_callbacks.exact("about_us")
 async def about_us_handler(call: CallbackQuery):
     """
     Обработчик кнопки "О нас"
@@ -256,7 +422,7 @@ async def about_us_handler(call: CallbackQuery):
     )
     await call.answer()
 
-@category_router.callback_query(F.data == "contact_us")
+@category_callbacks.exact("contact_us")
 async def contact_us_handler(call: CallbackQuery):
     """
     Обработчик кнопки "Связаться с нами"
@@ -285,7 +451,7 @@ async def contact_us_handler(call: CallbackQuery):
     )
     await call.answer()
 
-@category_router.callback_query(F.data == "back_to_main_menu")
+@category_callbacks.exact("back_to_main_menu")
 async def back_to_main_menu_handler(call: CallbackQuery, state: FSMContext):
     """
     Возврат в главное меню бота
@@ -315,21 +481,17 @@ async def back_to_main_menu_handler(call: CallbackQuery, state: FSMContext):
         await call.answer()
 
 # Обработчики выбора города
-@category_router.callback_query(F.data.startswith("city_"))
-async def city_handler(call: CallbackQuery, state: FSMContext):
+@category_callbacks.data(CityCallback)
+async def city_handler(call: CallbackQuery, state: FSMContext, callback_data: CityCallback):
     """
     Обработчик выбора города
     """
     user_id = call.from_user.id
-    city_code = call.data.replace("city_", "")
+    city_code = callback_data.code
     
     try:
         # Находим название города по коду
-        city_name = None
-        for name, code in cities.items():
-            if code == city_code:
-                city_name = name
-                break
+        city_name = city_by_code(city_code)
         
         if not city_name:
             await call.answer("❌ Город не найден", show_alert=True)
@@ -352,7 +514,7 @@ async def city_handler(call: CallbackQuery, state: FSMContext):
         logger.error(f"Ошибка при выборе города: {e}")
         await call.answer("❌ Ошибка при выборе города", show_alert=True)
 
-@category_router.callback_query(F.data == "select_city")
+@category_callbacks.exact("select_city")
 async def select_city_handler(call: CallbackQuery):
     """
     Обработчик для выбора города из меню
@@ -364,7 +526,7 @@ async def select_city_handler(call: CallbackQuery):
     )
     await call.answer()
 
-@category_router.callback_query(F.data == "change_city")
+@category_callbacks.exact("change_city")
 async def change_city_handler(call: CallbackQuery):
     """
     Обработчик для смены города
@@ -376,7 +538,7 @@ async def change_city_handler(call: CallbackQuery):
     )
     await call.answer()
 
-@category_router.callback_query(F.data == "change_city_main")
+@category_callbacks.exact("change_city_main")
 async def change_city_main_handler(call: CallbackQuery):
     """
     Обработчик для смены города из главного меню
@@ -389,7 +551,7 @@ async def change_city_main_handler(call: CallbackQuery):
     await call.answer()
 
 # Обработчики категорий недвижимости
-@category_router.callback_query(F.data == "back_to_main")
+@category_callbacks.exact("back_to_main")
 async def back_to_main_handler(call: CallbackQuery, state: FSMContext):
     """
     Возврат к основным категориям
@@ -417,7 +579,7 @@ async def back_to_main_handler(call: CallbackQuery, state: FSMContext):
         logger.error(f"Ошибка при возврате к категориям: {e}")
         await call.answer("❌ Произошла ошибка")
 
-@category_router.callback_query(F.data.startswith("cat_"))
+@category_callbacks.prefix("cat_")
 async def category_handler(call: CallbackQuery, state: FSMContext):
     """
     Обработчик выбора основной категории
@@ -439,30 +601,15 @@ async def category_handler(call: CallbackQuery, state: FSMContext):
             return
         
         # Определяем, какую клавиатуру показать
-        if category_type == "kvartiry":
-            kb = make_subcategory_keyboard(quarters)
-            category_text = "🏠 Квартиры"
-            
-        elif category_type == "doma":
-            kb = make_subcategory_keyboard(houses)
-            category_text = "🏡 Дома"
-            
-        elif category_type == "novostroyki":
-            kb = make_subcategory_keyboard(newbuildings)
-            category_text = "🏗️ Новостройки"
-            
-        elif category_type == "zemelnie_uchastki":
-            kb = make_subcategory_keyboard(land_plots)
-            category_text = "🏞️ Земельные участки"
-            
-        elif category_type == "commercy":
-            kb = make_subcategory_keyboard(commercial)
-            category_text = "🏢 Коммерческая недвижимость"
-            
-        else:
+        category = get_category(category_type)
+        
+        if category is None:
             await call.answer("❌ Категория не найдена", show_alert=True)
             return
         
+        kb = get_category_keyboard(category.code)
+        category_text = category.title
+        
         logger.info(f"Пользователь {user_id} выбрал категорию: {category_text} в городе {current_city}")
         
         await call.message.edit_text(
@@ -478,12 +625,20 @@ async def category_handler(call: CallbackQuery, state: FSMContext):
         logger.error(f"Ошибка при выборе категории: {e}")
         await call.answer("❌ Произошла ошибка", show_alert=True)
 
-@category_router.callback_query(F.data.startswith("sub_"))
-async def subcategory_handler(call: CallbackQuery, state: FSMContext):
+@category_callbacks.data(SubcategoryCallback)
+@category_callbacks.data(LegacySubcategoryCallback)
+async def subcategory_handler(call: CallbackQuery, state: FSMContext, callback_data: Union[SubcategoryCallback, LegacySubcategoryCallback]):
     """
     Обработчик выбора подкатегории с фильтрацией по городу
     """
-    subcategory_name = call.data.replace("sub_", "")
+    from parse_cards import fix_url, fetch_properties
+    
+    if isinstance(callback_data, SubcategoryCallback):
+        subcategory = subcategory_by_id(callback_data.id)
+    else:
+        # Кнопки из сообщений, отправленных до перехода на короткие ID
+        subcategory = get_subcategory(callback_data.name)
+    
     user_id = call.from_user.id
     
     try:
@@ -500,32 +655,14 @@ async def subcategory_handler(call: CallbackQuery, state: FSMContext):
             return
         
         # Определяем URL в зависимости от подкатегории
-        url = None
-        
-        if subcategory_name in quarters:
-            url = quarters[subcategory_name]
-            property_type = "квартиры"
-            
-        elif subcategory_name in houses:
-            url = houses[subcategory_name]
-            property_type = "дома"
-            
-        elif subcategory_name in newbuildings:
-            url = newbuildings[subcategory_name]
-            property_type = "новостройки"
-            
-        elif subcategory_name in land_plots:
-            url = land_plots[subcategory_name]
-            property_type = "земельные участки"
-            
-        elif subcategory_name in commercial:
-            url = commercial[subcategory_name]
-            property_type = "коммерческая недвижимость"
-        
-        if not url:
+        if subcategory is None:
             await call.answer("❌ Категория не найдена", show_alert=True)
             return
         
+        subcategory_name = subcategory.name
+        url = subcategory.url
+        property_type = subcategory.property_type
+        
         logger.info(f"Пользователь {user_id} ищет {property_type}: {subcategory_name} в {selected_city}")
         
         # Показываем сообщение о начале поиска
@@ -556,54 +693,14 @@ async def subcategory_handler(call: CallbackQuery, state: FSMContext):
             await call.answer()
             return
         
-        # Отправляем карточки недвижимости
-        sent_count = 0
-        max_cards = min(len(properties), 8)  # Максимум 8 карточек
-        
-        logger.info(f"Найдено {len(properties)} объектов, отправляю {max_cards}")
-        
-        for prop in properties[:max_cards]:
-            try:
-                message_text = format_property_message(prop, subcategory_name)
-                property_keyboard = make_property_keyboard(prop['link'])
-                
-                logger.debug(f"Отправка карточки: {prop.get('title', 'Без названия')[:50]}...")
-                
-                if prop.get('image'):
-                    await call.message.answer_photo(
-                        photo=prop['image'],
-                        caption=message_text,
-                        reply_markup=property_keyboard,
-                        parse_mode='MarkdownV2'
-                    )
-                else:
-                    await call.message.answer(
-                        message_text,
-                        reply_markup=property_keyboard,
-                        parse_mode='MarkdownV2'
-                    )
-                
-                sent_count += 1
-                await asyncio.sleep(0.5)  # Небольшая задержка между сообщениями
-                
-            except Exception as e:
-                logger.error(f"Ошибка при отправке карточки: {e}")
-        
-        # Итоговое сообщение
-        if sent_count > 0:
-            await call.message.answer(
-                f"✅ *Найдено {sent_count} объектов в {selected_city}*\n\n"
-                "Выберите следующее действие:",
-                reply_markup=back_kb,
-                parse_mode="Markdown"
-            )
-        else:
-            await call.message.answer(
-                f"❌ *Не удалось загрузить объекты*\n\n"
-                f"Попробуйте позже или выберите другую категорию.",
-                reply_markup=back_kb,
-                parse_mode="Markdown"
-            )
+        # Сохраняем выдачу целиком и отправляем первую страницу
+        logger.info(f"Найдено {len(properties)} объектов")
+        
+        token = save_results(
+            properties, subcategory_name, selected_city,
+            query={'city': selected_city, 'subcategory_id': subcategory.id}
+        )
+        await send_results_page(call.message, token)
         
         await call.answer()
         
@@ -614,8 +711,173 @@ async def subcategory_handler(call: CallbackQuery, state: FSMContext):
         )
         await call.answer("❌ Произошла ошибка")
 
+# ========== ПОДБОР ПО ЦЕНЕ И ПЛОЩАДИ ==========
+
+@category_callbacks.exact("filter_search")
+async def filter_search_handler(call: CallbackQuery, state: FSMContext):
+    """
+    Начало подбора по цене и площади среди всех объектов города
+    """
+    current_city = await get_user_city_from_state(state)
+    
+    if not current_city:
+        await call.message.edit_text(
+            "📍 *Сначала выберите город для поиска недвижимости:*",
+            reply_markup=keyboard_of_cities(),
+            parse_mode="Markdown"
+        )
+        await call.answer()
+        return
+    
+    await call.message.answer(
+        f"🔎 *Подбор недвижимости в {current_city}*\n\n"
+        "💰 Введите диапазон цены:\n\n"
+        "*Примеры:* 3-6 млн, от 5 000 000, до 8 млн\n"
+        "Числа меньше 1000 считаются миллионами.",
+        reply_markup=get_filter_skip_keyboard(),
+        parse_mode="Markdown"
+    )
+    await state.set_state(CategoryStates.waiting_for_price_range)
+    await call.answer()
+
+async def ask_area_range(message: Message, state: FSMContext, price_range: tuple):
+    """Сохраняет диапазон цены и спрашивает площадь"""
+    await state.update_data(filter_price=list(price_range))
+    await message.answer(
+        f"✅ Цена: *{format_range(*price_range, '₽')}*\n\n"
+        "📐 Введите диапазон площади (м²):\n\n"
+        "*Примеры:* 30-60, от 40, до 80",
+        reply_markup=get_filter_skip_keyboard(),
+        parse_mode="Markdown"
+    )
+    await state.set_state(CategoryStates.waiting_for_area_range)
+
+@category_router.message(CategoryStates.waiting_for_price_range)
+async def process_price_range(message: Message, state: FSMContext):
+    """
+    Обработка ввода диапазона цены
+    """
+    price_range = parse_range(message.text, 'price')
+    
+    if price_range is None:
+        await message.answer(
+            "❌ *Не удалось разобрать цену!*\n\n"
+            "Введите диапазон, например: 3-6 млн, от 5 000 000 или до 8 млн",
+            reply_markup=get_filter_skip_keyboard(),
+            parse_mode="Markdown"
+        )
+        return
+    
+    await ask_area_range(message, state, price_range)
+
+@category_router.message(CategoryStates.waiting_for_area_range)
+async def process_area_range(message: Message, state: FSMContext):
+    """
+    Обработка ввода диапазона площади
+    """
+    area_range = parse_range(message.text, 'area')
+    
+    if area_range is None:
+        await message.answer(
+            "❌ *Не удалось разобрать площадь!*\n\n"
+            "Введите диапазон в м², например: 30-60, от 40 или до 80",
+            reply_markup=get_filter_skip_keyboard(),
+            parse_mode="Markdown"
+        )
+        return
+    
+    await run_filter_search(message, state, area_range)
+
+@category_callbacks.exact("filter_skip")
+async def filter_skip_handler(call: CallbackQuery, state: FSMContext):
+    """
+    Кнопка "Любая" на шагах подбора
+    """
+    current_state = await state.get_state()
+    
+    if current_state == CategoryStates.waiting_for_price_range.state:
+        await ask_area_range(call.message, state, (None, None))
+    elif current_state == CategoryStates.waiting_for_area_range.state:
+        await run_filter_search(call.message, state, (None, None))
+    
+    await call.answer()
+
+async def run_filter_search(message: Message, state: FSMContext, area_range: tuple):
+    """
+    Выборка из индекса объектов по цене и площади и отправка карточек
+    """
+    data = await state.get_data()
+    current_city = data.get('city')
+    min_price, max_price = data.get('filter_price') or (None, None)
+    min_area, max_area = area_range
+    
+    await state.set_state(None)
+    
+    try:
+        await ensure_listing_index(message)
+        
+        properties, total = LISTINGS.search(
+            current_city,
+            min_price=min_price, max_price=max_price,
+            min_area=min_area, max_area=max_area
+        )
+        
+        conditions = (
+            f"💰 Цена: {format_range(min_price, max_price, '₽')}\n"
+            f"📐 Площадь: {format_range(min_area, max_area, 'м²')}"
+        )
+        
+        logger.info(
+            f"Подбор в {current_city}: цена {min_price}-{max_price}, площадь {min_area}-{max_area}, найдено {total}"
+        )
+        
+        if not properties:
+            await message.answer(
+                f"📍 *Город: {current_city}*\n{conditions}\n\n"
+                "❌ *Подходящих объектов не найдено.* Попробуйте расширить диапазон.",
+                reply_markup=back_kb,
+                parse_mode="Markdown"
+            )
+            return
+        
+        token = save_results(properties, "", current_city, query={
+            'city': current_city,
+            'min_price': int(min_price) if min_price is not None else None,
+            'max_price': int(max_price) if max_price is not None else None,
+            'min_area': min_area,
+            'max_area': max_area
+        })
+        await send_results_page(message, token, details=conditions + "\n")
+        
+    except Exception as e:
+        logger.error(f"Ошибка при подборе по цене и площади: {e}", exc_info=True)
+        await message.answer(
+            format_error_message("Произошла ошибка при поиске недвижимости. Попробуйте позже.")
+        )
+
+@category_callbacks.data(MoreCallback)
+async def more_results_handler(call: CallbackQuery, callback_data: MoreCallback):
+    """
+    Кнопка "Показать ещё": следующая страница сохраненной выдачи
+    """
+    try:
+        # Убираем кнопку из предыдущего итогового сообщения, чтобы страница не ушла дважды
+        await call.message.edit_reply_markup(reply_markup=back_kb)
+        
+        if not await send_results_page(call.message, callback_data.token, callback_data.offset):
+            await call.answer("⌛ Результаты поиска устарели, повторите поиск", show_alert=True)
+            return
+        
+        await call.answer()
+        
+    except Exception as e:
+        logger.error(f"Ошибка при показе следующей страницы: {e}", exc_info=True)
+        await call.message.answer(
+            format_error_message("Произошла ошибка при загрузке объектов. Попробуйте позже.")
+        )
+
 # Обработчики для раздела "О нас"
-@category_router.callback_query(F.data == "call_us")
+@category_callbacks.exact("call_us")
 async def call_us_handler(call: CallbackQuery):
     """
     Обработчик кнопки "Позвонить нам"
@@ -634,7 +896,7 @@ async def call_us_handler(call: CallbackQuery):
     )
     await call.answer()
 
-@category_router.callback_query(F.data == "our_office_map")
+@category_callbacks.exact("our_office_map")
 async def our_office_map_handler(call: CallbackQuery):
     """
     Обработчик кнопки "Наш офис на карте"
@@ -655,7 +917,7 @@ async def our_office_map_handler(call: CallbackQuery):
     )
     await call.answer()
 
-@category_router.callback_query(F.data == "write_email")
+@category_callbacks.exact("write_email")
 async def write_email_handler(call: CallbackQuery):
     """
     Обработчик кнопки "Написать email"
@@ -677,11 +939,13 @@ async def write_email_handler(call: CallbackQuery):
     await call.answer()
 
 # Отладочные обработчики
-@category_router.callback_query(F.data == "debug_parse_studios")
+@category_callbacks.exact("debug_parse_studios")
 async def debug_parse_studios_handler(call: CallbackQuery, state: FSMContext):
     """
     Тестирование парсера (студии)
     """
+    from parse_cards import fetch_properties
+    
     await call.answer("🔄 Тестирую парсер...", show_alert=False)
     
     test_url = "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/ctudii/"
@@ -709,7 +973,7 @@ async def debug_parse_studios_handler(call: CallbackQuery, state: FSMContext):
         
         # Показываем города из первых 5 карточек
         for i, prop in enumerate(all_props[:5], 1):
-            debug_result += f"{i}. {prop.get('city', 'Не определен')}: {prop.get('title', '')[:30]}...\n"
+            debug_result += f"{i}. {prop.city}: {prop.title[:30]}...\n"
         
         await call.message.answer(debug_result, parse_mode="Markdown")
         
@@ -717,7 +981,7 @@ async def debug_parse_studios_handler(call: CallbackQuery, state: FSMContext):
         logger.error(f"Ошибка при тестировании парсера: {e}")
         await call.message.answer(f"❌ Ошибка: {str(e)}")
 
-@category_router.callback_query(F.data == "debug_city_filter")
+@category_callbacks.exact("debug_city_filter")
 async def debug_city_filter_handler(call: CallbackQuery):
     """
     Тестирование фильтра по городу
@@ -746,11 +1010,15 @@ async def debug_city_filter_handler(call: CallbackQuery):
         logger.error(f"Ошибка при анализе структуры: {e}")
         await call.message.answer(f"❌ Ошибка: {str(e)}")
 
-@category_router.callback_query(F.data == "debug_stats")
+@category_callbacks.exact("debug_stats")
 async def debug_stats_handler(call: CallbackQuery, state: FSMContext):
     """
     Статистика пользователя
     """
+    from mortgage_calculator import MortgageCalculator
+    from parse_cards import parser_stats
+    from image_proxy import image_proxy_stats
+    
     data = await state.get_data()
     
     stats = (
@@ -766,13 +1034,88 @@ async def debug_stats_handler(call: CallbackQuery, state: FSMContext):
         f"• Попытки капчи: {data.get('ATTEMPTS', 0)}\n\n"
         
         f"📅 *Дата регистрации:*\n"
-        f"{(call.from_user.id >> 22) + 1420070400000}"
+        f"{(call.from_user.id >> 22) + 1420070400000}\n\n"
+        
+        f"🧮 *Кеш ипотечных расчетов:*\n"
+    )
+    
+    for name, info in MortgageCalculator.cache_stats().items():
+        stats += (
+            f"• `{name}`: {info['hit_rate']}% "
+            f"({info['hits']}/{info['hits'] + info['misses']}, размер {info['size']})\n"
+        )
+    
+    # Телеметрия парсера
+    parser = parser_stats()
+    stats += (
+        f"\n🕷 *Парсер:*\n"
+        f"• Скачано: {parser['bytes'] / 1024:.0f} КБ\n"
+        f"• Карточек разобрано: {int(parser['cards'])}\n"
+    )
+    
+    for stage, info in parser['stages'].items():
+        stats += f"• `{stage}`: {info['avg_ms']} мс × {info['count']}\n"
+    
+    detection = parser['city_detection']
+    detected_total = sum(detection.values())
+    if detected_total:
+        stats += "\n📍 *Определение города:*\n"
+        for method, count in detection.items():
+            stats += f"• `{method}`: {count / detected_total * 100:.1f}% ({int(count)})\n"
+        stats += f"• Доопределено по тексту при поиске: {int(parser['city_text_fallback'])}\n"
+    
+    from subscriptions import subscription_stats
+    crawler = subscription_stats()
+    queue = crawler['queue'] or {}
+    stats += (
+        f"• Подписки: {crawler['cycles']} проходов ({crawler['last_cycle_s']} с), "
+        f"новых {crawler['new']}, цен {crawler['price']} (снижений {crawler['drop']}), уведомлений {crawler['notified']}; "
+        f"очередь {queue.get('pending', 0)}, отправлено {queue.get('sent', 0)}, "
+        f"flood control {queue.get('retry_after', 0)}\n"
     )
     
+    pages = pagination_stats()
+    stats += (
+        f"• Выдачи: {pages['size']} в памяти, {pages['pages']} страниц показано, "
+        f"{pages['expired']} устаревших курсоров\n"
+    )
+    
+    listings = LISTINGS.stats()
+    stats += (
+        f"• Индекс цен: {listings['priced']}/{listings['listings']} объектов с ценой, "
+        f"{listings['unique']} без дублей, "
+        f"{listings['pages']} страниц, {listings['buckets']} срезов, {listings['searchable']} в поиске\n"
+    )
+    
+    stats += "\n💾 *Кеши парсера:*\n"
+    for cache, info in parser['caches'].items():
+        stats += f"• `{cache}`: {info['hit_rate']}% ({int(info['hits'])}/{int(info['hits'] + info['misses'])})\n"
+    
+    media = media_cache_stats()
+    stats += (
+        f"\n📷 *Кеш file_id фото:* {media['hit_rate']}% "
+        f"(память {media['memory']}, БД {media['db']}, промахи {media['miss']}, "
+        f"устаревшие {media['stale']}, размер {media['size']})\n"
+    )
+    
+    images = image_proxy_stats()
+    stats += (
+        f"• Прокси фото: диск {images['disk']}, загрузки {images['download']}, ошибки {images['error']}, "
+        f"{images['bytes_in'] / 1024:.0f} → {images['bytes_out'] / 1024:.0f} КБ, "
+        f"кеш {images['cache_bytes'] / 1024 / 1024:.1f} МБ ({images['cache_files']} файлов)\n"
+    )
+    
+    stats += "\n🖼 *Кеш карточек:*\n"
+    for name, info in render_cache_stats().items():
+        stats += (
+            f"• `{name}`: {info['hit_rate']}% "
+            f"({info['hits']}/{info['hits'] + info['misses']}, размер {info['size']})\n"
+        )
+    
     await call.message.answer(stats, parse_mode="Markdown")
     await call.answer()
 
-@category_router.callback_query(F.data == "debug_reset")
+@category_callbacks.exact("debug_reset")
 async def debug_reset_handler(call: CallbackQuery, state: FSMContext):
     """
     Сброс состояния пользователя
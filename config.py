@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+from collections.abc import Mapping
 import aiosqlite
 
 # Загружаем переменные окружения
@@ -10,6 +11,20 @@ load_dotenv()
 TOKEN = os.getenv('TOKEN')  # Токен бота от @BotFather
 DB_FILE = 'users.db'  # Файл базы данных
 TELEGRAM_CHANNEL_URL = "https://t.me/Kluchi_gel_sochi"  # Ссылка на канал
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')  # Адрес HTTP-сервера метрик
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9101'))  # Порт /metrics (0 - отключить)
+LOG_FILE = os.getenv('LOG_FILE', 'bot_debug.log')  # Файл логов (ротируется по размеру)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')  # Уровень логирования
+LOG_JSON = os.getenv('LOG_JSON', '0') == '1'  # Писать логи в файл в формате JSON
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))  # Размер файла до ротации
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))  # Сколько старых файлов хранить
+LOG_DEBUG_SAMPLE_EVERY = int(os.getenv('LOG_DEBUG_SAMPLE_EVERY', '100'))  # Каждая N-я DEBUG-запись парсера
+PARSER_KEEP_FULL_TEXT = os.getenv('PARSER_KEEP_FULL_TEXT', '0') == '1'  # Хранить полный текст карточек (для отладки)
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', 'image_cache')  # Каталог кеша пережатых фото
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))  # Предельный размер кеша фото
+SUBSCRIPTION_CHECK_INTERVAL = int(os.getenv('SUBSCRIPTION_CHECK_INTERVAL', '900'))  # Как часто проверять подписки (сек, 0 - отключить)
+NOTIFY_RATE = float(os.getenv('NOTIFY_RATE', '20'))  # Уведомлений в секунду для всех чатов (лимит Telegram - 30)
+PRICE_DROP_PERCENT = float(os.getenv('PRICE_DROP_PERCENT', '5'))  # На сколько % должна упасть цена для уведомления
     
 async def init_db():
     """
@@ -41,8 +56,56 @@ async def init_db():
             )
         ''')
         
+        # Создаем таблицу file_id уже загруженных в Telegram фотографий
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS media_cache (
+                url TEXT PRIMARY KEY,
+                file_id TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Создаем таблицу подписок на новые объекты
+        # (subcategory_id NULL - все подкатегории, границы NULL - без ограничения)
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                city TEXT NOT NULL,
+                subcategory_id TEXT,
+                min_price INTEGER,
+                max_price INTEGER,
+                min_area REAL,
+                max_area REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_subscriptions_user ON subscriptions (user_id)')
+        
+        # Объекты, которые краулер подписок уже видел на страницах каталога
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS known_listings (
+                page_url TEXT NOT NULL,
+                link TEXT NOT NULL,
+                price_rub INTEGER,
+                seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (page_url, link)
+            ) WITHOUT ROWID
+        ''')
+        
+        # История цен объектов (только добавление: новая строка при каждом изменении цены)
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS price_history (
+                link TEXT NOT NULL,
+                price_rub INTEGER NOT NULL,
+                seen_at REAL NOT NULL
+            )
+        ''')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_price_history_link_time ON price_history (link, seen_at)')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_price_history_time ON price_history (seen_at)')
+        
         await db.commit()
-        print(f"База данных создана: {DB_FILE}")
+        print(f"База данных готова: {DB_FILE}")
 
 async def user_passed(user_id: int) -> bool:
     """
@@ -104,6 +167,174 @@ async def get_user_city(user_id: int) -> str:
             row = await cur.fetchone()
             return row[0] if row else None
 
+async def get_media_file_id(url: str) -> str:
+    """
+    Получает file_id фотографии, уже отправленной по этому URL
+    """
+    async with aiosqlite.connect(DB_FILE) as db:
+        async with db.execute("SELECT file_id FROM media_cache WHERE url = ?", (url,)) as cur:
+            row = await cur.fetchone()
+            return row[0] if row else None
+
+async def save_media_file_id(url: str, file_id: str):
+    """
+    Сохраняет file_id фотографии, отправленной по URL
+    """
+    async with aiosqlite.connect(DB_FILE) as db:
+        await db.execute('''
+            INSERT INTO media_cache (url, file_id)
+            VALUES (?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                file_id = excluded.file_id,
+                created_at = CURRENT_TIMESTAMP
+        ''', (url, file_id))
+        await db.commit()
+
+async def delete_media_file_id(url: str):
+    """
+    Удаляет file_id, который Telegram больше не принимает
+    """
+    async with aiosqlite.connect(DB_FILE) as db:
+        await db.execute("DELETE FROM media_cache WHERE url = ?", (url,))
+        await db.commit()
+
+# Поля подписки в порядке столбцов таблицы subscriptions
+SUBSCRIPTION_COLUMNS = 'id, user_id, city, subcategory_id, min_price, max_price, min_area, max_area'
+
+async def add_subscription(user_id: int, city: str, subcategory_id: str = None,
+                           min_price: int = None, max_price: int = None,
+                           min_area: float = None, max_area: float = None) -> int:
+    """
+    Добавляет подписку пользователя; если такая уже есть, возвращает ее ID
+    """
+    params = (user_id, city, subcategory_id, min_price, max_price, min_area, max_area)
+    async with aiosqlite.connect(DB_FILE) as db:
+        async with db.execute('''
+            SELECT id FROM subscriptions
+            WHERE user_id = ? AND city = ? AND subcategory_id IS ?
+                AND min_price IS ? AND max_price IS ? AND min_area IS ? AND max_area IS ?
+        ''', params) as cur:
+            row = await cur.fetchone()
+            if row:
+                return row[0]
+        
+        cur = await db.execute('''
+            INSERT INTO subscriptions (user_id, city, subcategory_id, min_price, max_price, min_area, max_area)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', params)
+        await db.commit()
+        return cur.lastrowid
+
+async def get_user_subscriptions(user_id: int):
+    """
+    Получает подписки пользователя (строки в порядке SUBSCRIPTION_COLUMNS)
+    """
+    async with aiosqlite.connect(DB_FILE) as db:
+        async with db.execute(
+            f"SELECT {SUBSCRIPTION_COLUMNS} FROM subscriptions WHERE user_id = ? ORDER BY id", (user_id,)
+        ) as cur:
+            return await cur.fetchall()
+
+async def get_all_subscriptions():
+    """
+    Получает все подписки (для краулера)
+    """
+    async with aiosqlite.connect(DB_FILE) as db:
+        async with db.execute(f"SELECT {SUBSCRIPTION_COLUMNS} FROM subscriptions ORDER BY id") as cur:
+            return await cur.fetchall()
+
+async def delete_subscription(user_id: int, subscription_id: int) -> bool:
+    """
+    Удаляет подписку пользователя
+    """
+    async with aiosqlite.connect(DB_FILE) as db:
+        cur = await db.execute(
+            "DELETE FROM subscriptions WHERE id = ? AND user_id = ?", (subscription_id, user_id)
+        )
+        await db.commit()
+        return cur.rowcount > 0
+
+async def delete_user_subscriptions(user_id: int):
+    """
+    Удаляет все подписки пользователя (например, если он заблокировал бота)
+    """
+    async with aiosqlite.connect(DB_FILE) as db:
+        await db.execute("DELETE FROM subscriptions WHERE user_id = ?", (user_id,))
+        await db.commit()
+
+async def get_known_listings(page_url: str) -> dict:
+    """
+    Получает объекты, уже виденные на странице каталога: ссылка -> цена
+    """
+    async with aiosqlite.connect(DB_FILE) as db:
+        async with db.execute(
+            "SELECT link, price_rub FROM known_listings WHERE page_url = ?", (page_url,)
+        ) as cur:
+            return {link: price for link, price in await cur.fetchall()}
+
+async def save_known_listings(page_url: str, listings, max_age_days: int = 30):
+    """
+    Запоминает объекты страницы каталога (ссылка, цена) и забывает те,
+    которых не было на странице дольше max_age_days
+    """
+    async with aiosqlite.connect(DB_FILE) as db:
+        await db.executemany('''
+            INSERT INTO known_listings (page_url, link, price_rub)
+            VALUES (?, ?, ?)
+            ON CONFLICT(page_url, link) DO UPDATE SET
+                price_rub = excluded.price_rub,
+                seen_at = CURRENT_TIMESTAMP
+        ''', [(page_url, link, price) for link, price in listings])
+        await db.execute(
+            "DELETE FROM known_listings WHERE page_url = ? AND seen_at < datetime('now', ?)",
+            (page_url, f'-{max_age_days} days')
+        )
+        await db.commit()
+
+async def append_price_history(prices, seen_at: float):
+    """
+    Добавляет в историю цены объектов: пары (ссылка, цена в рублях)
+    """
+    async with aiosqlite.connect(DB_FILE) as db:
+        await db.executemany(
+            "INSERT INTO price_history (link, price_rub, seen_at) VALUES (?, ?, ?)",
+            [(link, price, seen_at) for link, price in prices]
+        )
+        await db.commit()
+
+async def get_price_drops(since: float, min_drop_percent: float):
+    """
+    Находит объекты, цена которых с момента since упала больше чем на
+    min_drop_percent процентов по сравнению с предыдущей записью истории
+
+    Один запрос с оконной функцией LAG по записям, добавленным после since.
+
+    Returns:
+        Строки (ссылка, прежняя цена, новая цена)
+    """
+    async with aiosqlite.connect(DB_FILE) as db:
+        async with db.execute('''
+            SELECT link, MAX(previous_price), MIN(price_rub)
+            FROM (
+                SELECT link, price_rub, seen_at,
+                       LAG(price_rub) OVER (PARTITION BY link ORDER BY seen_at) AS previous_price
+                FROM price_history
+                WHERE link IN (SELECT link FROM price_history WHERE seen_at >= ?)
+            )
+            WHERE seen_at >= ? AND previous_price > 0
+                AND price_rub < previous_price * (1 - ? / 100.0)
+            GROUP BY link
+        ''', (since, since, min_drop_percent)) as cur:
+            return await cur.fetchall()
+
+def _json_default(obj):
+    """
+    Сериализует неизменяемые результаты расчетов (MappingProxyType) в JSON
+    """
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
 async def save_mortgage_calculation(user_id: int, calc_type: str, params: dict, result: dict):
     """
     Сохраняет результат расчета ипотеки для истории
@@ -113,7 +344,8 @@ async def save_mortgage_calculation(user_id: int, calc_type: str, params: dict,
         await db.execute('''
             INSERT INTO mortgage_calculations (user_id, calculation_type, parameters, result)
             VALUES (?, ?, ?, ?)
-        ''', (user_id, calc_type, json.dumps(params), json.dumps(result)))
+        ''', (user_id, calc_type, json.dumps(params, default=_json_default),
+              json.dumps(result, default=_json_default)))
         await db.commit()
 
 async def get_mortgage_history(user_id: int, limit: int = 10):
@@ -0,0 +1,382 @@
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from config import IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow есть в requirements.txt; без него картинки кешируются как есть
+    Image = None
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Параметры картинок для Telegram
+MAX_IMAGE_SIDE = 1280  # больше Telegram все равно не показывает
+JPEG_QUALITY = 85
+TELEGRAM_PHOTO_LIMIT = 10 * 1024 * 1024  # предельный размер фото для sendPhoto
+
+# Загрузка картинок с сайта
+FETCH_TIMEOUT = 15
+FETCH_CONNECTIONS = 8
+
+# Если отправка фото по URL заняла дольше, картинки с этого хоста какое-то
+# время загружаются ботом и отправляются байтами
+SLOW_URL_SEND = 3.0
+SLOW_HOST_TTL = 3600
+
+# Пул для пережатия и работы с диском, чтобы не блокировать event loop
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="image")
+
+_session: Optional[aiohttp.ClientSession] = None
+
+# Файлы дискового кеша: имя -> размер, от давно использованных к недавним
+_disk_index: "Optional[OrderedDict[str, int]]" = None
+_disk_bytes = 0
+_disk_lock = threading.Lock()
+
+# Загрузки, которые уже идут (чтобы одна картинка не качалась дважды)
+_in_flight: Dict[str, asyncio.Future] = {}
+
+# Хост -> время, до которого отправлять его картинки байтами
+_slow_hosts: Dict[str, float] = {}
+
+_stats = {'disk': 0, 'download': 0, 'error': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+# ========== ОБРАБОТКА КАРТИНОК ==========
+
+def _cache_name(url: str) -> str:
+    """Контентный адрес картинки: хеш URL"""
+    return hashlib.sha256(url.encode('utf-8')).hexdigest() + '.img'
+
+def recompress_image(data: bytes) -> Optional[bytes]:
+    """
+    Уменьшает картинку до MAX_IMAGE_SIDE и пережимает в JPEG
+
+    Исходные байты остаются, если картинка уже в JPEG/PNG нужного размера
+    и пережатие ее не уменьшает. Без Pillow исходные байты возвращаются,
+    если они укладываются в лимит Telegram.
+
+    Returns:
+        Байты картинки или None, если картинку нельзя отправить
+    """
+    if Image is None:
+        return data if len(data) <= TELEGRAM_PHOTO_LIMIT else None
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            fits = image.format in ('JPEG', 'PNG') and max(image.size) <= MAX_IMAGE_SIDE
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+
+            output = io.BytesIO()
+            image.save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    except Exception as e:
+        logger.warning(f"Не удалось обработать картинку ({len(data)} байт): {e}")
+        return None
+
+    result = output.getvalue()
+    if fits and len(data) <= min(len(result), TELEGRAM_PHOTO_LIMIT):
+        return data
+    return result
+
+# ========== ДИСКОВЫЙ КЕШ ==========
+
+def _load_disk_index():
+    """Читает содержимое каталога кеша (один раз, в пуле потоков)"""
+    global _disk_index, _disk_bytes
+
+    os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+    entries = []
+    for entry in os.scandir(IMAGE_CACHE_DIR):
+        if entry.is_file() and entry.name.endswith('.img'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+
+    _disk_index = OrderedDict((name, size) for _, name, size in sorted(entries))
+    _disk_bytes = sum(_disk_index.values())
+
+def _read_cached(name: str) -> Optional[bytes]:
+    """Читает картинку из кеша и отмечает ее как недавно использованную"""
+    with _disk_lock:
+        if _disk_index is None:
+            _load_disk_index()
+        if name not in _disk_index:
+            return None
+
+        path = os.path.join(IMAGE_CACHE_DIR, name)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            _forget(name)
+            return None
+
+        _disk_index.move_to_end(name)
+        return data
+
+def _forget(name: str):
+    """Убирает файл из индекса кеша"""
+    global _disk_bytes
+    _disk_bytes -= _disk_index.pop(name, 0)
+
+def _process_and_store(name: str, data: bytes) -> Optional[bytes]:
+    """Пережимает картинку и сохраняет на диск, вытесняя самые старые файлы"""
+    global _disk_bytes
+
+    image = recompress_image(data)
+    if image is None:
+        return None
+
+    with _disk_lock:
+        if _disk_index is None:
+            _load_disk_index()
+
+        path = os.path.join(IMAGE_CACHE_DIR, name)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(image)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить картинку в кеш: {e}")
+            return image
+
+        _forget(name)
+        _disk_index[name] = len(image)
+        _disk_bytes += len(image)
+
+        while _disk_bytes > IMAGE_CACHE_MAX_BYTES and len(_disk_index) > 1:
+            oldest = next(iter(_disk_index))
+            _forget(oldest)
+            try:
+                os.remove(os.path.join(IMAGE_CACHE_DIR, oldest))
+            except OSError:
+                pass
+
+    return image
+
+# ========== ЗАГРУЗКА ==========
+
+def _get_session() -> aiohttp.ClientSession:
+    """Общая сессия с пулом соединений для загрузки картинок"""
+    global _session
+
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=FETCH_CONNECTIONS, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT),
+            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+        )
+    return _session
+
+async def _download(url: str) -> Optional[bytes]:
+    """Скачивает картинку; None при ошибке или слишком большом файле"""
+    try:
+        async with _get_session().get(url) as response:
+            if response.status != 200:
+                logger.warning(f"Ошибка HTTP {response.status} при загрузке картинки {url}")
+                return None
+            if (response.content_length or 0) > 4 * TELEGRAM_PHOTO_LIMIT:
+                logger.warning(f"Картинка {url} слишком большая: {response.content_length} байт")
+                return None
+            return await response.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"Не удалось загрузить картинку {url}: {e}")
+        return None
+
+async def _fetch(url: str, name: str) -> Optional[bytes]:
+    """Кеш на диске или загрузка с пережатием"""
+    loop = asyncio.get_running_loop()
+
+    image = await loop.run_in_executor(_executor, _read_cached, name)
+    if image is not None:
+        _stats['disk'] += 1
+        return image
+
+    data = await _download(url)
+    if data is None:
+        _stats['error'] += 1
+        return None
+
+    image = await loop.run_in_executor(_executor, _process_and_store, name, data)
+    if image is None:
+        _stats['error'] += 1
+        return None
+
+    _stats['download'] += 1
+    _stats['bytes_in'] += len(data)
+    _stats['bytes_out'] += len(image)
+    logger.debug(f"Картинка {url}: {len(data)} -> {len(image)} байт")
+    return image
+
+async def get_image(url: str) -> Optional[bytes]:
+    """
+    Картинка, готовая к отправке в Telegram (JPEG не больше MAX_IMAGE_SIDE)
+
+    Args:
+        url: URL картинки на сайте
+
+    Returns:
+        Байты картинки или None, если ее не удалось получить
+    """
+    name = _cache_name(url)
+
+    future = _in_flight.get(name)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = asyncio.ensure_future(_fetch(url, name))
+    _in_flight[name] = future
+    try:
+        return await future
+    finally:
+        _in_flight.pop(name, None)
+
+# ========== ВЫБОР СПОСОБА ОТПРАВКИ ==========
+
+def prefer_upload(url: str) -> bool:
+    """Отправлять ли картинку байтами, а не ссылкой (хост недавно отдавал ее медленно)"""
+    host = urlsplit(url).hostname
+    until = _slow_hosts.get(host)
+    if until is None:
+        return False
+    if until < time.monotonic():
+        del _slow_hosts[host]
+        return False
+    return True
+
+def record_url_send(url: str, seconds: float):
+    """Запоминает, сколько Telegram загружал картинку по ссылке"""
+    if seconds > SLOW_URL_SEND:
+        host = urlsplit(url).hostname
+        if host not in _slow_hosts:
+            logger.info(f"Отправка фото по ссылке с {host} заняла {seconds:.1f} с, переключаюсь на загрузку байтами")
+        _slow_hosts[host] = time.monotonic() + SLOW_HOST_TTL
+
+def image_proxy_stats() -> Dict[str, Any]:
+    """
+    Статистика прокси картинок
+
+    Returns:
+        Словарь: попадания в дисковый кеш, загрузки, ошибки, байты до и
+        после пережатия, размер кеша и медленные хосты
+    """
+    now = time.monotonic()
+    return {
+        **_stats,
+        'cache_files': len(_disk_index) if _disk_index is not None else 0,
+        'cache_bytes': _disk_bytes,
+        'slow_hosts': sorted(host for host, until in _slow_hosts.items() if until > now),
+        'pillow': Image is not None
+    }
+
+async def close_image_proxy():
+    """Закрывает сессию загрузки картинок"""
+    global _session
+
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+async def _self_check():
+    """
+    Проверка на локальных картинках: поднимает HTTP-сервер с тестовыми
+    изображениями и прогоняет их через прокси дважды (загрузка, затем диск)
+
+    Проверяет, что картинки уменьшены до MAX_IMAGE_SIDE, второй проход
+    берется с диска, битая картинка не отправляется, а вытеснение держит
+    кеш в пределах IMAGE_CACHE_MAX_BYTES. Требует Pillow.
+    """
+    global IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, _disk_index, _disk_bytes
+    import tempfile
+    from aiohttp import web
+    from charts import render_payment_chart
+
+    assert Image is not None, "Для проверки нужен Pillow (pip install -r requirements.txt)"
+
+    fixtures = {'chart.png': render_payment_chart(5_000_000, 12.0, 20, 'annuity')}
+    # Шум плохо сжимается - как фотография с камеры
+    photo = Image.merge('RGB', [Image.effect_noise((4000, 3000), sigma) for sigma in (40, 60, 80)])
+    for name, image_format in (('photo.jpg', 'JPEG'), ('photo.png', 'PNG')):
+        buffer = io.BytesIO()
+        photo.save(buffer, image_format, **({'quality': 95} if image_format == 'JPEG' else {}))
+        fixtures[name] = buffer.getvalue()
+    fixtures['broken.jpg'] = b'not an image'
+    valid = [name for name in fixtures if name != 'broken.jpg']
+
+    async def serve(request: web.Request) -> web.Response:
+        return web.Response(body=fixtures[request.match_info['name']], content_type='image/png')
+
+    app = web.Application()
+    app.router.add_get('/{name}', serve)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    def cache_size() -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(IMAGE_CACHE_DIR) if entry.name.endswith('.img'))
+
+    with tempfile.TemporaryDirectory() as directory:
+        IMAGE_CACHE_DIR, _disk_index, _disk_bytes = directory, None, 0
+        try:
+            for attempt in ('загрузка', 'диск'):
+                disk_before = _stats['disk']
+                for name, data in fixtures.items():
+                    start = time.perf_counter()
+                    image = await get_image(f"http://127.0.0.1:{port}/{name}")
+                    elapsed = (time.perf_counter() - start) * 1000
+                    size = f"{len(image)} байт" if image is not None else "не отправить"
+                    print(f"{attempt:<9} {name:<11} {len(data):>9} -> {size:<14} {elapsed:7.1f} мс")
+
+                    if name == 'broken.jpg':
+                        assert image is None, "битая картинка не должна отправляться"
+                        continue
+                    assert image is not None, f"{name}: картинка не получена"
+                    with Image.open(io.BytesIO(image)) as result:
+                        assert max(result.size) <= MAX_IMAGE_SIDE, f"{name}: {result.size} больше {MAX_IMAGE_SIDE}"
+
+                if attempt == 'диск':
+                    assert _stats['disk'] - disk_before == len(valid), "второй проход должен идти с диска"
+
+            # Кеш на одну картинку: новые загрузки вытесняют старые файлы
+            IMAGE_CACHE_MAX_BYTES = max(_disk_index.values()) + 1
+            for name in valid:
+                await get_image(f"http://127.0.0.1:{port}/{name}?evict")
+                assert _disk_bytes == cache_size() <= IMAGE_CACHE_MAX_BYTES, "кеш больше IMAGE_CACHE_MAX_BYTES"
+            assert len(_disk_index) == 1, "вытеснение должно оставить одну картинку"
+
+            print(image_proxy_stats())
+            print("Все проверки пройдены")
+        finally:
+            await close_image_proxy()
+            await runner.cleanup()
+
+# Экспорт
+__all__ = [
+    'get_image',
+    'recompress_image',
+    'prefer_upload',
+    'record_url_send',
+    'image_proxy_stats',
+    'close_image_proxy'
+]
+
+if __name__ == "__main__":
+    asyncio.run(_self_check())
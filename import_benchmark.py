@@ -0,0 +1,140 @@
+"""
+Замер времени импорта модулей бота (python -X importtime)
+
+Использование:
+    python import_benchmark.py           # сравнить с import_baseline.json
+    python import_benchmark.py --update  # записать новый baseline
+
+Скрипт завершается с кодом 1, если модуль не импортируется, если импорт
+стал заметно медленнее baseline или если роутер при импорте снова тянет
+тяжелые модули, которые должны загружаться лениво (в хендлерах).
+Baseline с --update записывается, только если импортировались все модули.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+from typing import Dict, Optional, Tuple
+
+# Каталог проекта и файл с baseline
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(PROJECT_DIR, 'import_baseline.json')
+
+# Модули, время импорта которых отслеживаем
+MODULES = (
+    'captcha',
+    'choose_category',
+    'mortgage_bot',
+    'subscription_bot',
+    'metrics',
+    'parse_cards',
+    'mortgage_calculator',
+    'charts',
+    'schedule_export',
+)
+
+# Модули, которые роутеры не должны импортировать при старте
+LAZY_MODULES = {
+    'choose_category': ('bs4', 'parse_cards', 'mortgage_calculator', 'image_proxy', 'PIL'),
+    'mortgage_bot': ('mortgage_calculator', 'charts', 'schedule_export'),
+    'captcha': ('bs4', 'parse_cards', 'mortgage_calculator'),
+    'subscription_bot': ('bs4', 'parse_cards', 'mortgage_calculator', 'image_proxy', 'PIL'),
+}
+
+# Количество запусков (берется минимум) и допустимое замедление
+RUNS = 5
+TOLERANCE = 0.25
+SLACK_US = 5000
+
+def measure(module: str) -> Tuple[Optional[int], set, str]:
+    """
+    Импортирует модуль в чистом интерпретаторе с -X importtime
+
+    Returns:
+        Кортеж (накопленное время импорта в мкс или None, множество
+        импортированных модулей, текст ошибки)
+    """
+    best = None
+    imported = set()
+
+    for _ in range(RUNS):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=PROJECT_DIR, capture_output=True, text=True
+        )
+        if process.returncode != 0:
+            error = process.stderr.strip().splitlines()
+            return None, set(), error[-1] if error else f"код возврата {process.returncode}"
+
+        for line in process.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            name = name.strip()
+            imported.add(name)
+            if name == module:
+                value = int(cumulative)
+                best = value if best is None else min(best, value)
+
+    return best, imported, ""
+
+def load_baseline() -> Dict[str, int]:
+    """Читает baseline (модуль -> мкс)"""
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, encoding='utf-8') as f:
+        return json.load(f).get('modules', {})
+
+def save_baseline(results: Dict[str, int]):
+    """Записывает baseline вместе с версией интерпретатора"""
+    data = {
+        'python': platform.python_version(),
+        'runs': RUNS,
+        'modules': results,
+    }
+    with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+def main() -> int:
+    update = '--update' in sys.argv[1:]
+    baseline = load_baseline()
+    results = {}
+    failed = False
+
+    print(f"{'модуль':<22}{'сейчас, мс':>12}{'baseline, мс':>14}")
+    for module in MODULES:
+        elapsed, imported, error = measure(module)
+        if elapsed is None:
+            print(f"{module:<22}{'ошибка':>12}  ⚠ {error}")
+            failed = True
+            continue
+
+        results[module] = elapsed
+        expected = baseline.get(module)
+        status = ""
+        if expected is not None and elapsed > expected * (1 + TOLERANCE) + SLACK_US:
+            status = "  ⚠ медленнее baseline"
+            failed = True
+
+        eager = sorted(set(LAZY_MODULES.get(module, ())) & imported)
+        if eager:
+            status += f"  ⚠ импортирует при старте: {', '.join(eager)}"
+            failed = True
+
+        baseline_text = f"{expected / 1000:.1f}" if expected is not None else "—"
+        print(f"{module:<22}{elapsed / 1000:>12.1f}{baseline_text:>14}{status}")
+
+    if update:
+        if len(results) < len(MODULES):
+            print("\nBaseline не записан: не все модули импортировались")
+            return 1
+        save_baseline(results)
+        print(f"\nBaseline записан в {os.path.basename(BASELINE_FILE)}")
+        return 0
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,64 +1,58 @@
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from config import TELEGRAM_CHANNEL_URL
+from callbacks import CityCallback, SubcategoryCallback, MoreCallback, WatchCallback, UnwatchCallback, CaptchaCallback
+from catalog import (
+    categories, quarters, houses, newbuildings, land_plots, commercial, cities,
+    CATEGORY_BY_CODE, SUBCATEGORY_BY_NAME
+)
+import functools
 import random
+from typing import Callable, Dict
 
-# ========== ДАННЫЕ ДЛЯ КАТЕГОРИЙ НЕДВИЖИМОСТИ ==========
-
-# Основные категории недвижимости
-categories = {
-    "🏠 Квартиры": "kvartiry",
-    "🏡 Дома": "doma", 
-    "🏗️ Новостройки": "novostroyki",
-    "🏞️ Земельные участки": "zemelnie_uchastki",
-    "🏢 Коммерческая недвижимость": "commercy"
-}
-
-# Подкатегории для квартир
-quarters = {
-    "Студии": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/ctudii/",
-    "Комнаты": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/komnaty/",
-    "1-комнатные": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/odnokomnatnye/",
-    "2-комнатные": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/dvukhkomnatnye/",
-    "3-комнатные": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/3-komnatnye/",
-    "4-комнатные": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/4-komnatnye/",
-    "5+ комнат": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kvartiry/5-komnat/"
-}
-
-# Подкатегории для домов
-houses = {
-    "Дома бизнес-класс": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/doma/doma-biznes-klass/",
-    "Дуплекс": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/doma/dupleks/",
-    "Коттеджи": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/doma/kottedzhi/",
-    "Таунхаус": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/doma/taunkhaus/",
-    "Часть дома": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/doma/chast-doma/",
-    "Дома эконом-класса": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/doma/doma-ekonom-klassa/"
-}
-
-# Подкатегории для новостроек
-newbuildings = {
-    "Бизнес-класса": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/novostroyki/biznes-klassa/",
-    "Новостройки эконом-класса": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/novostroyki/novostroyki-ekonom-klassa/"
-}
-
-# Земельные участки (без подкатегорий)
-land_plots = {
-    "Земельные участки": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/zemelnye-uchastki/"
-}
-
-# Коммерческая недвижимость (без подкатегорий)
-commercial = {
-    "Коммерческая недвижимость": "https://www.xn----htbkhfjn2e0c.xn--p1ai/katalog-nedvizhimosti/kommercheskaya-nedvizhimost/"
-}
-
-# Города для поиска
-cities = {
-    "Сочи": "Sochi",
-    "Геленджик": "Gelendzhik",
-    "Новороссийск": "Novorosiisk"
-}
+# ========== РЕЕСТР СТАТИЧЕСКИХ КЛАВИАТУР ==========
+
+# Собранные клавиатуры: (имя функции, аргументы) -> клавиатура.
+# Один и тот же объект отдается всем хендлерам, поэтому изменять
+# полученную клавиатуру нельзя - для этого есть builder.build().
+_keyboard_cache: Dict[tuple, InlineKeyboardMarkup] = {}
+
+# Все статические билдеры: имя -> функция
+_static_builders: Dict[str, Callable] = {}
+
+def _keyboard_key(name: str, args: tuple, kwargs: dict) -> tuple:
+    """Ключ реестра; словари подкатегорий превращаются в кортежи"""
+    frozen = tuple(tuple(arg.items()) if isinstance(arg, dict) else arg for arg in args)
+    return (name, frozen, tuple(sorted(kwargs.items())))
+
+def static_keyboard(builder: Callable) -> Callable:
+    """
+    Декоратор для клавиатур без изменяемых данных
+
+    Клавиатура собирается один раз на набор аргументов (большая часть -
+    при импорте модуля, см. _prebuild_keyboards) и дальше берется из реестра.
+    Исходный билдер доступен как .build для свежей сборки.
+    """
+    _static_builders[builder.__name__] = builder
+
+    @functools.wraps(builder)
+    def wrapper(*args, **kwargs):
+        key = _keyboard_key(builder.__name__, args, kwargs)
+        markup = _keyboard_cache.get(key)
+        if markup is None:
+            markup = builder(*args, **kwargs)
+            _keyboard_cache[key] = markup
+        return markup
+
+    wrapper.build = builder
+    return wrapper
+
+def keyboard_registry_stats() -> Dict[str, int]:
+    """Количество собранных клавиатур в реестре"""
+    return {'keyboards': len(_keyboard_cache)}
 
 # ========== КЛАВИАТУРЫ ДЛЯ ПОИСКА НЕДВИЖИМОСТИ ==========
 
+@static_keyboard
 def keyboard_of_cities():
     """
     Создает клавиатуру для выбора города
@@ -68,11 +62,12 @@ def keyboard_of_cities():
         # Каждая кнопка - отдельный ряд
         buttons.append([InlineKeyboardButton(
             text=f"📍 {name}",
-            callback_data=f"city_{callback_data}"
+            callback_data=CityCallback(code=callback_data).pack()
         )])
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@static_keyboard
 def make_main_keyboard():
     """
     Создает главную клавиатуру для выбора категории недвижимости
@@ -85,6 +80,12 @@ def make_main_keyboard():
             callback_data=f"cat_{callback_data}"
         )])
     
+    # Подбор по цене и площади среди всех категорий
+    buttons.append([InlineKeyboardButton(
+        text="🔎 Подбор по цене и площади",
+        callback_data="filter_search"
+    )])
+    
     # Кнопка для выбора/смены города
     buttons.append([InlineKeyboardButton(
         text="📍 Выбрать/сменить город",
@@ -105,6 +106,7 @@ def make_main_keyboard():
 
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@static_keyboard
 def make_subcategory_keyboard(subcategories_dict, back_button=True):
     """
     Создает клавиатуру подкатегорий
@@ -118,7 +120,7 @@ def make_subcategory_keyboard(subcategories_dict, back_button=True):
     for name in subcategories_dict.keys():
         buttons.append([InlineKeyboardButton(
             text=name,
-            callback_data=f"sub_{name}"
+            callback_data=SubcategoryCallback(id=SUBCATEGORY_BY_NAME[name].id).pack()
         )])
     
     # Добавляем кнопку "Назад", если нужно
@@ -149,6 +151,7 @@ def make_property_keyboard(property_link):
         [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_main_menu")]
     ])
 
+@static_keyboard
 def make_city_selector_keyboard():
     """
     Клавиатура для быстрого выбора/смены города
@@ -158,7 +161,7 @@ def make_city_selector_keyboard():
     for name, callback_data in cities.items():
         buttons.append([InlineKeyboardButton(
             text=f"📍 {name}",
-            callback_data=f"city_{callback_data}"
+            callback_data=CityCallback(code=callback_data).pack()
         )])
     
     # Кнопка "Назад"
@@ -174,6 +177,63 @@ back_kb = InlineKeyboardMarkup(inline_keyboard=[
     [InlineKeyboardButton(text="⬅️ Главное меню", callback_data="back_to_main_menu")]
 ])
 
+def make_more_keyboard(token: str, offset: int, remaining: int, watch: bool = False):
+    """
+    Клавиатура под страницей выдачи: "Показать ещё", подписка и возврат в меню
+    
+    Args:
+        token: Токен сохраненной выдачи
+        offset: Сдвиг следующей страницы
+        remaining: Сколько объектов еще не показано (0 - без кнопки "Показать ещё")
+        watch: Показать кнопку подписки на новые объекты
+    """
+    buttons = []
+    
+    if remaining > 0:
+        buttons.append([InlineKeyboardButton(
+            text=f"⬇️ Показать ещё ({remaining})",
+            callback_data=MoreCallback(token=token, offset=offset).pack()
+        )])
+    
+    if watch:
+        buttons.append([InlineKeyboardButton(
+            text="🔔 Следить за новыми объектами",
+            callback_data=WatchCallback(token=token).pack()
+        )])
+    
+    buttons.append([InlineKeyboardButton(text="⬅️ Главное меню", callback_data="back_to_main_menu")])
+    
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def make_subscriptions_keyboard(subscriptions):
+    """
+    Клавиатура списка подписок: кнопка отмены для каждой
+    
+    Args:
+        subscriptions: Пары (ID подписки, номер в списке)
+    """
+    buttons = [
+        [InlineKeyboardButton(
+            text=f"❌ Отписаться от №{number}",
+            callback_data=UnwatchCallback(id=subscription_id).pack()
+        )]
+        for subscription_id, number in subscriptions
+    ]
+    
+    buttons.append([InlineKeyboardButton(text="⬅️ Главное меню", callback_data="back_to_main_menu")])
+    
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+@static_keyboard
+def get_filter_skip_keyboard():
+    """
+    Клавиатура шагов подбора по цене и площади
+    """
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="♾️ Любая", callback_data="filter_skip")],
+        [InlineKeyboardButton(text="⬅️ Главное меню", callback_data="back_to_main_menu")]
+    ])
+
 # ========== КЛАВИАТУРЫ ДЛЯ КАПЧИ ==========
 
 def make_captcha_kb(user_id: int, correct: int):
@@ -204,7 +264,7 @@ def make_captcha_kb(user_id: int, correct: int):
         # В callback_data передаем user_id и выбранный ответ
         row.append(InlineKeyboardButton(
             text=str(opt), 
-            callback_data=f"cap:{user_id}:{opt}"
+            callback_data=CaptchaCallback(user_id=user_id, answer=opt).pack()
         ))
         
         # Если в ряду уже 2 кнопки, добавляем ряд в клавиатуру
@@ -220,6 +280,7 @@ def make_captcha_kb(user_id: int, correct: int):
 
 # ========== КЛАВИАТУРЫ ДЛЯ ИПОТЕЧНОГО КАЛЬКУЛЯТОРА ==========
 
+@static_keyboard
 def get_mortgage_main_keyboard():
     """
     Главная клавиатура ипотечного калькулятора
@@ -230,10 +291,12 @@ def get_mortgage_main_keyboard():
         [InlineKeyboardButton(text="💰 Сколько могу взять", callback_data="calc_affordable")],
         [InlineKeyboardButton(text="⚖️ Сравнить варианты", callback_data="compare_scenarios")],
         [InlineKeyboardButton(text="📈 Досрочное погашение", callback_data="early_repayment")],
+        [InlineKeyboardButton(text="🔁 Регулярные досрочные", callback_data="recurring_extra")],
         [InlineKeyboardButton(text="📋 История расчетов", callback_data="mortgage_history")],
         [InlineKeyboardButton(text="⬅️ Главное меню", callback_data="back_to_main_menu")]
     ])
 
+@static_keyboard
 def get_mortgage_back_keyboard():
     """
     Клавиатура возврата в ипотечном калькуляторе
@@ -242,6 +305,36 @@ def get_mortgage_back_keyboard():
         [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_mortgage_menu")]
     ])
 
+def get_mortgage_result_keyboard(loan_amount: float, annual_rate: float, years: int,
+                                 payment_type: str = 'annuity'):
+    """
+    Клавиатура под результатом расчета платежа
+    
+    Параметры кредита зашиты в callback_data кнопок выгрузки графика,
+    потому что после расчета состояние FSM очищается.
+    """
+    schedule_params = f"{loan_amount:.2f}:{annual_rate:g}:{years}:{'d' if payment_type == 'differentiated' else 'a'}"
+    
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="📄 График (CSV)", callback_data=f"schedule_csv:{schedule_params}"),
+            InlineKeyboardButton(text="📊 График (Excel)", callback_data=f"schedule_xlsx:{schedule_params}")
+        ],
+        [
+            InlineKeyboardButton(text="🏠 С первонач. взносом", callback_data="calc_downpayment"),
+            InlineKeyboardButton(text="⚖️ Сравнить", callback_data="compare_scenarios")
+        ],
+        [
+            InlineKeyboardButton(text="📈 Досрочное погашение", callback_data="early_repayment"),
+            InlineKeyboardButton(text="📋 История", callback_data="mortgage_history")
+        ],
+        [
+            InlineKeyboardButton(text="🔄 Новый расчет", callback_data="calc_payment"),
+            InlineKeyboardButton(text="🏠 В меню", callback_data="back_to_mortgage_menu")
+        ]
+    ])
+
+@static_keyboard
 def get_payment_type_keyboard():
     """
     Выбор типа платежа (аннуитетный/дифференцированный)
@@ -252,6 +345,7 @@ def get_payment_type_keyboard():
         [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_mortgage_menu")]
     ])
 
+@static_keyboard
 def get_yes_no_keyboard(with_back=True):
     """
     Универсальная клавиатура Да/Нет
@@ -271,6 +365,7 @@ def get_yes_no_keyboard(with_back=True):
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@static_keyboard
 def get_compare_options_keyboard():
     """
     Клавиатура для сравнения вариантов ипотеки
@@ -283,6 +378,7 @@ def get_compare_options_keyboard():
         [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_mortgage_menu")]
     ])
 
+@static_keyboard
 def get_early_repayment_keyboard():
     """
     Клавиатура для выбора типа досрочного погашения
@@ -295,6 +391,31 @@ def get_early_repayment_keyboard():
         [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_mortgage_menu")]
     ])
 
+@static_keyboard
+def get_extra_frequency_keyboard():
+    """
+    Клавиатура для выбора периодичности регулярных досрочных платежей
+    """
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📅 Каждый месяц", callback_data="extra_freq_1")],
+        [InlineKeyboardButton(text="🗓️ Раз в квартал", callback_data="extra_freq_3")],
+        [InlineKeyboardButton(text="🎁 Три раза в год (премии)", callback_data="extra_freq_4")],
+        [InlineKeyboardButton(text="📆 Раз в год", callback_data="extra_freq_12")],
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_mortgage_menu")]
+    ])
+
+@static_keyboard
+def get_extra_type_keyboard():
+    """
+    Клавиатура для выбора типа регулярных досрочных платежей
+    """
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📅 Уменьшать срок", callback_data="extra_type_reduce_term")],
+        [InlineKeyboardButton(text="💵 Уменьшать платеж", callback_data="extra_type_reduce_payment")],
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_mortgage_menu")]
+    ])
+
+@static_keyboard
 def get_mortgage_history_keyboard():
     """
     Клавиатура для управления историей расчетов
@@ -308,6 +429,7 @@ def get_mortgage_history_keyboard():
     
 # ========== ГЛАВНАЯ КЛАВИАТУРА БОТА ==========
 
+@static_keyboard
 def get_main_bot_keyboard():
     """
     Главная клавиатура всего бота (показывается после капчи)
@@ -324,6 +446,7 @@ def get_main_bot_keyboard():
         [InlineKeyboardButton(text="📞 Связаться с нами", callback_data="contact_us")]
     ])
 
+@static_keyboard
 def get_about_keyboard():
     """
     Клавиатура для раздела 'О нас'
@@ -336,6 +459,7 @@ def get_about_keyboard():
         [InlineKeyboardButton(text="⬅️ Главное меню", callback_data="back_to_main_menu")]
     ])
 
+@static_keyboard
 def get_contact_keyboard():
     """
     Клавиатура для связи с нами
@@ -345,6 +469,7 @@ def get_contact_keyboard():
         [InlineKeyboardButton(text="⬅️ Главное меню", callback_data="back_to_main_menu")]
     ])
 
+@static_keyboard
 def get_numeric_keyboard():
     """
     Цифровая клавиатура для ввода чисел
@@ -373,6 +498,7 @@ def get_numeric_keyboard():
         [InlineKeyboardButton(text="⬅️ Отмена", callback_data="num_cancel")]
     ])
 
+@static_keyboard
 def get_confirmation_keyboard():
     """
     Клавиатура подтверждения действия
@@ -385,6 +511,7 @@ def get_confirmation_keyboard():
         [InlineKeyboardButton(text="✏️ Изменить", callback_data="confirm_edit")]
     ])
 
+@static_keyboard
 def get_help_keyboard():
     """
     Клавиатура помощи/справки
@@ -399,6 +526,7 @@ def get_help_keyboard():
 
 # ========== СПЕЦИАЛЬНЫЕ КЛАВИАТУРЫ ==========
 
+@static_keyboard
 def get_rate_keyboard():
     """
     Клавиатура для выбора процентной ставки
@@ -414,6 +542,7 @@ def get_rate_keyboard():
         [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_mortgage_menu")]
     ])
 
+@static_keyboard
 def get_years_keyboard():
     """
     Клавиатура для выбора срока кредита
@@ -429,6 +558,7 @@ def get_years_keyboard():
         [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_mortgage_menu")]
     ])
 
+@static_keyboard
 def get_downpayment_keyboard():
     """
     Клавиатура для выбора первоначального взноса
@@ -444,6 +574,32 @@ def get_downpayment_keyboard():
         [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_mortgage_menu")]
     ])
 
+def _prebuild_keyboards():
+    """Собирает статические клавиатуры при импорте модуля"""
+    for name, builder in _static_builders.items():
+        if name not in ('make_subcategory_keyboard', 'get_yes_no_keyboard'):
+            globals()[name]()
+    
+    for category in CATEGORY_BY_CODE.values():
+        category_keyboards[category.code] = make_subcategory_keyboard(category.subcategories)
+    
+    get_yes_no_keyboard()
+    get_yes_no_keyboard(with_back=False)
+
+# Клавиатуры подкатегорий по коду категории (заполняется при импорте)
+category_keyboards: Dict[str, InlineKeyboardMarkup] = {}
+
+def get_category_keyboard(category_code: str):
+    """
+    Клавиатура подкатегорий для категории из каталога
+
+    Returns:
+        Клавиатура или None, если категории нет
+    """
+    return category_keyboards.get(category_code)
+
+_prebuild_keyboards()
+
 # Экспорт всех клавиатур
 __all__ = [
     # Данные
@@ -452,6 +608,8 @@ __all__ = [
     
     # Клавиатуры недвижимости
     'keyboard_of_cities', 'make_main_keyboard', 'make_subcategory_keyboard',
+    'get_category_keyboard', 'get_filter_skip_keyboard', 'make_more_keyboard',
+    'make_subscriptions_keyboard',
     'make_property_keyboard', 'make_city_selector_keyboard', 'back_kb',
     
     # Клавиатуры капчи
@@ -459,13 +617,46 @@ __all__ = [
     
     # Клавиатуры ипотеки
     'get_mortgage_main_keyboard', 'get_mortgage_back_keyboard',
+    'get_mortgage_result_keyboard',
     'get_payment_type_keyboard', 'get_yes_no_keyboard',
     'get_compare_options_keyboard', 'get_early_repayment_keyboard',
+    'get_extra_frequency_keyboard', 'get_extra_type_keyboard',
     'get_mortgage_history_keyboard', 'get_rate_keyboard',
     'get_years_keyboard', 'get_downpayment_keyboard',
     
     # Основные клавиатуры
     'get_main_bot_keyboard', 'get_about_keyboard',
     'get_contact_keyboard', 'get_numeric_keyboard',
-    'get_confirmation_keyboard', 'get_help_keyboard'
-]
\ No newline at end of file
+    'get_confirmation_keyboard', 'get_help_keyboard',
+    
+    # Реестр статических клавиатур
+    'static_keyboard', 'keyboard_registry_stats'
+]
+
+# Замер: сколько памяти и времени уходит на сборку клавиатуры заново
+# и сколько - на получение готовой из реестра
+if __name__ == "__main__":
+    import time
+    import tracemalloc
+    
+    def measure(func, runs=1000):
+        start = time.perf_counter()
+        for _ in range(runs):
+            func()
+        elapsed = (time.perf_counter() - start) / runs
+        
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed * 1e6, peak
+    
+    print(f"{'клавиатура':<32}{'сборка, мкс':>12}{'реестр, мкс':>12}{'пик сборки, Б':>15}{'пик реестра, Б':>16}")
+    for name, builder in _static_builders.items():
+        cached = globals()[name]
+        args = (quarters,) if name == 'make_subcategory_keyboard' else ()
+        build_time, build_peak = measure(lambda: builder(*args))
+        cached_time, cached_peak = measure(lambda: cached(*args))
+        print(f"{name:<32}{build_time:>12.1f}{cached_time:>12.2f}{build_peak:>15}{cached_peak:>16}")
+    
+    print(f"\nРеестр: {keyboard_registry_stats()}")
\ No newline at end of file
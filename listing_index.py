@@ -0,0 +1,392 @@
+import bisect
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from catalog import Subcategory, subcategory_by_url
+from models import Property
+from text_search import TextIndex
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Через сколько секунд страница каталога в индексе считается устаревшей
+INDEX_MAX_AGE = 30 * 60
+
+# Город карточки, если его не удалось определить
+UNDETECTED_CITY = "Не определен"
+
+# Ключ корзины индекса: (город, код категории или None, ID подкатегории или None)
+BucketKey = Tuple[str, Optional[str], Optional[str]]
+
+def listing_cities(prop: Property) -> Tuple[str, ...]:
+    """Города, в которых объект должен находиться поиском"""
+    if prop.city != UNDETECTED_CITY:
+        return (prop.city,)
+    return prop.text_cities
+
+def _ambiguous_fingerprints(properties: Iterable[Property]) -> Set[str]:
+    """Отпечатки, которые на одной странице есть у нескольких ссылок"""
+    page_links: Dict[str, str] = {}
+    ambiguous = set()
+    for prop in properties:
+        if prop.fingerprint and page_links.setdefault(prop.fingerprint, prop.link) != prop.link:
+            ambiguous.add(prop.fingerprint)
+    return ambiguous
+
+def merge_keys(pages: Iterable[Iterable[Property]]) -> Dict[str, str]:
+    """
+    Ключи склейки дублей: ссылка -> отпечаток или сама ссылка
+
+    Разные ссылки с одним отпечатком (Property.fingerprint, без цены)
+    считаются одним объектом из разных подкатегорий. Если на одной
+    странице отпечаток есть у нескольких ссылок, это разные объекты
+    с одинаковым описанием ("1-к квартира, 38 м²" в одном ЖК), и такие
+    ссылки не склеиваются нигде.
+
+    Args:
+        pages: Объекты по страницам каталога
+
+    Returns:
+        Ключ для каждой ссылки
+    """
+    links: Dict[str, str] = {}
+    ambiguous = set()
+    for properties in pages:
+        properties = list(properties)
+        for prop in properties:
+            links[prop.link] = prop.fingerprint
+        ambiguous |= _ambiguous_fingerprints(properties)
+
+    return {
+        link: fingerprint if fingerprint and fingerprint not in ambiguous else link
+        for link, fingerprint in links.items()
+    }
+
+class SortedListings:
+    """
+    Объекты, отсортированные по числовому ключу (цене или площади)
+
+    Ключи хранятся отдельным списком, поэтому границы диапазона - два
+    bisect, O(log n), а объекты берутся срезом items.
+    """
+
+    __slots__ = ('keys', 'items')
+
+    def __init__(self, entries: Iterable[Tuple[Tuple[float, str], Property]] = ()):
+        entries = sorted(entries, key=lambda entry: entry[0])
+        self.keys = [key for key, _ in entries]
+        self.items = [item for _, item in entries]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def add(self, key: Tuple[float, str], item: Property):
+        """Вставляет объект на его место по ключу"""
+        position = bisect.bisect_left(self.keys, key)
+        self.keys.insert(position, key)
+        self.items.insert(position, item)
+
+    def remove(self, key: Tuple[float, str]) -> bool:
+        """Удаляет объект с ключом; False, если такого нет"""
+        position = bisect.bisect_left(self.keys, key)
+        if position == len(self.keys) or self.keys[position] != key:
+            return False
+        del self.keys[position]
+        del self.items[position]
+        return True
+
+    def bounds(self, low: Optional[float] = None, high: Optional[float] = None) -> Tuple[int, int]:
+        """Позиции [start, end) объектов с ключом в диапазоне [low, high]"""
+        start = bisect.bisect_left(self.keys, (low, '')) if low is not None else 0
+        end = bisect.bisect_right(self.keys, (high, '\uffff')) if high is not None else len(self.keys)
+        return start, max(start, end)
+
+class ListingIndex:
+    """
+    Индекс объектов по цене и площади для каждой пары (город, категория)
+
+    Наполняется результатами парсинга страниц каталога. Корзины строятся
+    для города целиком, для категории в городе и для подкатегории в городе,
+    поэтому запрос по любому из этих срезов не перебирает объекты. Один
+    объект из нескольких подкатегорий (один ключ склейки, как в merge_keys)
+    попадает в корзину города один раз.
+
+    Обновление страницы не пересматривает остальные страницы: из корзин
+    удаляются и вставляются заново только объекты с затронутыми ключами
+    склейки - ссылки старой и новой версии страницы и ссылки с теми же
+    отпечатками.
+    """
+
+    def __init__(self):
+        # URL страницы -> (подкатегория, объекты, время обновления)
+        self.pages: Dict[str, Tuple[Subcategory, List[Property], float]] = {}
+        self.by_price: Dict[BucketKey, SortedListings] = {}
+        self.by_area: Dict[BucketKey, SortedListings] = {}
+        self.text = TextIndex()
+        # Ссылка -> ключ склейки дублей (то же, что merge_keys по всем страницам)
+        self.keys: Dict[str, str] = {}
+        self.updates = 0
+        # URL страницы -> ссылка -> объект; отпечатки, неоднозначные на странице
+        self._page_links: Dict[str, Dict[str, Property]] = {}
+        self._page_ambiguous: Dict[str, Set[str]] = {}
+        # Ссылка -> отпечаток и страницы, на которых она есть
+        self._fingerprints: Dict[str, str] = {}
+        self._link_pages: Dict[str, Set[str]] = {}
+        # Отпечаток -> ссылки с ним и число страниц, где он неоднозначен
+        self._fingerprint_links: Dict[str, Set[str]] = {}
+        self._ambiguous: Dict[str, int] = {}
+        # Ключ склейки -> корзины, в которые вставлен объект, и сам объект
+        self._entries: Dict[str, Dict[BucketKey, Property]] = {}
+
+    def update(self, url: str, properties: List[Property]) -> bool:
+        """
+        Заменяет объекты страницы каталога в индексе
+
+        Индекс хранит сами объекты, а не копии: после передачи сюда их
+        нельзя изменять (для изменений - dataclasses.replace).
+
+        Returns:
+            False, если URL не относится к каталогу
+        """
+        subcategory = subcategory_by_url(url)
+        if subcategory is None:
+            return False
+
+        previous = self.pages.get(url)
+        page = {prop.link: prop for prop in properties}
+        old_page = self._page_links.get(url, {})
+        ambiguous = _ambiguous_fingerprints(properties)
+        old_ambiguous = self._page_ambiguous.get(url, set())
+
+        # Затронутые ссылки: обе версии страницы и все ссылки с их отпечатками
+        affected = set(old_page) | set(page)
+        fingerprints = {self._fingerprints[link] for link in affected if link in self._fingerprints}
+        fingerprints.update(prop.fingerprint for prop in page.values())
+        fingerprints |= ambiguous | old_ambiguous
+        fingerprints.discard("")
+        for fingerprint in fingerprints:
+            affected |= self._fingerprint_links.get(fingerprint, set())
+
+        for key in {self.keys[link] for link in affected if link in self.keys}:
+            self._unindex(key)
+
+        for link in old_page.keys() - page.keys():
+            pages = self._link_pages[link]
+            pages.discard(url)
+            if not pages:
+                del self._link_pages[link]
+                self._set_fingerprint(link, None)
+        for link, prop in page.items():
+            self._link_pages.setdefault(link, set()).add(url)
+            self._set_fingerprint(link, prop.fingerprint)
+
+        for fingerprint in old_ambiguous - ambiguous:
+            self._ambiguous[fingerprint] -= 1
+            if not self._ambiguous[fingerprint]:
+                del self._ambiguous[fingerprint]
+        for fingerprint in ambiguous - old_ambiguous:
+            self._ambiguous[fingerprint] = self._ambiguous.get(fingerprint, 0) + 1
+
+        self.pages[url] = (subcategory, list(properties), time.time())
+        self._page_links[url] = page
+        self._page_ambiguous[url] = ambiguous
+
+        keys = set()
+        for link in affected:
+            if link in self._link_pages:
+                fingerprint = self._fingerprints[link]
+                self.keys[link] = fingerprint if fingerprint and fingerprint not in self._ambiguous else link
+                keys.add(self.keys[link])
+            else:
+                self.keys.pop(link, None)
+        for key in keys:
+            self._index(key)
+        self.updates += 1
+
+        # Текстовый индекс обновляется по объектам, а не заново
+        links = {prop.link for prop in properties}
+        for prop in properties:
+            self.text.add(prop, url)
+        if previous is not None:
+            for prop in previous[1]:
+                if prop.link not in links:
+                    self.text.discard(prop.link, url)
+        return True
+
+    def missing_pages(self, urls: Iterable[str], max_age: float) -> List[str]:
+        """Страницы из списка, которых нет в индексе или которые старше max_age секунд"""
+        now = time.time()
+        return [
+            url for url in urls
+            if url not in self.pages or now - self.pages[url][2] > max_age
+        ]
+
+    def _set_fingerprint(self, link: str, fingerprint: Optional[str]):
+        """Запоминает отпечаток ссылки (None - ссылки больше нет в индексе)"""
+        old = self._fingerprints.pop(link, None)
+        if old:
+            links = self._fingerprint_links[old]
+            links.discard(link)
+            if not links:
+                del self._fingerprint_links[old]
+        if fingerprint is not None:
+            self._fingerprints[link] = fingerprint
+        if fingerprint:
+            self._fingerprint_links.setdefault(fingerprint, set()).add(link)
+
+    def _unindex(self, key: str):
+        """Удаляет объект с ключом склейки из всех корзин"""
+        for bucket, prop in self._entries.pop(key, {}).items():
+            for index, value in ((self.by_price, prop.price_rub), (self.by_area, prop.area_m2)):
+                if value is None:
+                    continue
+                listings = index[bucket]
+                listings.remove((value, key))
+                if not listings:
+                    del index[bucket]
+
+    def _index(self, key: str):
+        """Вставляет в корзины объект с ключом склейки (объекты без цены не индексируются)"""
+        if key in self._fingerprint_links and key not in self._ambiguous:
+            links = self._fingerprint_links[key]
+        else:
+            links = (key,)
+
+        entries: Dict[BucketKey, Property] = {}
+        for link in links:
+            for url in sorted(self._link_pages[link]):
+                prop = self._page_links[url][link]
+                if prop.price_rub is None:
+                    continue
+                subcategory = self.pages[url][0]
+                for city in listing_cities(prop):
+                    for bucket in ((city, None, None),
+                                   (city, subcategory.category, None),
+                                   (city, subcategory.category, subcategory.id)):
+                        entries[bucket] = prop
+        if not entries:
+            return
+
+        self._entries[key] = entries
+        for bucket, prop in entries.items():
+            for index, value in ((self.by_price, prop.price_rub), (self.by_area, prop.area_m2)):
+                if value is None:
+                    continue
+                listings = index.get(bucket)
+                if listings is None:
+                    listings = index[bucket] = SortedListings()
+                listings.add((value, key), prop)
+
+    def search(self, city: str, category: Optional[str] = None, subcategory: Optional[str] = None,
+               min_price: Optional[int] = None, max_price: Optional[int] = None,
+               min_area: Optional[float] = None, max_area: Optional[float] = None,
+               offset: int = 0, limit: Optional[int] = None) -> Tuple[List[Property], int]:
+        """
+        Объекты в диапазонах цены и площади, от дешевых к дорогим
+
+        Оба диапазона сначала оцениваются через bisect, затем перебираются
+        только объекты более узкого из них; второй диапазон проверяется
+        для каждого кандидата.
+
+        Returns:
+            Кортеж (страница объектов, сколько всего подходит)
+        """
+        key = (city, category, subcategory)
+        by_price = self.by_price.get(key)
+        if by_price is None:
+            return [], 0
+
+        if min_area is None and max_area is None:
+            start, end = by_price.bounds(min_price, max_price)
+            last = end if limit is None else min(end, start + offset + limit)
+            return by_price.items[start + offset:last], end - start
+
+        by_area = self.by_area.get(key)
+        if by_area is None:
+            return [], 0
+
+        price_start, price_end = by_price.bounds(min_price, max_price)
+        area_start, area_end = by_area.bounds(min_area, max_area)
+
+        if price_end - price_start <= area_end - area_start:
+            found = [
+                prop for prop in by_price.items[price_start:price_end]
+                if prop.area_m2 is not None
+                and (min_area is None or prop.area_m2 >= min_area)
+                and (max_area is None or prop.area_m2 <= max_area)
+            ]
+        else:
+            found = sorted(
+                (
+                    prop for prop in by_area.items[area_start:area_end]
+                    if (min_price is None or prop.price_rub >= min_price)
+                    and (max_price is None or prop.price_rub <= max_price)
+                ),
+                key=lambda prop: (prop.price_rub, prop.link)
+            )
+
+        last = None if limit is None else offset + limit
+        return found[offset:last], len(found)
+
+    def search_text(self, query: str, city: Optional[str] = None,
+                    limit: Optional[int] = None) -> List[Property]:
+        """
+        Полнотекстовый поиск по названию, локации и описанию объектов
+
+        Args:
+            query: Текст запроса
+            city: Город (None - все города)
+            limit: Сколько объектов вернуть (None - все)
+
+        Returns:
+            Объекты, самые подходящие первыми; из дублей - лучший
+        """
+        accept = (lambda prop: city in listing_cities(prop)) if city is not None else None
+        found = self.text.search(query, accept, limit)
+        unique = self._unique(prop for prop, _ in found)
+        if limit is not None and len(unique) < len(found):
+            # Дубли заняли часть limit - ищем без ограничения
+            unique = self._unique(prop for prop, _ in self.text.search(query, accept))[:limit]
+        return unique
+
+    def _unique(self, properties: Iterable[Property]) -> List[Property]:
+        """Объекты без дублей (по ключу склейки), в исходном порядке"""
+        seen = set()
+        unique = []
+        for prop in properties:
+            key = self.keys.get(prop.link, prop.link)
+            if key not in seen:
+                seen.add(key)
+                unique.append(prop)
+        return unique
+
+    def stats(self) -> Dict[str, Any]:
+        """Страниц, объектов с ценой и без, уникальных объектов, корзин, обновлений индекса и объектов в поиске"""
+        total = sum(len(properties) for _, properties, _ in self.pages.values())
+        priced = sum(
+            1 for _, properties, _ in self.pages.values() for prop in properties
+            if prop.price_rub is not None
+        )
+        return {
+            'pages': len(self.pages),
+            'listings': total,
+            'priced': priced,
+            'unique': len(set(self.keys.values())),
+            'buckets': len(self.by_price),
+            'updates': self.updates,
+            'searchable': len(self.text)
+        }
+
+# Общий индекс объектов бота
+LISTINGS = ListingIndex()
+
+# Экспорт
+__all__ = [
+    'LISTINGS',
+    'INDEX_MAX_AGE',
+    'ListingIndex',
+    'SortedListings',
+    'listing_cities',
+    'merge_keys'
+]
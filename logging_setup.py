@@ -0,0 +1,144 @@
+import atexit
+import copy
+import itertools
+import json
+import logging
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+# Формат текстовых логов
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Логгеры, которые пишут DEBUG на каждую карточку (их записи прореживаются)
+SAMPLED_LOGGERS = ('parse_cards',)
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-запись на строку"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Пропускает только каждую N-ю DEBUG-запись от выбранных логгеров
+
+    Записи уровня INFO и выше проходят всегда.
+    """
+
+    def __init__(self, loggers=SAMPLED_LOGGERS, every: int = 100):
+        super().__init__()
+        self.loggers = tuple(loggers)
+        self.every = max(int(every), 1)
+        self.counters: Dict[str, itertools.count] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        if not record.name.startswith(self.loggers):
+            return True
+        counter = self.counters.setdefault(record.name, itertools.count())
+        return next(counter) % self.every == 0
+
+class _PreparedQueueHandler(QueueHandler):
+    """
+    QueueHandler, который не форматирует запись в потоке бота
+
+    Стандартный prepare() вызывает format() еще до постановки в очередь;
+    здесь в очередь уходит копия записи с уже подставленными аргументами
+    (исходную запись видят другие хендлеры логгера), а форматирование
+    и запись на диск выполняет поток QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = logging.Formatter().formatException(record.exc_info)
+        record = copy.copy(record)
+        record.msg = message
+        record.args = None
+        record.exc_text = exc_text
+        record.exc_info = None
+        return record
+
+_listener: Optional[QueueListener] = None
+
+def setup_logging(level: int = logging.INFO, log_file: str = 'bot_debug.log',
+                  json_format: bool = False, max_bytes: int = 10 * 1024 * 1024,
+                  backup_count: int = 5, debug_sample_every: int = 100) -> QueueListener:
+    """
+    Настраивает неблокирующее логирование
+
+    Хендлеры бота кладут записи в очередь, а файл с ротацией по размеру
+    и консоль обслуживает отдельный поток QueueListener.
+
+    Args:
+        level: Уровень логирования
+        log_file: Файл логов
+        json_format: Писать в файл JSON вместо текста
+        max_bytes: Размер файла, после которого он ротируется
+        backup_count: Сколько старых файлов хранить
+        debug_sample_every: Сохранять каждую N-ю DEBUG-запись парсера
+
+    Returns:
+        Запущенный QueueListener
+    """
+    global _listener
+
+    stop_logging()
+
+    file_handler = RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+    )
+    file_handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT))
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _PreparedQueueHandler(log_queue)
+    queue_handler.addFilter(DebugSamplingFilter(every=debug_sample_every))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+
+    return _listener
+
+def stop_logging():
+    """Дописывает оставшиеся записи из очереди и останавливает поток логирования"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(stop_logging)
+
+# Экспорт
+__all__ = [
+    'setup_logging',
+    'stop_logging',
+    'JsonFormatter',
+    'DebugSamplingFilter'
+]
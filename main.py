@@ -2,22 +2,29 @@ from aiogram import Bot, Dispatcher
 import asyncio
 import logging
 from dotenv import load_dotenv
-from config import TOKEN, init_db, DB_FILE
+from config import (
+    TOKEN, init_db, DB_FILE, METRICS_HOST, METRICS_PORT, SUBSCRIPTION_CHECK_INTERVAL,
+    LOG_FILE, LOG_LEVEL, LOG_JSON, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_DEBUG_SAMPLE_EVERY
+)
+from logging_setup import setup_logging, stop_logging
 from captcha import start_router
 from choose_category import category_router
 from mortgage_bot import mortgage_router
+from subscription_bot import subscription_router
+from subscriptions import start_subscription_crawler, stop_subscription_crawler
+from metrics import setup_metrics, start_metrics_server
 import os
 
 load_dotenv()
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot_debug.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
+# Настройка логирования (запись в файл и консоль идет в отдельном потоке)
+setup_logging(
+    level=getattr(logging, LOG_LEVEL.upper(), logging.INFO),
+    log_file=LOG_FILE,
+    json_format=LOG_JSON,
+    max_bytes=LOG_MAX_BYTES,
+    backup_count=LOG_BACKUP_COUNT,
+    debug_sample_every=LOG_DEBUG_SAMPLE_EVERY
 )
 
 # Инициализация бота и диспетчера
@@ -28,13 +35,29 @@ dp = Dispatcher()
 dp.include_router(start_router)      # Капча и начало работы
 dp.include_router(category_router)   # Поиск недвижимости
 dp.include_router(mortgage_router)   # Ипотечный калькулятор
+dp.include_router(subscription_router)  # Подписки на новые объекты
+
+# Замеры времени и ошибок хендлеров
+setup_metrics(dp)
 
 async def main():
     """Главная функция запуска бота"""
-    # Инициализируем базу данных, если её нет
+    # Инициализируем базу данных; в существующей создаются недостающие таблицы
     if not os.path.exists(DB_FILE):
-        await init_db()
         logging.info("База данных инициализирована")
+    await init_db()
+    
+    # Локальный HTTP-сервер с метриками
+    metrics_runner = None
+    if METRICS_PORT:
+        try:
+            metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+        except OSError as e:
+            logging.error(f"Не удалось запустить сервер метрик: {e}")
+    
+    # Фоновая проверка подписок и очередь уведомлений
+    if SUBSCRIPTION_CHECK_INTERVAL:
+        start_subscription_crawler(bot)
     
     logging.info("Бот запускается...")
     
@@ -44,7 +67,13 @@ async def main():
     except Exception as e:
         logging.error(f"Ошибка при запуске бота: {e}")
     finally:
+        await stop_subscription_crawler()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        from image_proxy import close_image_proxy
+        await close_image_proxy()
         await bot.session.close()
+        stop_logging()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
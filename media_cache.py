@@ -0,0 +1,144 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, Message
+
+from config import get_media_file_id, save_media_file_id, delete_media_file_id
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Сколько file_id держать в памяти (остальные - в SQLite)
+MEDIA_CACHE_SIZE = 2048
+
+# ========== КЕШ FILE_ID ФОТОГРАФИЙ ==========
+# Telegram скачивает фото по URL при каждой отправке. После первой отправки
+# у фото есть file_id, и повторная отправка по нему не требует загрузки.
+
+_file_ids: "OrderedDict[str, str]" = OrderedDict()
+_stats = {'memory': 0, 'db': 0, 'miss': 0, 'stale': 0}
+
+def _remember(url: str, file_id: str):
+    """Кладет file_id в LRU в памяти"""
+    _file_ids[url] = file_id
+    _file_ids.move_to_end(url)
+    if len(_file_ids) > MEDIA_CACHE_SIZE:
+        _file_ids.popitem(last=False)
+
+async def get_file_id(url: str) -> Optional[str]:
+    """
+    Ищет file_id для URL фотографии: сначала в памяти, затем в SQLite
+
+    Returns:
+        file_id или None, если фото по этому URL еще не отправлялось
+    """
+    file_id = _file_ids.get(url)
+    if file_id is not None:
+        _file_ids.move_to_end(url)
+        _stats['memory'] += 1
+        return file_id
+
+    file_id = await get_media_file_id(url)
+    if file_id is not None:
+        _remember(url, file_id)
+        _stats['db'] += 1
+        return file_id
+
+    _stats['miss'] += 1
+    return None
+
+async def answer_cached_photo(message: Message, url: str, **kwargs: Any) -> Message:
+    """
+    Отправляет фото по URL, используя file_id из кеша, если он есть
+
+    Args:
+        message: Сообщение, в чат которого отправляем
+        url: URL фотографии на сайте
+        **kwargs: Параметры answer_photo (caption, reply_markup, parse_mode...)
+
+    Returns:
+        Отправленное сообщение
+    """
+    file_id = await get_file_id(url)
+
+    if file_id is not None:
+        try:
+            return await message.answer_photo(photo=file_id, **kwargs)
+        except TelegramBadRequest as e:
+            # file_id устарел или принадлежит другому боту - загружаем заново
+            logger.warning(f"file_id для {url} не принят Telegram: {e}")
+            _stats['stale'] += 1
+            _file_ids.pop(url, None)
+            await delete_media_file_id(url)
+
+    sent = await _answer_new_photo(message, url, **kwargs)
+
+    if sent.photo:
+        file_id = sent.photo[-1].file_id
+        _remember(url, file_id)
+        try:
+            await save_media_file_id(url, file_id)
+        except Exception as e:
+            logger.error(f"Не удалось сохранить file_id для {url}: {e}")
+
+    return sent
+
+async def _answer_uploaded(message: Message, url: str, **kwargs: Any) -> Optional[Message]:
+    """Отправляет фото байтами через image_proxy; None, если картинку не удалось получить"""
+    from image_proxy import get_image
+    
+    image = await get_image(url)
+    if image is None:
+        return None
+    return await message.answer_photo(photo=BufferedInputFile(image, filename="photo.jpg"), **kwargs)
+
+async def _answer_new_photo(message: Message, url: str, **kwargs: Any) -> Message:
+    """
+    Первая отправка фото: по ссылке, а если хост отдает картинки медленно
+    или Telegram не смог их скачать - байтами из image_proxy
+    """
+    from image_proxy import prefer_upload, record_url_send
+    
+    if prefer_upload(url):
+        sent = await _answer_uploaded(message, url, **kwargs)
+        if sent is not None:
+            return sent
+
+    start = time.perf_counter()
+    try:
+        sent = await message.answer_photo(photo=url, **kwargs)
+    except TelegramBadRequest as e:
+        logger.warning(f"Telegram не загрузил фото по ссылке {url}: {e}")
+        sent = await _answer_uploaded(message, url, **kwargs)
+        if sent is None:
+            raise
+        return sent
+
+    record_url_send(url, time.perf_counter() - start)
+    return sent
+
+def media_cache_stats() -> Dict[str, Any]:
+    """
+    Статистика кеша file_id
+
+    Returns:
+        Словарь: попадания в памяти и в БД, промахи, устаревшие file_id,
+        размер кеша в памяти и доля попаданий (%)
+    """
+    hits = _stats['memory'] + _stats['db']
+    total = hits + _stats['miss']
+    return {
+        **_stats,
+        'size': len(_file_ids),
+        'hit_rate': round(hits / total * 100, 1) if total else 0.0
+    }
+
+# Экспорт
+__all__ = [
+    'answer_cached_photo',
+    'get_file_id',
+    'media_cache_stats'
+]
@@ -0,0 +1,297 @@
+import asyncio
+import bisect
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from aiohttp import web
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм (в секундах), как в клиентах Prometheus
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Как часто замерять задержку event loop (в секундах)
+LOOP_LAG_INTERVAL = 1.0
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(**labels: str) -> Labels:
+    """Нормализует метки в хешируемый ключ"""
+    return tuple(sorted(labels.items()))
+
+def _escape(value: str) -> str:
+    """Экранирует значение метки"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    """Форматирует метки в синтаксисе Prometheus"""
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (f'{name}="{_escape(value)}"' for name, value in items)
+    return "{" + ",".join(escaped) + "}"
+
+class Counter:
+    """Монотонный счетчик с метками"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = _labels(**labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self.values.get(_labels(**labels), 0)
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return "\n".join(lines)
+
+class Gauge:
+    """Мгновенное значение; может вычисляться при каждом экспорте"""
+
+    def __init__(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.values: Dict[Labels, float] = {}
+
+    def set(self, value: float, **labels: str):
+        self.values[_labels(**labels)] = value
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        values = dict(self.values)
+        if self.function is not None:
+            try:
+                values[()] = self.function()
+            except Exception as e:
+                logger.error(f"Ошибка при вычислении метрики {self.name}: {e}")
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return "\n".join(lines)
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами"""
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # метки -> [счетчики по корзинам..., сумма, количество]
+        self.values: Dict[Labels, list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = _labels(**labels)
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            state[index] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    @contextmanager
+    def timer(self, **labels: str):
+        """Замеряет время выполнения блока with"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def summary(self, **labels: str) -> Dict[str, float]:
+        """Количество, сумма и среднее для набора меток"""
+        state = self.values.get(_labels(**labels))
+        if not state or not state[-1]:
+            return {'count': 0, 'sum': 0.0, 'avg': 0.0}
+        return {'count': state[-1], 'sum': state[-2], 'avg': state[-2] / state[-1]}
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, state in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', repr(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', '+Inf'))} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {state[-1]}")
+        return "\n".join(lines)
+
+class Registry:
+    """Набор метрик, которые отдаются на /metrics"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Any] = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self.metrics.get(name) or self.register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.metrics.get(name) or self.register(Gauge(name, documentation, function))
+
+    def histogram(self, name: str, documentation: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.metrics.get(name) or self.register(Histogram(name, documentation, buckets))
+
+    def expose(self) -> str:
+        return "\n".join(metric.expose() for metric in self.metrics.values()) + "\n"
+
+# Общий реестр метрик бота
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.histogram(
+    "bot_handler_duration_seconds", "Время обработки апдейта (фильтры и хендлер)"
+)
+HANDLER_ERRORS = REGISTRY.counter(
+    "bot_handler_errors_total", "Необработанные исключения в хендлерах"
+)
+LOOP_LAG = REGISTRY.gauge(
+    "bot_event_loop_lag_seconds", "Задержка event loop относительно расписания"
+)
+
+def callback_prefix(data: Optional[str]) -> str:
+    """
+    Префикс callback_data без изменяемой части
+
+    "sub_Квартиры" -> "sub", "schedule_csv:..." -> "schedule", "cap:1:5" -> "cap"
+    """
+    if not data:
+        return ""
+    for index, char in enumerate(data):
+        if char in "_:":
+            return data[:index]
+    return data
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Замеряет время и ошибки обработки сообщений и callback-запросов
+
+    Регистрируется как outer middleware, поэтому учитывает и время фильтров.
+    Имя сработавшего хендлера подставляет HandlerNameMiddleware (inner).
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        span = {'handler': 'unhandled'}
+        data['metrics_span'] = span
+
+        if isinstance(event, CallbackQuery):
+            event_type, prefix = "callback_query", callback_prefix(event.data)
+        elif isinstance(event, Message):
+            event_type, prefix = "message", ""
+        else:
+            event_type, prefix = type(event).__name__.lower(), ""
+
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(event=event_type, handler=span['handler'], prefix=prefix)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(
+                time.perf_counter() - start,
+                event=event_type, handler=span['handler'], prefix=prefix
+            )
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """Сообщает MetricsMiddleware имя выбранного хендлера"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        span = data.get('metrics_span')
+        handler_object = data.get('handler')
+        if span is not None and handler_object is not None:
+            callback = handler_object.callback
+            span['handler'] = f"{callback.__module__}.{getattr(callback, '__name__', 'handler')}"
+        return await handler(event, data)
+
+def fsm_storage_size(dispatcher: Dispatcher) -> int:
+    """Количество записей в MemoryStorage (для других хранилищ - 0)"""
+    storage = getattr(dispatcher.storage, 'storage', None)
+    return len(storage) if storage is not None else 0
+
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL):
+    """Фоновая задача: насколько позже запланированного просыпается event loop"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG.set(max(loop.time() - start - interval, 0.0))
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    """Отдает метрики в текстовом формате Prometheus"""
+    return web.Response(text=REGISTRY.expose(), content_type="text/plain", charset="utf-8")
+
+def setup_metrics(dispatcher: Dispatcher):
+    """
+    Подключает middleware замеров к диспетчеру
+
+    Args:
+        dispatcher: Диспетчер бота
+    """
+    for observer in (dispatcher.message, dispatcher.callback_query):
+        observer.outer_middleware(MetricsMiddleware())
+        observer.middleware(HandlerNameMiddleware())
+
+    REGISTRY.gauge(
+        "bot_fsm_storage_records", "Количество записей в хранилище FSM",
+        lambda: fsm_storage_size(dispatcher)
+    )
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """
+    Запускает локальный HTTP-сервер с /metrics и замер задержки event loop
+
+    Returns:
+        AppRunner, который нужно закрыть при остановке бота
+    """
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    app.on_startup.append(_start_lag_task)
+    app.on_cleanup.append(_stop_lag_task)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return runner
+
+async def _start_lag_task(app: web.Application):
+    app['lag_task'] = asyncio.create_task(monitor_loop_lag())
+
+async def _stop_lag_task(app: web.Application):
+    app['lag_task'].cancel()
+
+# Экспорт
+__all__ = [
+    'REGISTRY',
+    'setup_metrics',
+    'start_metrics_server',
+    'callback_prefix'
+]
@@ -0,0 +1,45 @@
+import sys
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# ========== КАРТОЧКА НЕДВИЖИМОСТИ ==========
+
+@dataclass(slots=True)
+class Property:
+    """
+    Объект недвижимости, разобранный из карточки на сайте
+
+    Без __dict__ и с общими (интернированными) строками города и локации:
+    сотни карточек в кеше разделяют одни и те же объекты строк.
+    """
+    title: str
+    price: str
+    city: str
+    link: str
+    image: Optional[str] = None
+    # Детальная локация; пустая, если совпадает с городом
+    location: str = ""
+    card_id: str = ""
+    # Нормализованные цена (руб., нижняя граница диапазона) и площадь (м²)
+    price_rub: Optional[int] = None
+    area_m2: Optional[float] = None
+    # Города, упомянутые в тексте карточки (только если город не определен по структуре)
+    text_cities: Tuple[str, ...] = ()
+    # Полный текст карточки - только при PARSER_KEEP_FULL_TEXT
+    full_text: Optional[str] = None
+    # Краткое описание (для полнотекстового поиска), не длиннее DESCRIPTION_MAX_CHARS
+    description: str = ""
+    # Отпечаток содержимого (название и локация, без цены) для склейки дублей с разными ссылками
+    fingerprint: str = ""
+
+    def __post_init__(self):
+        self.city = sys.intern(self.city)
+        if self.location:
+            self.location = sys.intern(self.location)
+        if self.text_cities:
+            self.text_cities = tuple(sys.intern(city) for city in self.text_cities)
+
+# Экспорт
+__all__ = [
+    'Property'
+]
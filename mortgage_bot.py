@@ -1,20 +1,22 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 import logging
 from typing import Dict, Any, Optional
 import re
 
-from mortgage_calculator import MortgageCalculator
 from keyboards import (
     get_mortgage_main_keyboard, get_mortgage_back_keyboard,
     get_payment_type_keyboard, get_compare_options_keyboard, 
     get_early_repayment_keyboard, get_mortgage_history_keyboard,
     get_rate_keyboard, get_years_keyboard, get_downpayment_keyboard,
+    get_extra_frequency_keyboard, get_extra_type_keyboard,
+    get_mortgage_result_keyboard,
 )
 from textformat import format_mortgage_result, format_currency, format_error_message
 from config import save_mortgage_calculation, get_mortgage_history
+from callbacks import CallbackTable
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -22,6 +24,9 @@ logger = logging.getLogger(__name__)
 # Создаем роутер для ипотечного калькулятора
 mortgage_router = Router()
 
+# Таблица маршрутов callback-запросов роутера
+mortgage_callbacks = CallbackTable(mortgage_router)
+
 # Состояния FSM для ипотечного калькулятора
 class MortgageStates(StatesGroup):
     # Основные состояния
@@ -49,6 +54,14 @@ class MortgageStates(StatesGroup):
     waiting_for_early_amount = State()
     waiting_for_early_type = State()
     
+    # Для регулярных досрочных платежей
+    waiting_for_extra_loan = State()
+    waiting_for_extra_rate = State()
+    waiting_for_extra_years = State()
+    waiting_for_extra_amount = State()
+    waiting_for_extra_frequency = State()
+    waiting_for_extra_type = State()
+    
     # Для истории расчетов
     viewing_history = State()
 
@@ -100,8 +113,16 @@ async def save_calculation_to_history(user_id: int, calc_type: str,
     except Exception as e:
         logger.error(f"Ошибка при сохранении расчета в историю: {e}")
 
+async def send_chart(message: Message, chart, caption: str):
+    """Отправляет график; ошибка отрисовки не должна ломать сам расчет"""
+    try:
+        png = await chart
+        await message.answer_photo(BufferedInputFile(png, filename="chart.png"), caption=caption)
+    except Exception as e:
+        logger.error(f"Ошибка при отправке графика: {e}", exc_info=True)
+
 # Основные обработчики
-@mortgage_router.callback_query(F.data == "mortgage_calculator")
+@mortgage_callbacks.exact("mortgage_calculator")
 async def cmd_mortgage(call: CallbackQuery):
     """
     Главное меню ипотечного калькулятора
@@ -116,13 +137,14 @@ async def cmd_mortgage(call: CallbackQuery):
         "⚖️ *Дополнительные функции:*\n"
         "• Сравнить несколько вариантов\n"
         "• Досрочное погашение\n"
+        "• Регулярные досрочные платежи\n"
         "• История ваших расчетов",
         reply_markup=get_mortgage_main_keyboard(),
         parse_mode="Markdown"
     )
     await call.answer()
 
-@mortgage_router.callback_query(F.data == "back_to_main_menu")
+@mortgage_callbacks.exact("back_to_main_menu")
 async def back_to_main_menu_from_mortgage(call: CallbackQuery, state: FSMContext):
     """
     Возврат в главное меню бота
@@ -158,7 +180,7 @@ async def back_to_main_menu_from_mortgage(call: CallbackQuery, state: FSMContext
         await call.message.answer("❌ Произошла ошибка")
         await call.answer()
 
-@mortgage_router.callback_query(F.data == "back_to_mortgage_menu")
+@mortgage_callbacks.exact("back_to_mortgage_menu")
 async def back_to_mortgage_menu(call: CallbackQuery):
     """
     Возврат в меню ипотечного калькулятора
@@ -171,7 +193,7 @@ async def back_to_mortgage_menu(call: CallbackQuery):
     await call.answer()
 
 # Расчет обычного платежа
-@mortgage_router.callback_query(F.data == "calc_payment")
+@mortgage_callbacks.exact("calc_payment")
 async def start_calculation(call: CallbackQuery, state: FSMContext):
     """
     Начало расчета обычного платежа
@@ -227,7 +249,7 @@ async def process_amount(message: Message, state: FSMContext):
     )
     await state.set_state(MortgageStates.waiting_for_payment_type)
 
-@mortgage_router.callback_query(F.data == "payment_type_annuity")
+@mortgage_callbacks.exact("payment_type_annuity")
 async def process_payment_type_annuity(call: CallbackQuery, state: FSMContext):
     """
     Выбран аннуитетный тип платежа
@@ -248,7 +270,7 @@ async def process_payment_type_annuity(call: CallbackQuery, state: FSMContext):
     await state.set_state(MortgageStates.waiting_for_rate)
     await call.answer("✅ Аннуитетные платежи")
 
-@mortgage_router.callback_query(F.data == "payment_type_diff")
+@mortgage_callbacks.exact("payment_type_diff")
 async def process_payment_type_diff(call: CallbackQuery, state: FSMContext):
     """
     Выбран дифференцированный тип платежа
@@ -302,7 +324,7 @@ async def process_rate(message: Message, state: FSMContext):
         )
 
 # Обработчики быстрого выбора ставки
-@mortgage_router.callback_query(F.data.startswith("rate_"))
+@mortgage_callbacks.prefix("rate_")
 async def process_quick_rate(call: CallbackQuery, state: FSMContext):
     """
     Быстрый выбор процентной ставки
@@ -350,7 +372,7 @@ async def process_quick_rate(call: CallbackQuery, state: FSMContext):
     await call.answer()
 
 # Обработчики быстрого выбора срока
-@mortgage_router.callback_query(F.data.startswith("years_"))
+@mortgage_callbacks.prefix("years_")
 async def process_quick_years(call: CallbackQuery, state: FSMContext):
     """
     Быстрый выбора срока кредита
@@ -418,6 +440,9 @@ async def perform_calculation(call: CallbackQuery, state: FSMContext):
     """
     Выполнение расчета ипотеки
     """
+    from mortgage_calculator import MortgageCalculator
+    from charts import get_payment_chart, PAYMENT_CHART_LEGEND
+    
     user_id = call.from_user.id
     data = await state.get_data()
     
@@ -450,6 +475,17 @@ async def perform_calculation(call: CallbackQuery, state: FSMContext):
             )
             return
         
+        # Добавляем ПСК (с учетом страховки от остатка долга)
+        effective = MortgageCalculator.calculate_effective_rate(
+            loan_amount, annual_rate, years, payment_type=payment_type
+        )
+        if effective.get('success', False):
+            result = {
+                **result,
+                'effective_rate': effective['effective_rate'],
+                'insurance_percent': effective['insurance_percent']
+            }
+        
         # Форматируем результат
         result_text = format_mortgage_result(result)
         
@@ -471,27 +507,22 @@ async def perform_calculation(call: CallbackQuery, state: FSMContext):
             reply_markup=get_mortgage_back_keyboard()
         )
         
+        # График остатка долга и структуры платежа
+        await send_chart(
+            call.message,
+            get_payment_chart(loan_amount, annual_rate, years, payment_type),
+            f"📈 Остаток долга и структура платежа\n{PAYMENT_CHART_LEGEND}"
+        )
+        
         # Предлагаем дополнительные действия
         await call.message.answer(
             "🔄 *Что дальше?*\n\n"
+            "• Скачать полный график платежей\n"
             "• Рассчитать с первоначальным взносом\n"
             "• Сравнить с другим вариантом\n"
             "• Рассчитать досрочное погашение\n"
             "• Вернуться в меню",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [
-                    InlineKeyboardButton(text="🏠 С первонач. взносом", callback_data="calc_downpayment"),
-                    InlineKeyboardButton(text="⚖️ Сравнить", callback_data="compare_scenarios")
-                ],
-                [
-                    InlineKeyboardButton(text="📈 Досрочное погашение", callback_data="early_repayment"),
-                    InlineKeyboardButton(text="📋 История", callback_data="mortgage_history")
-                ],
-                [
-                    InlineKeyboardButton(text="🔄 Новый расчет", callback_data="calc_payment"),
-                    InlineKeyboardButton(text="🏠 В меню", callback_data="back_to_mortgage_menu")
-                ]
-            ])
+            reply_markup=get_mortgage_result_keyboard(loan_amount, annual_rate, years, payment_type)
         )
         
         # Очищаем состояние
@@ -504,8 +535,51 @@ async def perform_calculation(call: CallbackQuery, state: FSMContext):
             reply_markup=get_mortgage_back_keyboard()
         )
 
+# Выгрузка полного графика платежей
+@mortgage_callbacks.prefix("schedule_")
+async def export_schedule(call: CallbackQuery):
+    """
+    Отправка полного графика платежей файлом (CSV или Excel)
+    """
+    from schedule_export import schedule_to_csv, schedule_to_xlsx
+    
+    try:
+        # callback_data: "schedule_<формат>:сумма:ставка:срок:тип"
+        export_format, amount_str, rate_str, years_str, type_code = call.data.split(":")
+        loan_amount = float(amount_str)
+        annual_rate = float(rate_str)
+        years = int(years_str)
+        payment_type = 'differentiated' if type_code == 'd' else 'annuity'
+        
+        if export_format == "schedule_xlsx":
+            content = schedule_to_xlsx(loan_amount, annual_rate, years, payment_type)
+            extension = "xlsx"
+        else:
+            content = schedule_to_csv(loan_amount, annual_rate, years, payment_type)
+            extension = "csv"
+        
+        filename = f"grafik_{int(loan_amount)}_{rate_str}_{years}.{extension}"
+        
+        await call.message.answer_document(
+            BufferedInputFile(content, filename=filename),
+            caption=(
+                f"📄 *График платежей*\n"
+                f"{format_currency(loan_amount)}, {annual_rate}% годовых, {years} лет "
+                f"({years * 12} платежей)"
+            ),
+            parse_mode="Markdown"
+        )
+        await call.answer()
+        
+    except ValueError as e:
+        logger.error(f"Неверные данные для выгрузки графика: {call.data} ({e})")
+        await call.answer("❌ Не удалось сформировать график", show_alert=True)
+    except Exception as e:
+        logger.error(f"Ошибка при выгрузке графика платежей: {e}", exc_info=True)
+        await call.answer("❌ Произошла ошибка", show_alert=True)
+
 # Расчет с первоначальным взносом
-@mortgage_router.callback_query(F.data == "calc_downpayment")
+@mortgage_callbacks.exact("calc_downpayment")
 async def start_downpayment_calculation(call: CallbackQuery, state: FSMContext):
     """
     Начало расчета с первоначальным взносом
@@ -549,7 +623,7 @@ async def process_total_cost(message: Message, state: FSMContext):
     )
     await state.set_state(MortgageStates.waiting_for_downpayment_percent)
 
-@mortgage_router.callback_query(F.data.startswith("down_"))
+@mortgage_callbacks.prefix("down_")
 async def process_downpayment_percent(call: CallbackQuery, state: FSMContext):
     """
     Обработка выбора процента первоначального взноса
@@ -647,7 +721,7 @@ async def perform_downpayment_calculation(call: CallbackQuery, state: FSMContext
         )
 
 # Расчет максимальной суммы по доходу
-@mortgage_router.callback_query(F.data == "calc_affordable")
+@mortgage_callbacks.exact("calc_affordable")
 async def start_affordable_calculation(call: CallbackQuery, state: FSMContext):
     """
     Начало расчета максимальной суммы по доходу
@@ -695,7 +769,7 @@ async def process_income(message: Message, state: FSMContext):
     )
     await state.set_state(MortgageStates.waiting_for_other_loans)
 
-@mortgage_router.callback_query(F.data == "other_loans_0")
+@mortgage_callbacks.exact("other_loans_0")
 async def process_no_other_loans(call: CallbackQuery, state: FSMContext):
     """
     Обработка отсутствия других кредитов
@@ -784,6 +858,8 @@ async def perform_affordable_calculation_from_message(message: Message, state: F
     """
     Выполнение расчета по доходу из сообщения
     """
+    from mortgage_calculator import MortgageCalculator
+    
     user_id = message.from_user.id
     data = await state.get_data()
     
@@ -866,7 +942,7 @@ async def perform_affordable_calculation_from_message(message: Message, state: F
         )
 
 # Сравнение вариантов
-@mortgage_router.callback_query(F.data == "compare_scenarios")
+@mortgage_callbacks.exact("compare_scenarios")
 async def start_comparison(call: CallbackQuery, state: FSMContext):
     """
     Начало сравнения вариантов
@@ -887,7 +963,7 @@ async def start_comparison(call: CallbackQuery, state: FSMContext):
     )
     await call.answer()
 
-@mortgage_router.callback_query(F.data == "add_scenario")
+@mortgage_callbacks.exact("add_scenario")
 async def add_scenario(call: CallbackQuery, state: FSMContext):
     """
     Добавление нового сценария для сравнения
@@ -1076,11 +1152,14 @@ async def process_scenario_years(message: Message, state: FSMContext):
             reply_markup=get_years_keyboard()
         )
 
-@mortgage_router.callback_query(F.data == "compare_now")
+@mortgage_callbacks.exact("compare_now")
 async def compare_scenarios_now(call: CallbackQuery, state: FSMContext):
     """
     Выполнение сравнения вариантов
     """
+    from mortgage_calculator import MortgageCalculator
+    from charts import get_comparison_chart, scenario_color_names
+    
     data = await state.get_data()
     scenarios = data.get('scenarios', [])
     
@@ -1169,6 +1248,20 @@ async def compare_scenarios_now(call: CallbackQuery, state: FSMContext):
             reply_markup=get_mortgage_back_keyboard()
         )
         
+        # График остатка долга по всем вариантам
+        legend = "\n".join(
+            f"{mark} {s['name']}"
+            for mark, s in zip(scenario_color_names(len(scenarios)), scenarios)
+        )
+        await send_chart(
+            call.message,
+            get_comparison_chart([
+                (s['loan_amount'], s['annual_rate'], s['years'], s.get('type', 'annuity'))
+                for s in scenarios
+            ]),
+            f"📉 Остаток долга по вариантам\n{legend}"
+        )
+        
         # Очищаем список сценариев
         await state.update_data(scenarios=[])
         
@@ -1182,7 +1275,7 @@ async def compare_scenarios_now(call: CallbackQuery, state: FSMContext):
         )
         await call.answer()
 
-@mortgage_router.callback_query(F.data == "show_scenarios")
+@mortgage_callbacks.exact("show_scenarios")
 async def show_scenarios(call: CallbackQuery, state: FSMContext):
     """
     Показ текущих сценариев
@@ -1215,7 +1308,7 @@ async def show_scenarios(call: CallbackQuery, state: FSMContext):
     
     await call.answer()
 
-@mortgage_router.callback_query(F.data == "clear_scenarios")
+@mortgage_callbacks.exact("clear_scenarios")
 async def clear_scenarios(call: CallbackQuery, state: FSMContext):
     """
     Очистка списка сценариев
@@ -1231,7 +1324,7 @@ async def clear_scenarios(call: CallbackQuery, state: FSMContext):
     await call.answer()
 
 # Досрочное погашение
-@mortgage_router.callback_query(F.data == "early_repayment")
+@mortgage_callbacks.exact("early_repayment")
 async def start_early_repayment(call: CallbackQuery, state: FSMContext):
     """
     Начало расчета досрочного погашения
@@ -1252,6 +1345,8 @@ async def process_years_for_early_repayment(message: Message, state: FSMContext)
     """
     Обработка срока для досрочного погашения
     """
+    from mortgage_calculator import MortgageCalculator
+    
     try:
         years = int(message.text)
         
@@ -1396,7 +1491,7 @@ async def process_early_amount(message: Message, state: FSMContext):
     )
     await state.set_state(MortgageStates.waiting_for_early_type)
 
-@mortgage_router.callback_query(F.data.startswith("early_"))
+@mortgage_callbacks.prefix("early_")
 async def process_early_type(call: CallbackQuery, state: FSMContext):
     """
     Обработка выбора типа досрочного погашения
@@ -1421,6 +1516,8 @@ async def perform_early_repayment_calculation(call: CallbackQuery, state: FSMCon
     """
     Выполнение расчета досрочного погашения
     """
+    from mortgage_calculator import MortgageCalculator
+    
     user_id = call.from_user.id
     data = await state.get_data()
     
@@ -1529,8 +1626,279 @@ async def perform_early_repayment_calculation(call: CallbackQuery, state: FSMCon
             reply_markup=get_mortgage_back_keyboard()
         )
 
+# Регулярные досрочные платежи
+@mortgage_callbacks.exact("recurring_extra")
+async def start_recurring_extra(call: CallbackQuery, state: FSMContext):
+    """
+    Начало расчета регулярных досрочных платежей
+    """
+    await state.clear()
+    await call.message.answer(
+        "🔁 *Регулярные досрочные платежи*\n\n"
+        "Посчитаем, как ежемесячные доплаты или премии сократят срок и переплату.\n\n"
+        "Введите сумму кредита (в рублях):\n\n"
+        "*Пример:* 5 000 000",
+        parse_mode="Markdown",
+        reply_markup=get_mortgage_back_keyboard()
+    )
+    await state.set_state(MortgageStates.waiting_for_extra_loan)
+    await call.answer()
+
+@mortgage_router.message(MortgageStates.waiting_for_extra_loan)
+async def process_extra_loan(message: Message, state: FSMContext):
+    """
+    Обработка суммы кредита для регулярных досрочных платежей
+    """
+    amount = parse_amount(message.text)
+    
+    if amount is None or amount <= 0 or amount > 1000000000:
+        await message.answer(
+            "❌ *Неверная сумма!*\n\n"
+            "Введите сумму кредита от 1 до 1 000 000 000 ₽.\n"
+            "*Пример:* 5 000 000",
+            parse_mode="Markdown",
+            reply_markup=get_mortgage_back_keyboard()
+        )
+        return
+    
+    await state.update_data(loan_amount=amount)
+    
+    await message.answer(
+        f"✅ Сумма кредита: *{format_currency(amount)}*\n\n"
+        "Введите годовую процентную ставку (%):\n\n"
+        "*Пример:* 7.5",
+        parse_mode="Markdown",
+        reply_markup=get_mortgage_back_keyboard()
+    )
+    await state.set_state(MortgageStates.waiting_for_extra_rate)
+
+@mortgage_router.message(MortgageStates.waiting_for_extra_rate)
+async def process_extra_rate(message: Message, state: FSMContext):
+    """
+    Обработка ставки для регулярных досрочных платежей
+    """
+    try:
+        rate = float(message.text.replace(',', '.'))
+        
+        if rate <= 0 or rate > 50:
+            await message.answer(
+                "❌ *Неверная ставка!*\n\n"
+                "Пожалуйста, введите ставку от 0.1 до 50%.\n"
+                "*Пример:* 7.5",
+                parse_mode="Markdown",
+                reply_markup=get_mortgage_back_keyboard()
+            )
+            return
+        
+        await state.update_data(annual_rate=rate)
+        
+        await message.answer(
+            f"✅ Процентная ставка: *{rate}%* годовых\n\n"
+            "Введите срок кредита (в годах):\n\n"
+            "*Пример:* 20",
+            parse_mode="Markdown",
+            reply_markup=get_mortgage_back_keyboard()
+        )
+        await state.set_state(MortgageStates.waiting_for_extra_years)
+        
+    except ValueError:
+        await message.answer(
+            "❌ *Неверный формат!*\n\n"
+            "Пожалуйста, введите число с точкой или запятой.\n"
+            "*Пример:* 7.5",
+            parse_mode="Markdown",
+            reply_markup=get_mortgage_back_keyboard()
+        )
+
+@mortgage_router.message(MortgageStates.waiting_for_extra_years)
+async def process_extra_years(message: Message, state: FSMContext):
+    """
+    Обработка срока для регулярных досрочных платежей
+    """
+    try:
+        years = int(message.text)
+        
+        if years <= 0 or years > 50:
+            await message.answer(
+                "❌ *Неверный срок!*\n\n"
+                "Пожалуйста, введите срок от 1 до 50 лет.\n"
+                "*Пример:* 20",
+                parse_mode="Markdown",
+                reply_markup=get_mortgage_back_keyboard()
+            )
+            return
+        
+        await state.update_data(years=years)
+        
+        await message.answer(
+            f"✅ Срок кредита: *{years}* лет\n\n"
+            "💰 *Какую сумму вы готовы вносить досрочно за один раз?*\n\n"
+            "*Пример:* 20 000",
+            parse_mode="Markdown",
+            reply_markup=get_mortgage_back_keyboard()
+        )
+        await state.set_state(MortgageStates.waiting_for_extra_amount)
+        
+    except ValueError:
+        await message.answer(
+            "❌ *Неверный формат!*\n\n"
+            "Пожалуйста, введите целое число лет.\n"
+            "*Пример:* 15",
+            parse_mode="Markdown",
+            reply_markup=get_mortgage_back_keyboard()
+        )
+
+@mortgage_router.message(MortgageStates.waiting_for_extra_amount)
+async def process_extra_amount(message: Message, state: FSMContext):
+    """
+    Обработка суммы регулярного досрочного платежа
+    """
+    extra_amount = parse_amount(message.text)
+    data = await state.get_data()
+    loan_amount = data.get('loan_amount')
+    
+    if extra_amount is None or extra_amount <= 0 or extra_amount > loan_amount:
+        await message.answer(
+            "❌ *Неверная сумма!*\n\n"
+            f"Введите сумму от 1 до {format_currency(loan_amount)}.\n"
+            "*Пример:* 20 000",
+            parse_mode="Markdown",
+            reply_markup=get_mortgage_back_keyboard()
+        )
+        return
+    
+    await state.update_data(extra_amount=extra_amount)
+    
+    await message.answer(
+        f"✅ Досрочный платеж: *{format_currency(extra_amount)}*\n\n"
+        "📅 *Как часто вы будете его вносить?*",
+        parse_mode="Markdown",
+        reply_markup=get_extra_frequency_keyboard()
+    )
+    await state.set_state(MortgageStates.waiting_for_extra_frequency)
+
+@mortgage_router.callback_query(MortgageStates.waiting_for_extra_frequency, F.data.startswith("extra_freq_"))
+async def process_extra_frequency(call: CallbackQuery, state: FSMContext):
+    """
+    Обработка периодичности регулярных досрочных платежей
+    """
+    every_months = int(call.data.replace("extra_freq_", ""))
+    await state.update_data(extra_every_months=every_months)
+    
+    await call.message.answer(
+        "📊 *Выберите тип досрочного погашения:*\n\n"
+        "• *Уменьшать срок* — платеж прежний, кредит закроется раньше\n"
+        "• *Уменьшать платеж* — срок прежний, платеж снижается после каждой доплаты",
+        parse_mode="Markdown",
+        reply_markup=get_extra_type_keyboard()
+    )
+    await state.set_state(MortgageStates.waiting_for_extra_type)
+    await call.answer()
+
+@mortgage_router.callback_query(MortgageStates.waiting_for_extra_type, F.data.startswith("extra_type_"))
+async def process_extra_type(call: CallbackQuery, state: FSMContext):
+    """
+    Выполнение расчета регулярных досрочных платежей
+    """
+    from mortgage_calculator import MortgageCalculator
+    
+    user_id = call.from_user.id
+    repayment_type = call.data.replace("extra_type_", "")
+    data = await state.get_data()
+    
+    try:
+        loan_amount = data.get('loan_amount')
+        annual_rate = data.get('annual_rate')
+        years = data.get('years')
+        extra_amount = data.get('extra_amount')
+        every_months = data.get('extra_every_months', 1)
+        
+        if not all([loan_amount, annual_rate, years, extra_amount]):
+            await call.message.answer(
+                "❌ *Недостаточно данных для расчета!*",
+                parse_mode="Markdown",
+                reply_markup=get_mortgage_back_keyboard()
+            )
+            await call.answer()
+            return
+        
+        events = MortgageCalculator.recurring_prepayments(
+            extra_amount,
+            every_months=every_months,
+            start_month=every_months,
+            repayment_type=repayment_type
+        )
+        result = MortgageCalculator.simulate_prepayments(loan_amount, annual_rate, years, events)
+        
+        if not result.get('success', False):
+            await call.message.answer(
+                format_error_message(result.get('error', 'Ошибка расчета')),
+                reply_markup=get_mortgage_back_keyboard()
+            )
+            await call.answer()
+            return
+        
+        frequency_text = {
+            1: "каждый месяц",
+            3: "раз в квартал",
+            4: "три раза в год",
+            12: "раз в год"
+        }.get(every_months, f"раз в {every_months} мес.")
+        
+        new_years, new_months = divmod(result['new_months'], 12)
+        
+        result_text = (
+            f"🔁 *Регулярные досрочные платежи*\n\n"
+            
+            f"📋 *Исходные параметры:*\n"
+            f"• Кредит: {format_currency(loan_amount)}\n"
+            f"• Ставка: {annual_rate}% годовых\n"
+            f"• Срок: {years} лет ({result['original_months']} месяцев)\n"
+            f"• Платеж: {format_currency(result['original_payment'])}/мес\n\n"
+            
+            f"💰 *Досрочно:* {format_currency(extra_amount)} {frequency_text}\n"
+            f"• Всего внесено досрочно: {format_currency(result['total_prepaid'])} "
+            f"({result['prepayments_count']} платежей)\n\n"
+            
+            f"📊 *Результаты:*\n"
+            f"• Кредит закроется за: *{new_years} г. {new_months} мес.*\n"
+            f"• Сэкономлено месяцев: *{result['months_saved']}*\n"
+        )
+        
+        if repayment_type == 'reduce_payment':
+            result_text += f"• Платеж в конце срока: *{format_currency(result['final_payment'])}/мес*\n"
+        
+        result_text += (
+            f"• Переплата: *{format_currency(result['total_interest'])}*\n"
+            f"• Экономия: *{format_currency(result['total_savings'])}*"
+        )
+        
+        await save_calculation_to_history(
+            user_id=user_id,
+            calc_type='recurring_prepayment',
+            params=data,
+            result=result
+        )
+        
+        await call.message.answer(
+            result_text,
+            parse_mode="Markdown",
+            reply_markup=get_mortgage_back_keyboard()
+        )
+        
+        await state.clear()
+        await call.answer()
+        
+    except Exception as e:
+        logger.error(f"Ошибка при расчете регулярных досрочных платежей: {e}", exc_info=True)
+        await call.message.answer(
+            format_error_message("Произошла ошибка при расчете досрочных платежей."),
+            reply_markup=get_mortgage_back_keyboard()
+        )
+        await call.answer()
+
 # История расчетов
-@mortgage_router.callback_query(F.data == "mortgage_history")
+@mortgage_callbacks.exact("mortgage_history")
 async def show_mortgage_history(call: CallbackQuery, state: FSMContext):
     """
     Показ истории расчетов
@@ -1562,7 +1930,8 @@ async def show_mortgage_history(call: CallbackQuery, state: FSMContext):
                 'affordable_loan': '💰 Расчет по доходу',
                 'comparison': '⚖️ Сравнение вариантов',
                 'early_repayment_reduce_payment': '📈 Досрочное (уменьшение платежа)',
-                'early_repayment_reduce_term': '📈 Досрочное (уменьшение срока)'
+                'early_repayment_reduce_term': '📈 Досрочное (уменьшение срока)',
+                'recurring_prepayment': '🔁 Регулярные досрочные'
             }
             
             calc_type = calc_type_map.get(calc['type'], calc['type'])
@@ -1600,7 +1969,7 @@ async def show_mortgage_history(call: CallbackQuery, state: FSMContext):
         )
         await call.answer()
 
-@mortgage_router.callback_query(F.data == "history_last5")
+@mortgage_callbacks.exact("history_last5")
 async def show_history_last5(call: CallbackQuery):
     """
     Показ последних 5 расчетов
@@ -1608,7 +1977,7 @@ async def show_history_last5(call: CallbackQuery):
     await show_mortgage_history(call, None)
     await call.answer()
 
-@mortgage_router.callback_query(F.data == "history_all")
+@mortgage_callbacks.exact("history_all")
 async def show_history_all(call: CallbackQuery):
     """
     Показ всей истории
@@ -1635,7 +2004,8 @@ async def show_history_all(call: CallbackQuery):
                 'with_downpayment': '🏠',
                 'affordable_loan': '💰',
                 'comparison': '⚖️',
-                'early_repayment': '📈'
+                'early_repayment': '📈',
+                'recurring_prepayment': '🔁'
             }
             
             calc_icon = calc_type_map.get(calc['type'], '📝')
@@ -1665,7 +2035,7 @@ async def show_history_all(call: CallbackQuery):
         logger.error(f"Ошибка при получении всей истории: {e}")
         await call.answer("❌ Ошибка загрузки истории")
 
-@mortgage_router.callback_query(F.data == "history_clear")
+@mortgage_callbacks.exact("history_clear")
 async def clear_history(call: CallbackQuery):
     """
     Очистка истории
@@ -1683,7 +2053,7 @@ async def clear_history(call: CallbackQuery):
     await call.answer()
 
 # Обработчики помощи
-@mortgage_router.callback_query(F.data == "help_mortgage")
+@mortgage_callbacks.exact("help_mortgage")
 async def help_mortgage(call: CallbackQuery):
     """
     Помощь по ипотечному калькулятору
@@ -1696,7 +2066,8 @@ async def help_mortgage(call: CallbackQuery):
         "2. *С первоначальным взносом* — расчет с учётом ваших средств\n"
         "3. *По доходу* — сколько можете взять\n"
         "4. *Сравнение* — сравните несколько вариантов\n"
-        "5. *Досрочное погашение* — расчёт экономии\n\n"
+        "5. *Досрочное погашение* — расчёт экономии\n"
+        "6. *Регулярные досрочные* — ежемесячные доплаты и премии\n\n"
         
         "📈 *Как пользоваться:*\n"
         "• Вводите суммы без пробелов или с пробелами\n"
@@ -1712,7 +2083,7 @@ async def help_mortgage(call: CallbackQuery):
         
         "❓ *Частые вопросы:*\n"
         "• Расчеты приблизительные, точные цифры даст банк\n"
-        "• Не учитываются страховки и дополнительные комиссии\n"
+        "• ПСК учитывает страховку 0.3% от остатка долга, но не комиссии банка\n"
         "• Для сложных расчетов обращайтесь к консультанту"
     )
     
@@ -1720,7 +2091,7 @@ async def help_mortgage(call: CallbackQuery):
     await call.answer()
 
 # Обработка числовых кнопок
-@mortgage_router.callback_query(F.data.startswith("num_"))
+@mortgage_callbacks.prefix("num_")
 async def process_numeric_button(call: CallbackQuery, state: FSMContext):
     """
     Обработка нажатий на числовые кнопки
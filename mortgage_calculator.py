@@ -1,7 +1,362 @@
 import math
-from typing import Dict, List, Any
+import functools
+from types import MappingProxyType
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Sequence, Tuple
 from datetime import datetime
 
+# Размер LRU-кеша для каждого кешируемого расчета
+CALCULATION_CACHE_SIZE = 1024
+
+# Как нормализовать аргументы при построении ключа кеша
+_AMOUNT_ARGS = ('loan_amount', 'total_cost', 'monthly_income', 'other_loans', 'other_fees')
+_RATE_ARGS = ('annual_rate', 'downpayment_percent', 'insurance_percent')
+
+# Параметры расчета по доходу по умолчанию
+MAX_PAYMENT_TO_INCOME = 0.4  # Банки обычно дают до 40% от дохода
+LIVING_WAGE_PER_PERSON = 15000  # Прожиточный минимум, рублей
+
+# Тип досрочного погашения, если он не указан
+DEFAULT_REPAYMENT_TYPE = 'reduce_payment'
+
+# Зарегистрированные кешируемые расчеты (имя -> обертка)
+_cached_calculations: Dict[str, Callable] = {}
+
+def _normalize_arg(name: str, value: Any) -> Any:
+    """
+    Нормализует аргумент расчета для ключа кеша
+    
+    Суммы округляются до копеек, ставки и проценты - до 6 знаков.
+    Нечисловые значения остаются как есть (их отсеет валидация расчета).
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if name in _AMOUNT_ARGS:
+        return round(value, 2)
+    if name in _RATE_ARGS:
+        return round(value, 6)
+    return value
+
+def _freeze(value: Any) -> Any:
+    """
+    Делает результат расчета неизменяемым
+    
+    Словари превращаются в MappingProxyType, списки - в кортежи,
+    чтобы закешированный результат нельзя было испортить у другого пользователя.
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _memoized(func: Callable) -> Callable:
+    """
+    Оборачивает расчет в LRU-кеш с нормализованным ключом
+    
+    Args:
+        func: Функция расчета
+        
+    Returns:
+        Обертка с тем же интерфейсом, возвращающая неизменяемый результат
+    """
+    # Имена и значения по умолчанию параметров берем из кода функции:
+    # inspect.signature заметно замедляет импорт модуля
+    code = func.__code__
+    names = code.co_varnames[:code.co_argcount]
+    defaults = dict(zip(names[len(names) - len(func.__defaults__ or ()):], func.__defaults__ or ()))
+    
+    @functools.lru_cache(maxsize=CALCULATION_CACHE_SIZE)
+    def cached(*key):
+        return _freeze(func(*key))
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if len(args) > len(names):
+            raise TypeError(f"{func.__name__}() принимает не больше {len(names)} аргументов")
+        arguments = dict(zip(names, args))
+        for name, value in kwargs.items():
+            if name not in names or name in arguments:
+                raise TypeError(f"{func.__name__}(): лишний или повторный аргумент '{name}'")
+            arguments[name] = value
+        for name in names:
+            if name not in arguments:
+                if name not in defaults:
+                    raise TypeError(f"{func.__name__}(): не передан аргумент '{name}'")
+                arguments[name] = defaults[name]
+        key = tuple(_normalize_arg(name, arguments[name]) for name in names)
+        try:
+            return cached(*key)
+        except TypeError:
+            # Нехешируемые аргументы - считаем без кеша
+            return _freeze(func(*key))
+    
+    wrapper.cache_info = cached.cache_info
+    wrapper.cache_clear = cached.cache_clear
+    _cached_calculations[func.__name__] = wrapper
+    return wrapper
+
+# ========== ОБРАТНЫЕ РАСЧЕТЫ (ПОИСК КОРНЕЙ) ==========
+
+# Точность и лимит итераций для численных методов
+SOLVER_TOLERANCE = 1e-12
+SOLVER_MAX_ITERATIONS = 100
+
+# Верхняя граница поиска месячной ставки (1200% годовых)
+_MAX_MONTHLY_RATE = 1.0
+
+def _annuity_factor(monthly_rate: float, months: float) -> float:
+    """
+    Аннуитетный коэффициент r / (1 - (1 + r)^-n)
+    
+    Args:
+        monthly_rate: Месячная ставка (в долях)
+        months: Количество месяцев
+        
+    Returns:
+        Коэффициент аннуитета
+    """
+    if monthly_rate == 0:
+        return 1 / months
+    return monthly_rate / -math.expm1(-months * math.log1p(monthly_rate))
+
+def _annuity_factor_derivative(monthly_rate: float, months: float) -> float:
+    """
+    Аналитическая производная аннуитетного коэффициента по месячной ставке
+    
+    Args:
+        monthly_rate: Месячная ставка (в долях)
+        months: Количество месяцев
+        
+    Returns:
+        d(коэффициент)/d(ставка)
+    """
+    if monthly_rate == 0:
+        # Предел при r -> 0: (n + 1) / (2n)
+        return (months + 1) / (2 * months)
+    
+    discount = math.exp(-months * math.log1p(monthly_rate))  # (1 + r)^-n
+    denominator = 1 - discount
+    return (denominator - monthly_rate * months * discount / (1 + monthly_rate)) / (denominator * denominator)
+
+def _safeguarded_newton(func: Callable[[float], float], derivative: Callable[[float], float],
+                        low: float, high: float, guess: float,
+                        tolerance: float = SOLVER_TOLERANCE,
+                        max_iterations: int = SOLVER_MAX_ITERATIONS) -> tuple:
+    """
+    Метод Ньютона с защитной вилкой (при выходе за вилку - шаг бисекции)
+    
+    Требует, чтобы func(low) и func(high) имели разные знаки.
+    
+    Args:
+        func: Функция, корень которой ищем
+        derivative: Ее аналитическая производная
+        low: Левая граница вилки
+        high: Правая граница вилки
+        guess: Начальное приближение
+        tolerance: Требуемая точность по аргументу
+        max_iterations: Максимальное число итераций
+        
+    Returns:
+        Кортеж (корень, число итераций)
+    """
+    f_low = func(low)
+    x = min(max(guess, low), high)
+    
+    for iteration in range(1, max_iterations + 1):
+        f_x = func(x)
+        if f_x == 0:
+            return x, iteration
+        
+        # Сужаем вилку
+        if (f_x < 0) == (f_low < 0):
+            low, f_low = x, f_x
+        else:
+            high = x
+        
+        slope = derivative(x)
+        if slope:
+            candidate = x - f_x / slope
+            if abs(candidate - x) <= tolerance * max(1.0, abs(x)):
+                return candidate, iteration
+        if not slope or not low < candidate < high:
+            candidate = (low + high) / 2
+        x = candidate
+    
+    return x, max_iterations
+
+def _bisection(func: Callable[[float], float], low: float, high: float,
+               tolerance: float = SOLVER_TOLERANCE,
+               max_iterations: int = 200) -> tuple:
+    """
+    Наивная бисекция (используется как эталон в бенчмарке)
+    
+    Returns:
+        Кортеж (корень, число итераций)
+    """
+    f_low = func(low)
+    for iteration in range(1, max_iterations + 1):
+        middle = (low + high) / 2
+        f_middle = func(middle)
+        if f_middle == 0 or (high - low) / 2 <= tolerance * max(1.0, abs(middle)):
+            return middle, iteration
+        if (f_middle < 0) == (f_low < 0):
+            low, f_low = middle, f_middle
+        else:
+            high = middle
+    return (low + high) / 2, max_iterations
+
+def _solve_monthly_rate(loan_amount: float, monthly_payment: float, months: int) -> tuple:
+    """
+    Находит месячную ставку, при которой аннуитетный платеж равен заданному
+    
+    Args:
+        loan_amount: Сумма кредита
+        monthly_payment: Желаемый ежемесячный платеж
+        months: Количество месяцев
+        
+    Returns:
+        Кортеж (месячная ставка в долях, число итераций)
+    """
+    target = monthly_payment / loan_amount
+    zero_rate_factor = 1 / months
+    
+    if abs(target - zero_rate_factor) <= SOLVER_TOLERANCE:
+        return 0.0, 0
+    if target < zero_rate_factor:
+        raise ValueError("Платеж слишком мал: его не хватит даже на погашение основного долга")
+    if target >= _MAX_MONTHLY_RATE + 1 / months:
+        raise ValueError("Платеж слишком велик для реалистичной ставки")
+    
+    # Разложение коэффициента при малых r: 1/n + r(n + 1)/(2n)
+    guess = (target - zero_rate_factor) * 2 * months / (months + 1)
+    
+    return _safeguarded_newton(
+        lambda rate: _annuity_factor(rate, months) - target,
+        lambda rate: _annuity_factor_derivative(rate, months),
+        0.0, _MAX_MONTHLY_RATE, guess
+    )
+
+# ========== ДЕНЕЖНЫЕ ПОТОКИ И ПСК ==========
+
+def _amortization_rows(loan_amount: float, monthly_rate: float, months: int,
+                       payment_type: str = 'annuity') -> Iterator[tuple]:
+    """
+    Генерирует полный график платежей строками-кортежами
+    
+    Кортежи вместо словарей, чтобы график на 600 месяцев можно было
+    прогнать через CSV-writer или XLSX без лишних аллокаций.
+    
+    Args:
+        loan_amount: Сумма кредита
+        monthly_rate: Месячная ставка (в долях)
+        months: Количество месяцев
+        payment_type: 'annuity' или 'differentiated'
+        
+    Yields:
+        (месяц, платеж, основной долг, проценты, остаток после платежа)
+    """
+    remaining = loan_amount
+    
+    if payment_type == 'annuity':
+        payment = loan_amount * _annuity_factor(monthly_rate, months)
+        for month in range(1, months + 1):
+            interest = remaining * monthly_rate
+            principal = payment - interest
+            remaining -= principal
+            yield month, payment, principal, interest, remaining if remaining > 0.005 else 0.0
+    elif payment_type == 'differentiated':
+        principal = loan_amount / months
+        for month in range(1, months + 1):
+            interest = remaining * monthly_rate
+            remaining -= principal
+            yield month, principal + interest, principal, interest, remaining if remaining > 0.005 else 0.0
+    else:
+        raise ValueError("Неизвестный тип платежа")
+
+def _loan_cash_flows(loan_amount: float, monthly_rate: float, months: int,
+                     payment_type: str = 'annuity', monthly_insurance_rate: float = 0,
+                     other_fees: float = 0) -> Dict[str, Any]:
+    """
+    Собирает помесячный вектор денежных потоков заемщика
+    
+    Поток 0 - полученный кредит за вычетом разовых комиссий (положительный),
+    потоки 1..n - платежи по кредиту плюс страховка от остатка долга (отрицательные).
+    
+    Args:
+        loan_amount: Сумма кредита
+        monthly_rate: Месячная ставка (в долях)
+        months: Количество месяцев
+        payment_type: 'annuity' или 'differentiated'
+        monthly_insurance_rate: Месячная ставка страхования от остатка (в долях)
+        other_fees: Разовые комиссии при выдаче
+        
+    Returns:
+        Словарь с вектором потоков и суммарными показателями
+    """
+    flows = [loan_amount - other_fees]
+    total_payments = 0.0
+    total_insurance = 0.0
+    
+    for _, payment, principal, _, remaining in _amortization_rows(
+            loan_amount, monthly_rate, months, payment_type):
+        # Страховка начисляется на остаток до платежа
+        insurance = (remaining + principal) * monthly_insurance_rate
+        flows.append(-(payment + insurance))
+        total_payments += payment
+        total_insurance += insurance
+    
+    return {
+        'flows': flows,
+        'total_payments': total_payments,
+        'total_insurance': total_insurance
+    }
+
+def _solve_irr(flows: List[float], guess: float = 0.0) -> tuple:
+    """
+    Находит месячную внутреннюю норму доходности (IRR) потоков
+    
+    Ищется корень многочлена NPV(v) = Σ CF_t · v^t по дисконт-фактору v = 1/(1 + i).
+    Значение и производная считаются одним проходом по схеме Горнера,
+    шаг Ньютона страхуется вилкой (0, 2].
+    
+    Args:
+        flows: Вектор денежных потоков (CF_0 > 0, дальше выплаты)
+        guess: Начальное приближение месячной ставки (в долях)
+        
+    Returns:
+        Кортеж (месячная IRR в долях, число итераций)
+    """
+    def npv_with_derivative(v: float) -> tuple:
+        value = flows[-1]
+        derivative = 0.0
+        for flow in reversed(flows[:-1]):
+            derivative = derivative * v + value
+            value = value * v + flow
+        return value, derivative
+    
+    low, high = 0.0, 2.0  # NPV(0) = CF_0 > 0
+    v = 1 / (1 + guess)
+    
+    for iteration in range(1, SOLVER_MAX_ITERATIONS + 1):
+        value, derivative = npv_with_derivative(v)
+        if value == 0:
+            return 1 / v - 1, iteration
+        
+        if value > 0:
+            low = v
+        else:
+            high = v
+        
+        if derivative:
+            candidate = v - value / derivative
+            if abs(candidate - v) <= SOLVER_TOLERANCE:
+                return 1 / candidate - 1, iteration
+        if not derivative or not low < candidate < high:
+            candidate = (low + high) / 2
+        v = candidate
+    
+    return 1 / v - 1, SOLVER_MAX_ITERATIONS
+
 class MortgageCalculator:
     """
     Калькулятор ипотеки с полным набором функций по формулам calcus.ru
@@ -117,6 +472,7 @@ class MortgageCalculator:
         }
     
     @staticmethod
+    @_memoized
     def calculate_annuity(loan_amount: float, annual_rate: float, years: int, 
                          include_schedule: bool = True) -> Dict[str, Any]:
         """
@@ -207,6 +563,7 @@ class MortgageCalculator:
             }
     
     @staticmethod
+    @_memoized
     def calculate_differentiated(loan_amount: float, annual_rate: float, years: int,
                                include_schedule: bool = True) -> Dict[str, Any]:
         """
@@ -304,6 +661,7 @@ class MortgageCalculator:
             }
     
     @staticmethod
+    @_memoized
     def calculate_with_downpayment(total_cost: float, downpayment_percent: float,
                                  annual_rate: float, years: int) -> Dict[str, Any]:
         """
@@ -364,8 +722,11 @@ class MortgageCalculator:
             }
     
     @staticmethod
+    @_memoized
     def max_affordable_loan(monthly_income: float, annual_rate: float, years: int,
-                           other_loans: float = 0, dependents: int = 0) -> Dict[str, Any]:
+                           other_loans: float = 0, dependents: int = 0,
+                           payment_to_income: float = MAX_PAYMENT_TO_INCOME,
+                           living_wage_per_person: float = LIVING_WAGE_PER_PERSON) -> Dict[str, Any]:
         """
         Расчет максимальной суммы кредита по доходу
         
@@ -375,6 +736,8 @@ class MortgageCalculator:
             years: Срок кредита в годах
             other_loans: Другие ежемесячные кредитные платежи
             dependents: Количество иждивенцев
+            payment_to_income: Допустимая доля платежа от свободного дохода
+            living_wage_per_person: Прожиточный минимум на одного человека
             
         Returns:
             Словарь с результатами расчета
@@ -389,7 +752,6 @@ class MortgageCalculator:
                 raise ValueError("Срок кредита должен быть от 1 до 50 лет")
             
             # Рассчитываем прожиточный минимум (примерно)
-            living_wage_per_person = 15000  # рублей
             total_living_wage = living_wage_per_person * (1 + dependents)
             
             # Доступный платеж (40% от чистого дохода минус другие кредиты)
@@ -402,23 +764,20 @@ class MortgageCalculator:
                     'message': 'Доход недостаточен для кредита'
                 }
             
-            max_payment = available_income * 0.4  # Банки обычно дают до 40% от дохода
+            max_payment = available_income * payment_to_income
             
-            # Конвертируем параметры
-            months = years * 12
-            monthly_rate = annual_rate / 12 / 100
-            
-            # Рассчитываем максимальную сумму кредита
-            if monthly_rate == 0:
-                max_loan = max_payment * months
-            else:
-                coefficient = MortgageCalculator.calculate_annuity_coefficient(monthly_rate, months)
-                max_loan = max_payment / coefficient
-            
-            # Пример стоимости недвижимости при 20% первоначальном взносе
+            # Максимальная сумма кредита и пример стоимости жилья при 20% взносе
             example_downpayment_percent = 20
-            example_property_cost = max_loan / (1 - example_downpayment_percent / 100)
-            example_downpayment = example_property_cost * example_downpayment_percent / 100
+            inverse = MortgageCalculator.solve_price_for_payment(
+                max_payment, annual_rate, years,
+                downpayment_percent=example_downpayment_percent
+            )
+            if not inverse['success']:
+                raise ValueError(inverse['error'])
+            
+            max_loan = inverse['max_loan']
+            example_property_cost = inverse['property_price']
+            example_downpayment = inverse['downpayment_amount']
             
             return {
                 'success': True,
@@ -442,6 +801,294 @@ class MortgageCalculator:
                 'years': years
             }
     
+    @staticmethod
+    def solve_rate_for_payment(loan_amount: float, monthly_payment: float, years: int) -> Dict[str, Any]:
+        """
+        Обратный расчет: какая ставка дает заданный аннуитетный платеж
+        
+        Args:
+            loan_amount: Сумма кредита
+            monthly_payment: Желаемый ежемесячный платеж
+            years: Срок кредита в годах
+            
+        Returns:
+            Словарь с найденной годовой ставкой
+        """
+        try:
+            if loan_amount <= 0:
+                raise ValueError("Сумма кредита должна быть положительной")
+            if monthly_payment <= 0:
+                raise ValueError("Платеж должен быть положительным")
+            if years <= 0 or years > 50:
+                raise ValueError("Срок кредита должен быть от 1 до 50 лет")
+            
+            months = years * 12
+            monthly_rate, iterations = _solve_monthly_rate(loan_amount, monthly_payment, months)
+            
+            return {
+                'success': True,
+                'loan_amount': loan_amount,
+                'monthly_payment': monthly_payment,
+                'years': years,
+                'months': months,
+                'annual_rate': round(monthly_rate * 12 * 100, 4),
+                'iterations': iterations
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'loan_amount': loan_amount,
+                'monthly_payment': monthly_payment,
+                'years': years
+            }
+    
+    @staticmethod
+    def solve_term_for_payment(loan_amount: float, annual_rate: float,
+                               monthly_payment: float) -> Dict[str, Any]:
+        """
+        Обратный расчет: за сколько месяцев погасится кредит при заданном платеже
+        
+        Срок находится аналитически: n = -ln(1 - L·r / P) / ln(1 + r).
+        
+        Args:
+            loan_amount: Сумма кредита
+            annual_rate: Годовая процентная ставка (%)
+            monthly_payment: Ежемесячный платеж
+            
+        Returns:
+            Словарь со сроком в месяцах (точным и округленным вверх)
+        """
+        try:
+            if loan_amount <= 0:
+                raise ValueError("Сумма кредита должна быть положительной")
+            if annual_rate < 0:
+                raise ValueError("Процентная ставка не может быть отрицательной")
+            if monthly_payment <= 0:
+                raise ValueError("Платеж должен быть положительным")
+            
+            monthly_rate = annual_rate / 12 / 100
+            
+            if monthly_rate == 0:
+                exact_months = loan_amount / monthly_payment
+            else:
+                first_interest = loan_amount * monthly_rate
+                if monthly_payment <= first_interest:
+                    raise ValueError("Платеж не покрывает даже проценты — кредит не будет погашен")
+                exact_months = -math.log1p(-first_interest / monthly_payment) / math.log1p(monthly_rate)
+            
+            months = math.ceil(exact_months - 1e-9)
+            
+            return {
+                'success': True,
+                'loan_amount': loan_amount,
+                'annual_rate': annual_rate,
+                'monthly_payment': monthly_payment,
+                'exact_months': round(exact_months, 4),
+                'months': months,
+                'years': round(months / 12, 2)
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'loan_amount': loan_amount,
+                'annual_rate': annual_rate,
+                'monthly_payment': monthly_payment
+            }
+    
+    @staticmethod
+    def solve_price_for_payment(monthly_payment: float, annual_rate: float, years: int,
+                                downpayment_amount: float = 0,
+                                downpayment_percent: float = None) -> Dict[str, Any]:
+        """
+        Обратный расчет: максимальная стоимость жилья при заданном платеже
+        
+        Args:
+            monthly_payment: Ежемесячный платеж, который готов вносить клиент
+            annual_rate: Годовая процентная ставка (%)
+            years: Срок кредита в годах
+            downpayment_amount: Собственные средства в рублях
+            downpayment_percent: Первоначальный взнос в процентах от стоимости
+                                 (если указан, используется вместо суммы)
+            
+        Returns:
+            Словарь со стоимостью жилья, суммой кредита и взноса
+        """
+        try:
+            if monthly_payment <= 0:
+                raise ValueError("Платеж должен быть положительным")
+            if annual_rate < 0:
+                raise ValueError("Процентная ставка не может быть отрицательной")
+            if years <= 0 or years > 50:
+                raise ValueError("Срок кредита должен быть от 1 до 50 лет")
+            if downpayment_amount < 0:
+                raise ValueError("Первоначальный взнос не может быть отрицательным")
+            if downpayment_percent is not None and not 0 <= downpayment_percent < 100:
+                raise ValueError("Процент первоначального взноса должен быть от 0 до 99%")
+            
+            months = years * 12
+            monthly_rate = annual_rate / 12 / 100
+            loan_amount = monthly_payment / _annuity_factor(monthly_rate, months)
+            
+            if downpayment_percent is not None:
+                property_price = loan_amount / (1 - downpayment_percent / 100)
+                downpayment_amount = property_price - loan_amount
+            else:
+                property_price = loan_amount + downpayment_amount
+            
+            return {
+                'success': True,
+                'monthly_payment': monthly_payment,
+                'annual_rate': annual_rate,
+                'years': years,
+                'max_loan': round(loan_amount, 2),
+                'property_price': round(property_price, 2),
+                'downpayment_amount': round(downpayment_amount, 2),
+                'downpayment_percent': round(downpayment_amount / property_price * 100, 2)
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'monthly_payment': monthly_payment,
+                'annual_rate': annual_rate,
+                'years': years
+            }
+    
+    @staticmethod
+    def solve_rate_batch(cases: Sequence[Tuple[float, float, int]]) -> List[Dict[str, Any]]:
+        """
+        Пакетный обратный расчет ставки
+        
+        Каждая строка решается своим методом Ньютона (начальное приближение
+        из разложения коэффициента уже дает 3-4 итерации), одинаковые
+        строки - один раз.
+        
+        Args:
+            cases: Строки (сумма кредита, платеж, срок в годах)
+            
+        Returns:
+            Результаты solve_rate_for_payment в порядке строк
+        """
+        solved: Dict[tuple, Dict[str, Any]] = {}
+        results = []
+        
+        for case in cases:
+            case = tuple(case)
+            if case not in solved:
+                solved[case] = MortgageCalculator.solve_rate_for_payment(*case)
+            results.append(dict(solved[case]))
+        
+        return results
+    
+    @staticmethod
+    def solve_price_batch(monthly_payments: Sequence[float], annual_rate: float, years: int,
+                          downpayment_amount: float = 0,
+                          downpayment_percent: float = None) -> List[Dict[str, Any]]:
+        """
+        Пакетный расчет стоимости жилья для нескольких платежей
+        
+        Ставка, срок и взнос общие, поэтому аннуитетный коэффициент
+        считается один раз на весь пакет.
+        
+        Args:
+            monthly_payments: Платежи, которые готов вносить клиент
+            annual_rate: Годовая процентная ставка (%)
+            years: Срок кредита в годах
+            downpayment_amount: Собственные средства в рублях
+            downpayment_percent: Первоначальный взнос в процентах от стоимости
+            
+        Returns:
+            Результаты solve_price_for_payment в порядке платежей
+        """
+        try:
+            if annual_rate < 0:
+                raise ValueError("Процентная ставка не может быть отрицательной")
+            if years <= 0 or years > 50:
+                raise ValueError("Срок кредита должен быть от 1 до 50 лет")
+            if downpayment_amount < 0:
+                raise ValueError("Первоначальный взнос не может быть отрицательным")
+            if downpayment_percent is not None and not 0 <= downpayment_percent < 100:
+                raise ValueError("Процент первоначального взноса должен быть от 0 до 99%")
+            
+            factor = _annuity_factor(annual_rate / 12 / 100, years * 12)
+            
+        except Exception as e:
+            return [
+                {
+                    'success': False,
+                    'error': str(e),
+                    'monthly_payment': monthly_payment,
+                    'annual_rate': annual_rate,
+                    'years': years
+                }
+                for monthly_payment in monthly_payments
+            ]
+        
+        results = []
+        for monthly_payment in monthly_payments:
+            if monthly_payment <= 0:
+                results.append({
+                    'success': False,
+                    'error': "Платеж должен быть положительным",
+                    'monthly_payment': monthly_payment,
+                    'annual_rate': annual_rate,
+                    'years': years
+                })
+                continue
+            
+            loan_amount = monthly_payment / factor
+            if downpayment_percent is not None:
+                property_price = loan_amount / (1 - downpayment_percent / 100)
+                downpayment = property_price - loan_amount
+            else:
+                property_price = loan_amount + downpayment_amount
+                downpayment = downpayment_amount
+            
+            results.append({
+                'success': True,
+                'monthly_payment': monthly_payment,
+                'annual_rate': annual_rate,
+                'years': years,
+                'max_loan': round(loan_amount, 2),
+                'property_price': round(property_price, 2),
+                'downpayment_amount': round(downpayment, 2),
+                'downpayment_percent': round(downpayment / property_price * 100, 2)
+            })
+        
+        return results
+    
+    @staticmethod
+    def cache_stats() -> Dict[str, Dict[str, Any]]:
+        """
+        Статистика кеша расчетов
+        
+        Returns:
+            Словарь: имя расчета -> попадания, промахи, размер и доля попаданий (%)
+        """
+        stats = {}
+        for name, calculation in _cached_calculations.items():
+            info = calculation.cache_info()
+            total = info.hits + info.misses
+            stats[name] = {
+                'hits': info.hits,
+                'misses': info.misses,
+                'size': info.currsize,
+                'maxsize': info.maxsize,
+                'hit_rate': round(info.hits / total * 100, 1) if total else 0.0
+            }
+        return stats
+    
+    @staticmethod
+    def clear_cache():
+        """Очищает кеш всех расчетов"""
+        for calculation in _cached_calculations.values():
+            calculation.cache_clear()
+    
     @staticmethod
     def compare_scenarios(scenarios: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -523,7 +1170,7 @@ class MortgageCalculator:
     @staticmethod
     def early_repayment_calculation(loan_amount: float, annual_rate: float, years: int,
                                   early_month: int, early_amount: float,
-                                  repayment_type: str = 'reduce_payment') -> Dict[str, Any]:
+                                  repayment_type: str = DEFAULT_REPAYMENT_TYPE) -> Dict[str, Any]:
         """
         Расчет досрочного погашения
         
@@ -660,73 +1307,268 @@ class MortgageCalculator:
             }
     
     @staticmethod
-    def calculate_effective_rate(loan_amount: float, annual_rate: float, years: int,
-                               insurance_percent: float = 0.3, other_fees: float = 0) -> Dict[str, Any]:
+    def amortization_schedule(loan_amount: float, annual_rate: float, years: int,
+                              payment_type: str = 'annuity') -> Iterator[tuple]:
         """
-        Расчет эффективной процентной ставки с учетом всех расходов
+        Полный график платежей (для выгрузки в файл)
         
         Args:
             loan_amount: Сумма кредита
-            annual_rate: Номинальная годовая ставка (%)
+            annual_rate: Годовая процентная ставка (%)
             years: Срок кредита в годах
-            insurance_percent: Процент страховки от остатка долга
-            other_fees: Другие единовременные расходы
+            payment_type: 'annuity' или 'differentiated'
             
         Returns:
-            Словарь с эффективной ставкой
+            Итератор кортежей (месяц, платеж, основной долг, проценты, остаток)
         """
-        try:
-            # Рассчитываем базовый платеж
-            base_result = MortgageCalculator.calculate_annuity(loan_amount, annual_rate, years)
-            
-            if not base_result['success']:
-                return base_result
+        if loan_amount <= 0:
+            raise ValueError("Сумма кредита должна быть положительной")
+        if annual_rate < 0:
+            raise ValueError("Процентная ставка не может быть отрицательной")
+        if years <= 0 or years > 50:
+            raise ValueError("Срок кредита должен быть от 1 до 50 лет")
+        
+        return _amortization_rows(loan_amount, annual_rate / 12 / 100, years * 12, payment_type)
+    
+    @staticmethod
+    def recurring_prepayments(amount: float, every_months: int = 1, start_month: int = 1,
+                              end_month: int = None,
+                              repayment_type: str = DEFAULT_REPAYMENT_TYPE) -> Iterator[Dict[str, Any]]:
+        """
+        Генератор регулярных досрочных платежей
+        
+        Примеры:
+            recurring_prepayments(20000) - 20 000 ₽ каждый месяц
+            recurring_prepayments(100000, every_months=4) - три раза в год
+        
+        Args:
+            amount: Сумма каждого досрочного платежа
+            every_months: Периодичность в месяцах
+            start_month: Месяц первого платежа
+            end_month: Месяц последнего платежа (None - до конца кредита)
+            repayment_type: 'reduce_payment' или 'reduce_term'
+            
+        Yields:
+            События досрочного погашения по возрастанию месяца
+        """
+        if every_months <= 0:
+            raise ValueError("Периодичность должна быть положительной")
+        
+        month = start_month
+        while end_month is None or month <= end_month:
+            yield {'month': month, 'amount': amount, 'type': repayment_type}
+            month += every_months
+    
+    @staticmethod
+    def simulate_prepayments(loan_amount: float, annual_rate: float, years: int,
+                             events: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Расчет аннуитетного кредита с несколькими досрочными погашениями
+        
+        Весь кредит моделируется за один проход по месяцам. Каждое событие -
+        словарь {'month', 'amount', 'type'}, где type - 'reduce_payment'
+        (пересчет платежа на оставшийся срок) или 'reduce_term' (платеж
+        прежний, срок сокращается); без type - DEFAULT_REPAYMENT_TYPE.
+        Если в одном месяце есть погашения обоих типов, сначала вносятся
+        'reduce_term' и сокращается срок, затем 'reduce_payment' и платеж
+        пересчитывается на уже сокращенный срок. События можно передать списком или генератором; генератор должен
+        выдавать месяцы по возрастанию и читается только до конца срока.
+        
+        Args:
+            loan_amount: Сумма кредита
+            annual_rate: Годовая процентная ставка (%)
+            years: Срок кредита в годах
+            events: Досрочные погашения
             
-            # Добавляем страховку к ставке
-            effective_rate = annual_rate + insurance_percent
+        Returns:
+            Словарь с новым сроком, итоговым платежом и экономией
+        """
+        try:
+            if loan_amount <= 0:
+                raise ValueError("Сумма кредита должна быть положительной")
+            if annual_rate < 0:
+                raise ValueError("Процентная ставка не может быть отрицательной")
+            if years <= 0 or years > 50:
+                raise ValueError("Срок кредита должен быть от 1 до 50 лет")
             
-            # Рассчитываем общую сумму выплат с учетом всех расходов
             months = years * 12
-            monthly_insurance_rate = insurance_percent / 12 / 100
+            monthly_rate = annual_rate / 12 / 100
+            original_payment = loan_amount * _annuity_factor(monthly_rate, months)
+            original_total = original_payment * months
+            
+            if isinstance(events, (list, tuple)):
+                events = sorted(events, key=lambda event: event['month'])
+            
+            # Группируем досрочные платежи по месяцам: месяц -> [уменьшение срока, уменьшение платежа]
+            by_month: Dict[int, List[float]] = {}
+            for event in events:
+                month = event['month']
+                if month > months:
+                    break
+                if month <= 0:
+                    raise ValueError("Месяц досрочного погашения должен быть положительным")
+                if event['amount'] <= 0:
+                    raise ValueError("Сумма досрочного погашения должна быть положительной")
+                
+                event_type = event.get('type', DEFAULT_REPAYMENT_TYPE)
+                if event_type not in ('reduce_payment', 'reduce_term'):
+                    raise ValueError("Неизвестный тип досрочного погашения")
+                
+                amounts = by_month.setdefault(month, [0.0, 0.0])
+                amounts[event_type == 'reduce_payment'] += event['amount']
             
-            # Сумма страховых выплат (упрощенный расчет)
-            total_insurance = 0
+            # Один проход по графику
             remaining = loan_amount
-            
-            for _ in range(months):
-                insurance_payment = remaining * monthly_insurance_rate
-                total_insurance += insurance_payment
+            payment = original_payment
+            term_end = months  # месяц, в котором кредит закроется по текущему графику
+            total_paid = 0.0
+            total_interest = 0.0
+            total_prepaid = 0.0
+            events_applied = 0
+            month = 0
+            
+            while remaining > 0.005 and month < term_end:
+                month += 1
+                interest = remaining * monthly_rate
+                principal = payment - interest
+                
+                if principal >= remaining or month == term_end:
+                    # Последний платеж закрывает остаток
+                    total_paid += remaining + interest
+                    total_interest += interest
+                    remaining = 0.0
+                    break
                 
-                # Уменьшаем остаток (примерно)
-                monthly_payment = base_result['monthly_payment']
-                interest = remaining * (annual_rate / 12 / 100)
-                principal = monthly_payment - interest
                 remaining -= principal
+                total_paid += payment
+                total_interest += interest
+                
+                if month not in by_month:
+                    continue
+                
+                reduce_term_amount, reduce_payment_amount = by_month[month]
+                events_applied += 1
+                
+                # Сначала сокращаем срок, затем пересчитываем платеж на новый срок
+                for amount, reduce_payment in ((reduce_term_amount, False), (reduce_payment_amount, True)):
+                    if amount <= 0:
+                        continue
+                    
+                    prepaid = min(amount, remaining)
+                    remaining -= prepaid
+                    total_paid += prepaid
+                    total_prepaid += prepaid
+                    
+                    if remaining <= 0.005:
+                        break
+                    
+                    if reduce_payment:
+                        # Прежний срок, меньший платеж
+                        payment = remaining * _annuity_factor(monthly_rate, term_end - month)
+                    else:
+                        # Прежний платеж, срок сокращается (аналитически)
+                        if monthly_rate == 0:
+                            months_left = remaining / payment
+                        else:
+                            months_left = -math.log1p(-remaining * monthly_rate / payment) / math.log1p(monthly_rate)
+                        term_end = month + math.ceil(months_left - 1e-9)
+                
+                if remaining <= 0.005:
+                    remaining = 0.0
+                    break
+            
+            return {
+                'success': True,
+                'loan_amount': loan_amount,
+                'annual_rate': annual_rate,
+                'years': years,
+                'original_payment': round(original_payment, 2),
+                'original_months': months,
+                'new_months': month,
+                'months_saved': months - month,
+                'final_payment': round(payment, 2),
+                'total_prepaid': round(total_prepaid, 2),
+                'prepayments_count': events_applied,
+                'total_interest': round(total_interest, 2),
+                'total_paid_with_early': round(total_paid, 2),
+                'total_savings': round(max(original_total - total_paid, 0.0), 2)
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'loan_amount': loan_amount,
+                'annual_rate': annual_rate,
+                'years': years
+            }
+    
+    @staticmethod
+    @_memoized
+    def calculate_effective_rate(loan_amount: float, annual_rate: float, years: int,
+                               insurance_percent: float = 0.3, other_fees: float = 0,
+                               payment_type: str = 'annuity') -> Dict[str, Any]:
+        """
+        Расчет полной стоимости кредита (ПСК) с учетом всех расходов
+        
+        Строится полный помесячный поток платежей (платежи по кредиту,
+        страховка от убывающего остатка, разовые комиссии), и по нему
+        находится IRR. ПСК = месячная IRR × 12 (как в 353-ФЗ).
+        
+        Args:
+            loan_amount: Сумма кредита
+            annual_rate: Номинальная годовая ставка (%)
+            years: Срок кредита в годах
+            insurance_percent: Процент страховки от остатка долга (годовых)
+            other_fees: Другие единовременные расходы
+            payment_type: Тип платежей ('annuity' или 'differentiated')
             
-            # Общая стоимость кредита
-            total_cost = base_result['total_paid'] + total_insurance + other_fees
+        Returns:
+            Словарь с эффективной ставкой
+        """
+        try:
+            if loan_amount <= 0:
+                raise ValueError("Сумма кредита должна быть положительной")
+            if annual_rate < 0:
+                raise ValueError("Процентная ставка не может быть отрицательной")
+            if years <= 0 or years > 50:
+                raise ValueError("Срок кредита должен быть от 1 до 50 лет")
+            if insurance_percent < 0 or other_fees < 0:
+                raise ValueError("Страховка и комиссии не могут быть отрицательными")
+            if other_fees >= loan_amount:
+                raise ValueError("Комиссии не могут превышать сумму кредита")
             
-            # Находим эффективную ставку методом приближения
-            # (упрощенный расчет - в реальности используется сложная формула ЦБ)
-            effective_rate_per_month = effective_rate / 12 / 100
+            months = years * 12
+            monthly_rate = annual_rate / 12 / 100
+            monthly_insurance_rate = insurance_percent / 12 / 100
             
-            payment_with_fees = MortgageCalculator.calculate_annuity_payment(
-                loan_amount + other_fees, effective_rate_per_month, months
+            cash_flows = _loan_cash_flows(
+                loan_amount, monthly_rate, months, payment_type,
+                monthly_insurance_rate, other_fees
             )
+            flows = cash_flows['flows']
+            
+            monthly_irr, iterations = _solve_irr(flows, monthly_rate + monthly_insurance_rate)
+            effective_rate = monthly_irr * 12 * 100
             
-            total_with_fees = payment_with_fees * months
+            total_cost = -sum(flows[1:]) + other_fees
+            base_payment = cash_flows['total_payments'] / months
             
             return {
                 'success': True,
                 'nominal_rate': annual_rate,
-                'effective_rate': round(effective_rate, 2),
-                'insurance_adds': insurance_percent,
-                'base_payment': round(base_result['monthly_payment'], 2),
-                'payment_with_insurance': round(payment_with_fees, 2),
-                'total_insurance': round(total_insurance, 2),
+                'effective_rate': round(effective_rate, 3),
+                'effective_annual_rate': round(math.expm1(12 * math.log1p(monthly_irr)) * 100, 3),
+                'insurance_percent': insurance_percent,
+                'insurance_adds': round(effective_rate - annual_rate, 3),
+                'base_payment': round(base_payment, 2),
+                'payment_with_insurance': round(-flows[1], 2),
+                'total_insurance': round(cash_flows['total_insurance'], 2),
                 'other_fees': other_fees,
-                'total_cost_with_fees': round(total_with_fees, 2),
-                'difference': round(total_with_fees - base_result['total_paid'], 2)
+                'total_cost_with_fees': round(total_cost, 2),
+                'difference': round(total_cost - cash_flows['total_payments'], 2),
+                'payment_type': payment_type,
+                'iterations': iterations
             }
             
         except Exception as e:
@@ -780,4 +1622,56 @@ if __name__ == "__main__":
     
     if result3['success']:
         print(f"Максимальный кредит: {MortgageCalculator.format_currency(result3['max_loan'])}")
-        print(f"Примерная стоимость жилья: {MortgageCalculator.format_currency(result3['example_property_cost'])}")
\ No newline at end of file
+        print(f"Примерная стоимость жилья: {MortgageCalculator.format_currency(result3['example_property_cost'])}")
+    
+    # Тест 4: Обратные расчеты
+    print("\n🔁 Тест 4: Обратные расчеты")
+    rate_result = MortgageCalculator.solve_rate_for_payment(5000000, 40279.66, 20)
+    term_result = MortgageCalculator.solve_term_for_payment(5000000, 7.5, 50000)
+    price_result = MortgageCalculator.solve_price_for_payment(60000, 7.5, 20, downpayment_amount=1500000)
+    
+    if rate_result['success']:
+        print(f"Ставка для платежа 40 279,66 ₽: {rate_result['annual_rate']}% ({rate_result['iterations']} итераций)")
+    if term_result['success']:
+        print(f"Срок при платеже 50 000 ₽: {term_result['months']} мес.")
+    if price_result['success']:
+        print(f"Стоимость жилья при платеже 60 000 ₽: {MortgageCalculator.format_currency(price_result['property_price'])}")
+    
+    for result in MortgageCalculator.solve_price_batch([40000, 60000, 80000], 7.5, 20, downpayment_percent=20):
+        print(f"Платеж {MortgageCalculator.format_currency(result['monthly_payment'])}: "
+              f"жилье до {MortgageCalculator.format_currency(result['property_price'])}")
+    
+    # Бенчмарк: Ньютон с вилкой против наивной бисекции
+    import time
+    
+    print("\n⏱️ Бенчмарк поиска ставки (Ньютон против бисекции)")
+    benchmark_cases = [
+        (5000000, 5000000 * _annuity_factor(rate / 12 / 100, years * 12), years)
+        for rate in (2.0, 5.0, 6.0, 7.5, 9.0, 12.0, 15.0, 18.0)
+        for years in (5, 10, 15, 20, 25, 30)
+    ]
+    
+    started = time.perf_counter()
+    newton_iterations = 0
+    for loan, payment, years in benchmark_cases:
+        newton_iterations += _solve_monthly_rate(loan, payment, years * 12)[1]
+    newton_time = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    bisection_iterations = 0
+    for loan, payment, years in benchmark_cases:
+        months = years * 12
+        bisection_iterations += _bisection(
+            lambda rate: _annuity_factor(rate, months) - payment / loan, 0.0, _MAX_MONTHLY_RATE
+        )[1]
+    bisection_time = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    batch_results = MortgageCalculator.solve_rate_batch(benchmark_cases)
+    batch_time = time.perf_counter() - started
+    batch_iterations = sum(result['iterations'] for result in batch_results)
+    
+    count = len(benchmark_cases)
+    print(f"Ньютон: {newton_time / count * 1e6:.1f} мкс/задача, {newton_iterations / count:.1f} итераций")
+    print(f"Бисекция: {bisection_time / count * 1e6:.1f} мкс/задача, {bisection_iterations / count:.1f} итераций")
+    print(f"Пакет (solve_rate_batch): {batch_time / count * 1e6:.1f} мкс/задача, {batch_iterations / count:.1f} итераций")
@@ -0,0 +1,114 @@
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from models import Property
+
+# Карточек на одной странице выдачи
+PAGE_SIZE = 8
+
+# Сколько выдач хранить и сколько секунд по ним можно листать
+RESULT_CACHE_SIZE = 512
+RESULT_TTL = 30 * 60
+
+# ========== ПОСТРАНИЧНАЯ ВЫДАЧА ==========
+# Результат поиска сохраняется целиком под коротким случайным токеном.
+# Курсор в callback_data - токен и сдвиг, поэтому следующая страница
+# берется из памяти без повторной загрузки и разбора сайта.
+
+class ResultSet(NamedTuple):
+    """Сохраненная выдача"""
+    title: str  # Что искали: название подкатегории или "Подбор по цене и площади"
+    city: str
+    properties: List[Property]
+    created: float
+    # Параметры поиска для подписки на новые объекты (None - подписка недоступна)
+    query: Optional[Dict[str, Any]] = None
+
+class ResultPage(NamedTuple):
+    """Страница выдачи"""
+    result: ResultSet
+    properties: List[Property]
+    offset: int  # Сдвиг следующей страницы
+    remaining: int  # Сколько объектов осталось после этой страницы
+
+_results: "OrderedDict[str, ResultSet]" = OrderedDict()
+_stats = {'saved': 0, 'pages': 0, 'expired': 0}
+
+def save_results(properties: List[Property], title: str, city: str,
+                 query: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Сохраняет выдачу и возвращает ее токен для курсора
+
+    Args:
+        properties: Все найденные объекты по порядку выдачи
+        title: Что искали (для подписи карточек)
+        city: Город поиска
+        query: Параметры config.add_subscription для подписки на эту выдачу
+
+    Returns:
+        Токен выдачи (8 шестнадцатеричных символов)
+    """
+    token = secrets.token_hex(4)
+    _results[token] = ResultSet(title, city, list(properties), time.monotonic(), query)
+    if len(_results) > RESULT_CACHE_SIZE:
+        _results.popitem(last=False)
+    _stats['saved'] += 1
+    return token
+
+def get_results(token: str) -> Optional[ResultSet]:
+    """
+    Сохраненная выдача или None, если она устарела или вытеснена
+
+    Чтение делает выдачу недавно использованной, поэтому выдачу,
+    которую листают, вытесняют последней.
+    """
+    result = _results.get(token)
+    if result is None:
+        return None
+
+    if time.monotonic() - result.created > RESULT_TTL:
+        del _results[token]
+        _stats['expired'] += 1
+        return None
+
+    _results.move_to_end(token)
+    return result
+
+def get_page(token: str, offset: int = 0, limit: int = PAGE_SIZE) -> Optional[ResultPage]:
+    """
+    Страница сохраненной выдачи
+
+    Args:
+        token: Токен из save_results()
+        offset: Сколько объектов уже показано
+        limit: Размер страницы
+
+    Returns:
+        ResultPage или None, если выдача устарела или вытеснена
+    """
+    result = get_results(token)
+    if result is None:
+        return None
+
+    offset = max(offset, 0)
+    page = result.properties[offset:offset + limit]
+    next_offset = offset + len(page)
+    _stats['pages'] += 1
+    return ResultPage(result, page, next_offset, len(result.properties) - next_offset)
+
+def pagination_stats() -> Dict[str, Any]:
+    """Сохранено выдач, выдано страниц, устаревших курсоров, выдач в памяти"""
+    return {**_stats, 'size': len(_results)}
+
+# Экспорт
+__all__ = [
+    'PAGE_SIZE',
+    'ResultSet',
+    'ResultPage',
+    'save_results',
+    'get_results',
+    'get_page',
+    'pagination_stats'
+]
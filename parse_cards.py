@@ -1,24 +1,156 @@
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
 import aiohttp
 import logging
 import re
 import asyncio
-from typing import List, Dict, Optional, Any
+import hashlib
+from collections import OrderedDict
+from dataclasses import replace
+from typing import List, Dict, Optional, Any, Tuple
 import json
+import time
+
+from config import PARSER_KEEP_FULL_TEXT
+from listing_index import LISTINGS, INDEX_MAX_AGE
+from metrics import REGISTRY
+from models import Property
+from pricing import AREA_PATTERN, parse_area, parse_price, total_price
+from text_search import normalize_text
 
 # Базовый URL сайта с недвижимостью
 URL = "https://www.xn----htbkhfjn2e0c.xn--p1ai/"
 
-def setup_logging():
-    """Настройка логирования для парсера"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    return logging.getLogger(__name__)
+# Сколько символов описания карточки хранить для поиска
+DESCRIPTION_MAX_CHARS = 300
+
+# Сколько разобранных карточек помнить по отпечатку
+CARD_CACHE_SIZE = 4096
+
+# Настройка логирования (обработчики настраивает main.py)
+logger = logging.getLogger(__name__)
+
+# Границы корзин для этапов парсинга (от долей миллисекунды до таймаута)
+PARSER_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Этапы парсинга в порядке выполнения (для вывода в /debug)
+PARSER_STAGES = (
+    'dns', 'connect', 'ttfb', 'download', 'soup', 'find_cards',
+    'extract', 'fingerprint', 'city_detection', 'normalize', 'index', 'filter',
+    'fetch_all_properties', 'fetch_and_filter_by_city'
+)
+
+PARSER_STAGE_DURATION = REGISTRY.histogram(
+    "parser_stage_duration_seconds", "Длительность этапов парсинга", PARSER_BUCKETS
+)
+PARSER_BYTES = REGISTRY.counter(
+    "parser_downloaded_bytes_total", "Скачано байт HTML (после распаковки)"
+)
+PARSER_CARDS = REGISTRY.counter(
+    "parser_cards_parsed_total", "Разобрано карточек"
+)
+PARSER_CITY_DETECTION = REGISTRY.counter(
+    "parser_city_detection_total", "Каким способом определен город карточки при разборе"
+)
+PARSER_CITY_FALLBACK = REGISTRY.counter(
+    "parser_city_text_fallback_total", "Город карточки без города взят из ее текста при фильтрации"
+)
+PARSER_CACHE = REGISTRY.counter(
+    "parser_cache_events_total", "Попадания и промахи кешей парсера (DNS, соединения, карточки)"
+)
+
+def _trace_config() -> aiohttp.TraceConfig:
+    """
+    Трассировка запросов aiohttp: DNS, установка соединения (TCP + TLS),
+    время до заголовков ответа и попадания в кеши клиента
+
+    ttfb отсчитывается от готового соединения (нового или взятого из пула),
+    поэтому не включает DNS и connect.
+    """
+    async def on_request_start(session, context, params):
+        context.ttfb_start = time.perf_counter()
+    
+    async def on_request_end(session, context, params):
+        PARSER_STAGE_DURATION.observe(time.perf_counter() - context.ttfb_start, stage='ttfb')
+    
+    async def on_dns_start(session, context, params):
+        context.dns_start = time.perf_counter()
+    
+    async def on_dns_end(session, context, params):
+        PARSER_STAGE_DURATION.observe(time.perf_counter() - context.dns_start, stage='dns')
+    
+    async def on_connection_start(session, context, params):
+        context.connection_start = time.perf_counter()
+    
+    async def on_connection_end(session, context, params):
+        context.ttfb_start = time.perf_counter()
+        PARSER_STAGE_DURATION.observe(context.ttfb_start - context.connection_start, stage='connect')
+        PARSER_CACHE.inc(cache='connection', result='miss')
+    
+    async def on_connection_reuse(session, context, params):
+        context.ttfb_start = time.perf_counter()
+        PARSER_CACHE.inc(cache='connection', result='hit')
+    
+    async def on_dns_cache_hit(session, context, params):
+        PARSER_CACHE.inc(cache='dns', result='hit')
+    
+    async def on_dns_cache_miss(session, context, params):
+        PARSER_CACHE.inc(cache='dns', result='miss')
+    
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_dns_resolvehost_start.append(on_dns_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_end)
+    trace_config.on_connection_create_start.append(on_connection_start)
+    trace_config.on_connection_create_end.append(on_connection_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuse)
+    trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+    trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+    return trace_config
+
+def parser_stats() -> Dict[str, Any]:
+    """
+    Сводка телеметрии парсера для /debug
 
-logger = setup_logging()
+    Returns:
+        Словарь со средним временем этапов, объемом загрузки,
+        способами определения города при разборе (в сумме - все
+        карточки), доопределениями по тексту и долей попаданий в кеши
+    """
+    stages = {}
+    for stage in PARSER_STAGES:
+        summary = PARSER_STAGE_DURATION.summary(stage=stage)
+        if summary['count']:
+            stages[stage] = {
+                'count': summary['count'],
+                'avg_ms': round(summary['avg'] * 1000, 1)
+            }
+    
+    detection = {
+        method: PARSER_CITY_DETECTION.get(method=method)
+        for method in ('structure', 'flexible', 'undetected')
+    }
+    
+    caches = {}
+    for cache in ('dns', 'connection', 'card'):
+        hits = PARSER_CACHE.get(cache=cache, result='hit')
+        misses = PARSER_CACHE.get(cache=cache, result='miss')
+        total = hits + misses
+        caches[cache] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total * 100, 1) if total else 0.0
+        }
+    
+    return {
+        'stages': stages,
+        'bytes': PARSER_BYTES.get(),
+        'cards': PARSER_CARDS.get(),
+        'city_detection': detection,
+        'city_text_fallback': PARSER_CITY_FALLBACK.get(),
+        'caches': caches
+    }
 
 def fix_url(url: str) -> str:
     """
@@ -128,6 +260,29 @@ async def debug_card_structure(category_url: str) -> int:
         logger.error(f"Ошибка при анализе структуры: {e}")
         return 0
 
+# Синонимы городов для поиска по полному тексту карточки
+CITY_TEXT_SYNONYMS = {
+    'Сочи': ('сочи', 'sochi', 'адлер'),
+    'Геленджик': ('геленджик', 'gelendzhik'),
+    'Новороссийск': ('новороссийск', 'novorossiysk')
+}
+
+def find_cities_in_text(text: str) -> tuple:
+    """
+    Города, упомянутые в тексте карточки (по CITY_TEXT_SYNONYMS)
+    
+    Args:
+        text: Текст карточки
+        
+    Returns:
+        Кортеж названий городов (пустой, если ничего не найдено)
+    """
+    text = text.lower()
+    return tuple(
+        city for city, synonyms in CITY_TEXT_SYNONYMS.items()
+        if any(synonym in text for synonym in synonyms)
+    )
+
 def check_city_in_text(text: str) -> Optional[str]:
     """
     Проверяет наличие города в тексте
@@ -271,6 +426,9 @@ def find_city_flexible(card: BeautifulSoup) -> Optional[str]:
     
     return None
 
+# Символы валюты для поиска цены по тексту карточки
+CURRENCY_PATTERN = re.compile(r'₽|руб|р\.|\$|€')
+
 def extract_price_from_card(card: BeautifulSoup) -> str:
     """
     Извлекает цену из карточки
@@ -301,16 +459,54 @@ def extract_price_from_card(card: BeautifulSoup) -> str:
         except:
             continue
     
-    # Если не нашли, пробуем найти любой текст с цифрами и символами валюты
-    for elem in card.find_all():
-        text = elem.get_text(strip=True)
-        if any(c.isdigit() for c in text) and any(c in text for c in ['₽', 'руб', 'р.', '$', '€']):
-            logger.debug(f"Цена найдена альтернативным способом: {text}")
-            return text
+    # Если не нашли, ищем текстовый узел с символом валюты (один проход по тексту
+    # карточки вместо get_text() для каждого элемента). Число и валюта часто
+    # лежат в соседних тегах, поэтому поднимаемся на пару уровней вверх.
+    for node in card.find_all(string=CURRENCY_PATTERN):
+        elem = node.parent
+        for _ in range(3):
+            if elem is None:
+                break
+            text = elem.get_text(' ', strip=True)
+            if any(c.isdigit() for c in text):
+                text = re.sub(r'\s+', ' ', text)
+                logger.debug(f"Цена найдена альтернативным способом: {text}")
+                return text
+            if elem is card:
+                break
+            elem = elem.parent
     
     return "Цена не указана"
 
-def extract_property_data(card: BeautifulSoup, url: str) -> Dict[str, Any]:
+# ========== ОТПЕЧАТКИ КАРТОЧЕК ==========
+# Один объект часто выставлен в нескольких подкатегориях ("Новостройки
+# эконом-класса" и "1-комнатные"). Объект определяется канонической
+# ссылкой; отпечаток - хеш нормализованных названия и локации, без цены,
+# чтобы не меняться при переоценке. По нему индекс склеивает разные
+# ссылки (listing_index.merge_keys). Карточка, уже разобранная с той же
+# ссылкой, отпечатком и ценой, берется из кеша без определения города,
+# нормализации и разбора описания.
+
+_parsed_cards: "OrderedDict[Tuple[str, str, str], Property]" = OrderedDict()
+
+# Параметры ссылок, которые не меняют объект (метки рекламы и переходов)
+_TRACKING_PARAM_RE = re.compile(r'^(utm_\w+|yclid|gclid|fbclid|from)$', re.I)
+
+def canonical_link(link: str) -> str:
+    """Ссылка без фрагмента и рекламных меток, хост в нижнем регистре"""
+    parts = urlsplit(link)
+    query = urlencode([
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _TRACKING_PARAM_RE.match(name)
+    ])
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ''))
+
+def listing_fingerprint(title: str, location: str) -> str:
+    """Отпечаток объекта: хеш нормализованных названия и локации (без цены)"""
+    data = "\x1f".join(normalize_text(part) for part in (title, location))
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=8).hexdigest()
+
+def extract_property_data(card: BeautifulSoup, url: str) -> Optional[Property]:
     """
     Извлекает данные о недвижимости из карточки
     
@@ -319,70 +515,127 @@ def extract_property_data(card: BeautifulSoup, url: str) -> Dict[str, Any]:
         url: URL страницы
         
     Returns:
-        Словарь с данными о недвижимости
+        Объект Property или None, если карточку не удалось разобрать
     """
-    property_data = {}
-    
     try:
         # Название
         title_elem = card.find('a', class_='catalog-page-cart__title')
         if not title_elem:
             title_elem = card.find(class_=re.compile(r'title|name|название', re.I))
         
-        property_data['title'] = title_elem.get_text(strip=True) if title_elem else "Название не указано"
-        
-        # Определяем город
-        detected_city = detect_city_in_property(card)
-        if not detected_city:
-            detected_city = find_city_flexible(card)
-        
-        property_data['city'] = detected_city or "Не определен"
-        
-        # Цена
-        property_data['price'] = extract_price_from_card(card)
-        
-        # Фото
-        img_elem = card.find('img')
-        if img_elem:
-            img_src = img_elem.get('src') or img_elem.get('data-src') or img_elem.get('data-original')
-            property_data['image'] = fix_url(img_src) if img_src else None
-        else:
-            property_data['image'] = None
+        title = title_elem.get_text(strip=True) if title_elem else "Название не указано"
         
-        # Ссылка
+        # Ссылка (каноническая: одна и та же для объекта на любой странице)
         if title_elem and title_elem.get('href'):
-            property_data['link'] = fix_url(title_elem['href'])
+            link = canonical_link(fix_url(title_elem['href']))
         else:
             any_link = card.find('a', href=True)
-            property_data['link'] = fix_url(any_link['href']) if any_link else url
+            link = canonical_link(fix_url(any_link['href'])) if any_link else url
         
-        # Локация (детальная)
+        # Цена
+        price = extract_price_from_card(card)
+        
+        # Локация (детальная), если отличается от города
         location_text = ""
         loc_elem = card.find(class_=re.compile(r'loc|location|address|район|улиц', re.I))
         if loc_elem:
             location_text = loc_elem.get_text(strip=True)
         
-        property_data['location'] = location_text or property_data['city']
-        
-        # Сохраняем ВЕСЬ текст карточки для отладки
-        property_data['full_text'] = card.get_text(strip=True)
+        # Та же карточка уже разобрана (например, на странице другой подкатегории)
+        with PARSER_STAGE_DURATION.timer(stage='fingerprint'):
+            fingerprint = listing_fingerprint(title, location_text)
+            cache_key = (link, fingerprint, price)
+            cached = _parsed_cards.get(cache_key)
+        if cached is not None:
+            _parsed_cards.move_to_end(cache_key)
+            PARSER_CACHE.inc(cache='card', result='hit')
+            return cached
+        PARSER_CACHE.inc(cache='card', result='miss')
         
-        # ID карточки (если есть)
-        property_data['card_id'] = card.get('id', '')
+        # Определяем город
+        with PARSER_STAGE_DURATION.timer(stage='city_detection'):
+            detected_city = detect_city_in_property(card)
+            method = 'structure'
+            if not detected_city:
+                detected_city = find_city_flexible(card)
+                method = 'flexible' if detected_city else 'undetected'
+        PARSER_CITY_DETECTION.inc(method=method)
         
-        # Классы карточки
-        property_data['card_classes'] = card.get('class', [])
+        city = detected_city or "Не определен"
         
-        logger.debug(f"Извлечены данные: {property_data['title'][:30]}... | Город: {property_data['city']}")
+        # Фото
+        image = None
+        img_elem = card.find('img')
+        if img_elem:
+            img_src = img_elem.get('src') or img_elem.get('data-src') or img_elem.get('data-original')
+            image = fix_url(img_src) if img_src else None
+        
+        # Цена в рублях и площадь для сортировки и фильтров
+        with PARSER_STAGE_DURATION.timer(stage='normalize'):
+            area = parse_area(title)
+            if area is None:
+                area_node = card.find(string=AREA_PATTERN)
+                area = parse_area(str(area_node)) if area_node is not None else None
+            price_rub = total_price(parse_price(price), area)
+        
+        # Полный текст нужен, только если город не определен по структуре
+        # (фильтр по городу ищет его в тексте) или включена отладка
+        full_text = None
+        text_cities = ()
+        if detected_city is None or PARSER_KEEP_FULL_TEXT:
+            full_text = card.get_text(" ", strip=True)
+            if detected_city is None:
+                text_cities = find_cities_in_text(full_text)
+        
+        # Описание для поиска /search: отдельный блок карточки, а если его нет -
+        # уже полученный полный текст
+        description = ""
+        desc_elem = card.find(class_=re.compile(r'desc|preview|anons|excerpt|описан', re.I))
+        if desc_elem:
+            description = desc_elem.get_text(" ", strip=True)
+        elif full_text:
+            description = full_text
+        description = description[:DESCRIPTION_MAX_CHARS]
+        
+        property_data = Property(
+            title=title,
+            price=price,
+            city=city,
+            link=link,
+            image=image,
+            location=location_text if location_text != city else "",
+            card_id=card.get('id', ''),
+            price_rub=price_rub,
+            area_m2=area,
+            text_cities=text_cities,
+            full_text=full_text if PARSER_KEEP_FULL_TEXT else None,
+            description=description,
+            fingerprint=fingerprint
+        )
+        
+        _parsed_cards[cache_key] = property_data
+        if len(_parsed_cards) > CARD_CACHE_SIZE:
+            _parsed_cards.popitem(last=False)
+        
+        logger.debug(f"Извлечены данные: {property_data.title[:30]}... | Город: {property_data.city}")
+        return property_data
         
     except Exception as e:
         logger.error(f"Ошибка при извлечении данных из карточки: {e}")
-        property_data['error'] = str(e)
-    
-    return property_data
+        return None
+
+# Сколько объектов отдавать в выдачу: бот показывает их страницами,
+# а остальные листаются кнопкой "Показать ещё" без повторного парсинга
+RESULT_MAX_CARDS = 40
+
+# Сколько карточек страницы каталога попадает в индекс. Без фильтра по
+# городу страница всегда парсится не меньше чем на столько карточек,
+# чтобы в индексе у страницы был один и тот же набор объектов, какой бы
+# путь (выдача, фильтр по городу, обновление индекса, подписки) ее ни загрузил
+INDEX_PAGE_CARDS = 2 * RESULT_MAX_CARDS
 
 async def fetch_all_properties(category_url: str, selected_city: Optional[str] = None, 
-                             max_cards: int = 20) -> List[Dict[str, Any]]:
+                             max_cards: int = 20) -> List[Property]:
     """
     Парсит карточки недвижимости с сайта
     
@@ -392,13 +645,32 @@ async def fetch_all_properties(category_url: str, selected_city: Optional[str] =
         max_cards: Максимальное количество карточек для парсинга
         
     Returns:
-        Список словарей с данными о недвижимости
+        Список объектов Property
     """
+    if selected_city is not None:
+        with PARSER_STAGE_DURATION.timer(stage='fetch_all_properties'):
+            return await _fetch_all_properties(category_url, selected_city, max_cards)
+    
+    with PARSER_STAGE_DURATION.timer(stage='fetch_all_properties'):
+        properties = await _fetch_all_properties(category_url, None, max(max_cards, INDEX_PAGE_CARDS))
+    
+    # Без фильтра по городу на странице все объекты - обновляем индекс цен.
+    # Карточки берутся по порядку, поэтому первые INDEX_PAGE_CARDS - тот же
+    # набор, что и при загрузке ровно INDEX_PAGE_CARDS карточек
+    if properties:
+        with PARSER_STAGE_DURATION.timer(stage='index'):
+            LISTINGS.update(fix_url(category_url), properties[:INDEX_PAGE_CARDS])
+    
+    return properties[:max_cards]
+
+async def _fetch_all_properties(category_url: str, selected_city: Optional[str],
+                                max_cards: int) -> List[Property]:
+    """Парсинг страницы категории (см. fetch_all_properties)"""
     try:
         url = fix_url(category_url)
         logger.info(f"Начинаю парсинг: {url} | Город: {selected_city or 'все'} | Лимит: {max_cards}")
         
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[_trace_config()]) as session:
             # Устанавливаем заголовки, чтобы выглядеть как браузер
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
@@ -410,36 +682,53 @@ async def fetch_all_properties(category_url: str, selected_city: Optional[str] =
             
             async with session.get(url, headers=headers, timeout=30) as response:
                 if response.status == 200:
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
+                    with PARSER_STAGE_DURATION.timer(stage='download'):
+                        body = await response.read()
+                        html = await response.text()
+                    PARSER_BYTES.inc(len(body))
                     
-                    # Ищем карточки недвижимости
-                    property_cards = soup.find_all('div', class_='catalog-page-cart__item')
-                    logger.info(f"На странице найдено {len(property_cards)} карточек")
+                    with PARSER_STAGE_DURATION.timer(stage='soup'):
+                        soup = BeautifulSoup(html, 'html.parser')
                     
-                    if not property_cards:
-                        # Пробуем альтернативные селекторы
-                        property_cards = soup.find_all(class_=re.compile(r'cart|item|card|product', re.I))
-                        logger.info(f"Альтернативным поиском найдено {len(property_cards)} карточек")
+                    # Ищем карточки недвижимости
+                    with PARSER_STAGE_DURATION.timer(stage='find_cards'):
+                        property_cards = soup.find_all('div', class_='catalog-page-cart__item')
+                        logger.info(f"На странице найдено {len(property_cards)} карточек")
+                        
+                        if not property_cards:
+                            # Пробуем альтернативные селекторы
+                            property_cards = soup.find_all(class_=re.compile(r'cart|item|card|product', re.I))
+                            logger.info(f"Альтернативным поиском найдено {len(property_cards)} карточек")
                     
                     all_properties = []
+                    seen_cards = set()
                     cards_processed = 0
                     
                     for card in property_cards:
                         if cards_processed >= max_cards:
                             break
                         
-                        property_data = extract_property_data(card, url)
+                        with PARSER_STAGE_DURATION.timer(stage='extract'):
+                            property_data = extract_property_data(card, url)
+                        PARSER_CARDS.inc()
+                        
+                        if property_data is None:
+                            continue
                         
                         # Фильтрация по городу
-                        if selected_city:
-                            city = property_data.get('city', '')
-                            if city != selected_city:
-                                continue
+                        if selected_city and property_data.city != selected_city:
+                            continue
+                        
+                        # Дубль карточки на той же странице: та же ссылка и то же содержимое.
+                        # Разные ссылки с одинаковым содержимым - разные объекты
+                        card_key = (property_data.link, property_data.fingerprint)
+                        if card_key in seen_cards:
+                            continue
                         
                         # Добавляем только если есть название
-                        if property_data.get('title') != "Название не указано":
+                        if property_data.title != "Название не указано":
                             all_properties.append(property_data)
+                            seen_cards.add(card_key)
                             cards_processed += 1
                     
                     logger.info(f"После фильтрации осталось {len(all_properties)} объектов")
@@ -448,8 +737,7 @@ async def fetch_all_properties(category_url: str, selected_city: Optional[str] =
                     if all_properties:
                         cities_found = {}
                         for prop in all_properties:
-                            city = prop.get('city', 'Не определен')
-                            cities_found[city] = cities_found.get(city, 0) + 1
+                            cities_found[prop.city] = cities_found.get(prop.city, 0) + 1
                         
                         logger.info(f"Распределение по городам: {cities_found}")
                     
@@ -470,7 +758,7 @@ async def fetch_all_properties(category_url: str, selected_city: Optional[str] =
         return []
 
 async def fetch_and_filter_by_city(category_url: str, selected_city: str, 
-                                 max_cards: int = 20) -> List[Dict[str, Any]]:
+                                 max_cards: int = 20) -> List[Property]:
     """
     Парсит все карточки и фильтрует их на стороне бота
     
@@ -482,58 +770,86 @@ async def fetch_and_filter_by_city(category_url: str, selected_city: str,
     Returns:
         Отфильтрованный список недвижимости
     """
-    logger.info(f"Фильтрация по городу '{selected_city}'")
-    
-    # 1. Парсим все карточки без фильтрации
-    all_properties = await fetch_all_properties(category_url, None, max_cards * 2)
-    
-    # 2. Фильтруем по городу
+    with PARSER_STAGE_DURATION.timer(stage='fetch_and_filter_by_city'):
+        logger.info(f"Фильтрация по городу '{selected_city}'")
+        
+        # 1. Парсим все карточки без фильтрации
+        all_properties = await fetch_all_properties(category_url, None, max_cards * 2)
+        
+        # 2. Фильтруем по городу
+        with PARSER_STAGE_DURATION.timer(stage='filter'):
+            filtered = _filter_by_city(all_properties, selected_city, max_cards)
+        
+        logger.info(f"После фильтрации найдено {len(filtered)} объектов в {selected_city}")
+        return filtered
+
+def _filter_by_city(all_properties: List[Property], selected_city: str,
+                    max_cards: int) -> List[Property]:
+    """Отбирает объекты выбранного города, доопределяя город по тексту карточки"""
     filtered = []
-    city_synonyms = {
-        'Сочи': ['сочи', 'sochi', 'адлер'],
-        'Геленджик': ['геленджик', 'gelendzhik'],
-        'Новороссийск': ['новороссийск', 'novorossiysk']
-    }
     
     for prop in all_properties:
-        city = prop.get('city', '')
-        
-        # Если город не определен, пытаемся определить из текста
-        if city == "Не определен" and selected_city:
-            full_text = prop.get('full_text', '').lower()
-            
-            synonyms = city_synonyms.get(selected_city, [selected_city.lower()])
-            for synonym in synonyms:
-                if synonym in full_text:
-                    prop['city'] = selected_city
-                    break
+        # Если город не определен, берем его из текста карточки. Объект
+        # меняется в копии: те же объекты лежат в LISTINGS и в кеше карточек
+        if prop.city == "Не определен" and selected_city in prop.text_cities:
+            prop = replace(prop, city=selected_city)
+            PARSER_CITY_FALLBACK.inc()
         
         # Фильтруем по точному совпадению
-        if prop.get('city') == selected_city:
+        if prop.city == selected_city:
             filtered.append(prop)
         
         # Ограничиваем количество результатов
         if len(filtered) >= max_cards:
             break
     
-    logger.info(f"После фильтрации найдено {len(filtered)} объектов в {selected_city}")
     return filtered
 
-async def fetch_properties(category_url: str, selected_city: Optional[str] = None) -> List[Dict[str, Any]]:
+async def fetch_properties(category_url: str, selected_city: Optional[str] = None,
+                           max_cards: int = RESULT_MAX_CARDS) -> List[Property]:
     """
     Основная функция для получения свойств недвижимости
     
     Args:
         category_url: URL категории
         selected_city: Город для фильтрации
+        max_cards: Максимальное количество объектов в выдаче
         
     Returns:
         Список недвижимости
     """
     if selected_city:
-        return await fetch_and_filter_by_city(category_url, selected_city, max_cards=8)
+        return await fetch_and_filter_by_city(category_url, selected_city, max_cards=max_cards)
     else:
-        return await fetch_all_properties(category_url, None, max_cards=20)
+        return await fetch_all_properties(category_url, None, max_cards=max_cards)
+
+# Обновление индекса: сколько страниц каталога загружать одновременно
+INDEX_REFRESH_CONCURRENCY = 4
+
+async def refresh_listing_index(urls, max_age: float = INDEX_MAX_AGE) -> int:
+    """
+    Загружает в индекс страницы каталога, которых там нет или которые устарели
+    
+    Args:
+        urls: URL страниц каталога
+        max_age: Возраст страницы в индексе (сек), после которого она загружается заново
+        
+    Returns:
+        Количество загруженных страниц
+    """
+    missing = LISTINGS.missing_pages(urls, max_age)
+    if not missing:
+        return 0
+    
+    semaphore = asyncio.Semaphore(INDEX_REFRESH_CONCURRENCY)
+    
+    async def refresh(url: str):
+        async with semaphore:
+            await fetch_all_properties(url, None, INDEX_PAGE_CARDS)
+    
+    logger.info(f"Обновление индекса: {len(missing)} страниц каталога")
+    await asyncio.gather(*(refresh(url) for url in missing))
+    return len(missing)
 
 async def test_parsing():
     """Тестовая функция для проверки парсинга"""
@@ -552,7 +868,7 @@ async def test_parsing():
     print(f"Найдено: {len(all_props)}")
     
     for i, prop in enumerate(all_props[:3], 1):
-        print(f"{i}. {prop.get('title', 'Нет названия')[:50]}... | Город: {prop.get('city')}")
+        print(f"{i}. {prop.title[:50]}... | Город: {prop.city}")
     
     # Тест парсинга с фильтром
     print("\n📍 Парсинг с фильтром 'Сочи':")
@@ -560,18 +876,23 @@ async def test_parsing():
     print(f"Найдено в Сочи: {len(sochi_props)}")
     
     for i, prop in enumerate(sochi_props, 1):
-        print(f"{i}. {prop.get('title', 'Нет названия')[:50]}...")
+        print(f"{i}. {prop.title[:50]}...")
 
 # Экспорт функций
 __all__ = [
     'fix_url',
+    'canonical_link',
+    'listing_fingerprint',
     'debug_card_structure',
     'fetch_all_properties',
     'fetch_and_filter_by_city',
     'fetch_properties',
+    'refresh_listing_index',
+    'parser_stats',
     'test_parsing'
 ]
 
 # Запуск теста при прямом выполнении файла
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     asyncio.run(test_parsing())
\ No newline at end of file
@@ -0,0 +1,216 @@
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+# ========== НОРМАЛИЗАЦИЯ ЦЕН И ПЛОЩАДЕЙ ==========
+# Строки с сайта ("12 500 000 ₽", "от 3,5 млн руб.", "95 000 ₽/м²",
+# "4,2 – 6,8 млн") переводятся в целые рубли, чтобы их можно было
+# сортировать и фильтровать.
+
+# Число с пробелами (в том числе неразрывными) между тысячами и дробной частью через запятую или точку
+_NUMBER = r'\d{1,3}(?:[ \u00a0\u2009\u202f]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?'
+
+_PRICE_RE = re.compile(
+    rf'(?P<number>{_NUMBER})\s*(?P<unit>млрд|млн|тыс|т\.р|k\b)?', re.I
+)
+_MULTIPLIERS = {'млрд': 1_000_000_000, 'млн': 1_000_000, 'тыс': 1_000, 'т.р': 1_000, 'k': 1_000}
+
+# Между числами диапазона: "–", "-", "до" (возможно, после валюты)
+_RANGE_GAP_RE = re.compile(r'\s*(?:₽|руб\.?|р\.)?\s*(?:-|–|—|до)\s*$', re.I)
+
+# Валюта сразу после числа
+_CURRENCY_AFTER_RE = re.compile(r'\s*(?:₽|руб|р\.)', re.I)
+
+# Цена за квадратный метр или сотку
+_PER_M2_RE = re.compile(r'(?:/|за\s*)(?:1\s*)?(?:кв\.?\s*м|м²|м2|м\b)', re.I)
+_PER_SOTKA_RE = re.compile(r'(?:/|за\s*)(?:1\s*)?сот', re.I)
+
+# Площадь: "54,3 м²", "25 кв.м", "6 сот.", "1,2 га"
+AREA_PATTERN = re.compile(
+    rf'(?P<number>{_NUMBER})\s*(?P<unit>м²|м2|кв\.?\s*м|сот|га)', re.I
+)
+_AREA_UNITS = {'сот': 100.0, 'га': 10_000.0}
+
+# Цены дешевле этого - скорее всего не цена объекта (номер, этаж, площадь)
+MIN_PLAUSIBLE_PRICE = 10_000
+
+class PriceInfo(NamedTuple):
+    """Разобранная цена"""
+    min_rub: int
+    max_rub: Optional[int]  # None, если цена не диапазон ("от ...")
+    per_unit: Optional[str]  # 'm2' или 'sotka' для цены за единицу площади
+
+def _to_number(text: str) -> float:
+    """'12 500 000' -> 12500000.0, '3,5' -> 3.5"""
+    return float(re.sub(r'[ \u00a0\u2009\u202f]', '', text).replace(',', '.'))
+
+def _is_range(text: str, first: re.Match, second: re.Match) -> bool:
+    """Связаны ли два числа в диапазон ("4,2 – 6,8", "от 2 до 4")"""
+    return bool(_RANGE_GAP_RE.match(text, first.end(), second.start()))
+
+def _amounts(numbers: List[re.Match]) -> List[int]:
+    """Суммы в рублях; "4,2 – 6,8 млн": множитель второго числа относится и к первому"""
+    multipliers = [_MULTIPLIERS.get((match.group('unit') or '').lower()) for match in numbers]
+    last_multiplier = multipliers[-1] or 1
+    return [
+        int(round(_to_number(match.group('number')) * (multiplier or last_multiplier)))
+        for match, multiplier in zip(numbers, multipliers)
+    ]
+
+def _price_from(text: str, matches: List[re.Match], per_unit: Optional[str]) -> Optional[PriceInfo]:
+    """
+    Цена из числа (или диапазона из двух чисел) рядом с валютой, а если
+    валюты нет - из первого правдоподобного числа. Номера, этажи и площади
+    ("2-к квартира 45 м² 7 500 000 ₽") меньше MIN_PLAUSIBLE_PRICE и пропускаются.
+    """
+    first = None
+    index = 0
+    while index < len(matches):
+        is_range = index + 1 < len(matches) and _is_range(text, matches[index], matches[index + 1])
+        numbers = matches[index:index + 2] if is_range else matches[index:index + 1]
+        index += len(numbers)
+
+        amounts = _amounts(numbers)
+        if per_unit is None and max(amounts) < MIN_PLAUSIBLE_PRICE:
+            continue
+
+        if len(amounts) == 2 and amounts[1] > amounts[0]:
+            price = PriceInfo(amounts[0], amounts[1], per_unit)
+        else:
+            price = PriceInfo(amounts[0], None, per_unit)
+
+        if _CURRENCY_AFTER_RE.match(text, numbers[-1].end()):
+            return price
+        if first is None:
+            first = price
+
+    return first
+
+def parse_price(text: Optional[str]) -> Optional[PriceInfo]:
+    """
+    Переводит строку цены в рубли
+
+    Если рядом указаны полная цена и цена за м² ("5 500 000 ₽, 120 000 ₽/м²"),
+    берется полная.
+
+    Args:
+        text: Цена с сайта
+
+    Returns:
+        PriceInfo или None, если цену разобрать не удалось
+    """
+    if not text:
+        return None
+
+    matches = list(_PRICE_RE.finditer(text))
+    if not matches:
+        return None
+
+    per_unit_match = _PER_SOTKA_RE.search(text) or _PER_M2_RE.search(text)
+    if per_unit_match is None:
+        return _price_from(text, matches, None)
+
+    per_unit = 'sotka' if per_unit_match.re is _PER_SOTKA_RE else 'm2'
+
+    # Число (или диапазон), к которому относится "/м²"
+    before = [match for match in matches if match.end() <= per_unit_match.start()] or matches[:1]
+    unit_start = len(before) - 1
+    if unit_start > 0 and _is_range(text, before[unit_start - 1], before[unit_start]):
+        unit_start -= 1
+
+    # Перед ценой за м² есть полная цена
+    total = _price_from(text, before[:unit_start], None)
+    if total is not None:
+        return total
+
+    return _price_from(text, before[unit_start:], per_unit)
+
+def parse_area(text: Optional[str]) -> Optional[float]:
+    """
+    Площадь в квадратных метрах из текста ("54,3 м²", "6 сот.", "1,2 га")
+
+    Returns:
+        Площадь в м² или None
+    """
+    if not text:
+        return None
+
+    match = AREA_PATTERN.search(text)
+    if not match:
+        return None
+
+    unit = match.group('unit').lower()
+    return round(_to_number(match.group('number')) * _AREA_UNITS.get(unit, 1.0), 2)
+
+def total_price(price: Optional[PriceInfo], area: Optional[float]) -> Optional[int]:
+    """
+    Полная цена объекта в рублях (нижняя граница, если указан диапазон)
+
+    Цена за м² или сотку пересчитывается по площади; без площади - None.
+    """
+    if price is None:
+        return None
+    if price.per_unit is None:
+        return price.min_rub
+    if area is None:
+        return None
+    unit_area = 100.0 if price.per_unit == 'sotka' else 1.0
+    return int(round(price.min_rub * area / unit_area))
+
+# Ответы "без ограничения" в фильтрах
+_ANY_RANGE = {'-', '—', '–', 'любая', 'любой', 'любое', 'нет', 'пропустить', 'все', 'неважно'}
+
+def parse_range(text: Optional[str], kind: str = 'price') -> Optional[Tuple[Optional[float], Optional[float]]]:
+    """
+    Разбирает диапазон, введенный пользователем в фильтре
+
+    "3-6 млн", "от 3 до 6 млн", "до 8 млн", "от 5 000 000" для цены;
+    "30-60", "от 40", "до 80" для площади. "-" или "любая" - без ограничения.
+    Для цены числа меньше 1000 без единиц считаются миллионами ("3-6").
+    Одно число без "от"/"до" - верхняя граница цены или нижняя граница площади.
+
+    Args:
+        text: Ввод пользователя
+        kind: 'price' или 'area'
+
+    Returns:
+        Кортеж (от, до), где None - без ограничения, или None при ошибке ввода
+    """
+    if text is None:
+        return None
+
+    text = text.strip().lower()
+    if text in _ANY_RANGE:
+        return (None, None)
+
+    matches = list(_PRICE_RE.finditer(text))
+    if not matches or len(matches) > 2:
+        return None
+
+    values = [_to_number(match.group('number')) for match in matches]
+    if kind == 'price':
+        multipliers = [_MULTIPLIERS.get((match.group('unit') or '').lower()) for match in matches]
+        last_multiplier = multipliers[-1] or 1
+        values = [
+            value * (multiplier or last_multiplier) for value, multiplier in zip(values, multipliers)
+        ]
+        values = [value * 1_000_000 if value < 1000 else value for value in values]
+
+    if len(values) == 2:
+        low, high = sorted(values)
+        return (low, high)
+
+    if text.startswith(('до', '<', 'не дороже', 'не больше')):
+        return (None, values[0])
+    if text.startswith(('от', '>', 'не дешевле', 'не меньше')):
+        return (values[0], None)
+    return (None, values[0]) if kind == 'price' else (values[0], None)
+
+# Экспорт
+__all__ = [
+    'PriceInfo',
+    'AREA_PATTERN',
+    'parse_price',
+    'parse_area',
+    'total_price',
+    'parse_range'
+]
@@ -0,0 +1,97 @@
+"""
+Замер стоимости маршрутизации callback-запроса
+
+Сравнивает два способа найти обработчик для одного и того же набора
+callback_data:
+    * как раньше - фильтры F.data == "..." / F.data.startswith("...")
+      проверяются по очереди в порядке регистрации во всех роутерах;
+    * CallbackTable - поиск в словаре (см. callbacks.py).
+
+Использование:
+    python routing_benchmark.py
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from aiogram import F
+from aiogram.dispatcher.event.handler import FilterObject
+
+from captcha import start_callbacks
+from choose_category import category_callbacks
+from mortgage_bot import mortgage_callbacks
+
+# Таблицы в порядке подключения роутеров в main.py
+TABLES = (start_callbacks, category_callbacks, mortgage_callbacks)
+
+# Примеры callback_data для маршрутов с префиксом
+PREFIX_SAMPLES = (
+    "cap:123456:17",
+    "city_Sochi",
+    "cat_kvartiry",
+    "s_h",
+    "sub_Студии",
+    "rate_family",
+    "years_20",
+    "schedule_csv:5000000.00:12:20:a",
+    "down_20",
+    "early_lump_sum",
+    "num_5",
+)
+
+RUNS = 200
+
+def build_linear_filters():
+    """Фильтры aiogram в том порядке, в котором они были зарегистрированы"""
+    filters = []
+    for table in TABLES:
+        for kind, value in table.registrations:
+            magic = F.data == value if kind == 'exact' else F.data.startswith(value)
+            filters.append((FilterObject(magic), value))
+    return filters
+
+async def route_linear(filters, event) -> int:
+    """Проверяет фильтры по очереди; возвращает число проверенных фильтров"""
+    for checked, (filter_object, _) in enumerate(filters, 1):
+        if await filter_object.call(event):
+            return checked
+    return len(filters)
+
+async def route_table(event) -> int:
+    """Ищет маршрут в таблицах роутеров; возвращает число просмотренных таблиц"""
+    for checked, table in enumerate(TABLES, 1):
+        if await table._match(event):
+            return checked
+    return len(TABLES)
+
+async def main():
+    filters = build_linear_filters()
+    samples = [value for table in TABLES for kind, value in table.registrations if kind == 'exact']
+    samples += PREFIX_SAMPLES
+    events = [SimpleNamespace(data=data) for data in samples]
+
+    print(f"Маршрутов: {len(filters)}, примеров callback_data: {len(events)}\n")
+    print(f"{'callback_data':<36}{'фильтров':>9}{'линейно, мкс':>14}{'таблица, мкс':>14}")
+
+    total_linear = total_table = 0.0
+    for event in events:
+        start = time.perf_counter()
+        for _ in range(RUNS):
+            checked = await route_linear(filters, event)
+        linear = (time.perf_counter() - start) / RUNS * 1e6
+
+        start = time.perf_counter()
+        for _ in range(RUNS):
+            await route_table(event)
+        table = (time.perf_counter() - start) / RUNS * 1e6
+
+        total_linear += linear
+        total_table += table
+        print(f"{event.data[:35]:<36}{checked:>9}{linear:>14.1f}{table:>14.1f}")
+
+    count = len(events)
+    print(f"\nВ среднем на апдейт: линейно {total_linear / count:.1f} мкс, "
+          f"таблица {total_table / count:.1f} мкс")
+
+if __name__ == "__main__":
+    asyncio.run(main())
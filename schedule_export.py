@@ -0,0 +1,133 @@
+import csv
+import io
+import zipfile
+from typing import Iterable
+
+from mortgage_calculator import MortgageCalculator
+
+# Заголовки колонок графика платежей
+SCHEDULE_HEADER = ('Месяц', 'Платеж', 'Основной долг', 'Проценты', 'Остаток долга')
+
+def _csv_money(value: float) -> str:
+    """Сумма с копейками и десятичной запятой (русский Excel читает точку как текст или дату)"""
+    return f"{value:.2f}".replace('.', ',')
+
+def _csv_rows(rows: Iterable[tuple]) -> Iterable[tuple]:
+    """Строки графика для CSV: денежные колонки - до копеек, с десятичной запятой"""
+    for month, payment, principal, interest, remaining in rows:
+        yield month, _csv_money(payment), _csv_money(principal), _csv_money(interest), _csv_money(remaining)
+
+def schedule_to_csv(loan_amount: float, annual_rate: float, years: int,
+                    payment_type: str = 'annuity') -> bytes:
+    """
+    Выгружает полный график платежей в CSV
+    
+    Разделитель - точка с запятой, дробная часть - через запятую,
+    кодировка UTF-8 с BOM, чтобы файл корректно открывался в русском Excel.
+    
+    Args:
+        loan_amount: Сумма кредита
+        annual_rate: Годовая процентная ставка (%)
+        years: Срок кредита в годах
+        payment_type: 'annuity' или 'differentiated'
+        
+    Returns:
+        Содержимое CSV-файла
+    """
+    rows = MortgageCalculator.amortization_schedule(loan_amount, annual_rate, years, payment_type)
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';', lineterminator='\n')
+    writer.writerow(SCHEDULE_HEADER)
+    writer.writerows(_csv_rows(rows))
+    
+    return buffer.getvalue().encode('utf-8-sig')
+
+# Минимальный набор частей XLSX-документа (один лист)
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="График" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+def _xml_escape(text: str) -> str:
+    """Экранирует текст для XML (xml.sax.saxutils тянет за собой urllib и email)"""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def schedule_to_xlsx(loan_amount: float, annual_rate: float, years: int,
+                     payment_type: str = 'annuity') -> bytes:
+    """
+    Выгружает полный график платежей в XLSX
+    
+    Документ собирается напрямую через zipfile (без openpyxl):
+    один лист, заголовок строками, остальные ячейки - числа.
+    
+    Args:
+        loan_amount: Сумма кредита
+        annual_rate: Годовая процентная ставка (%)
+        years: Срок кредита в годах
+        payment_type: 'annuity' или 'differentiated'
+        
+    Returns:
+        Содержимое XLSX-файла
+    """
+    rows = MortgageCalculator.amortization_schedule(loan_amount, annual_rate, years, payment_type)
+    
+    header = ''.join(
+        f'<c t="inlineStr"><is><t>{_xml_escape(title)}</t></is></c>' for title in SCHEDULE_HEADER
+    )
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        f'<sheetData><row>{header}</row>'
+    ]
+    parts.extend(
+        '<row><c><v>%d</v></c><c><v>%.2f</v></c><c><v>%.2f</v></c><c><v>%.2f</v></c><c><v>%.2f</v></c></row>' % row
+        for row in rows
+    )
+    parts.append('</sheetData></worksheet>')
+    
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _XLSX_ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _XLSX_WORKBOOK)
+        archive.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        archive.writestr('xl/worksheets/sheet1.xml', ''.join(parts))
+    
+    return buffer.getvalue()
+
+# Экспорт функций
+__all__ = ['schedule_to_csv', 'schedule_to_xlsx', 'SCHEDULE_HEADER']
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from config import NOTIFY_RATE
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Не чаще одного сообщения в секунду в один чат (ограничение Telegram)
+CHAT_INTERVAL = 1.0
+
+# Предельная длина очереди: лишние уведомления отбрасываются
+MAX_PENDING = 10_000
+
+# Сколько раз пробовать отправить после flood control
+SEND_ATTEMPTS = 3
+
+# ========== ОЧЕРЕДЬ ОТПРАВКИ ==========
+# Фоновые уведомления идут через одну очередь с общим лимитом скорости.
+# Сообщения одного чата лежат в своей очереди, чаты обходятся по кругу,
+# поэтому пользователь с десятком уведомлений не задерживает остальных.
+
+Outgoing = Tuple[str, Dict[str, Any]]
+
+class SendQueue:
+    """
+    Очередь уведомлений с ограничением скорости
+
+    Общий лимит - rate сообщений в секунду, в один чат - не чаще
+    CHAT_INTERVAL. На TelegramRetryAfter очередь ждет указанное время,
+    чат, заблокировавший бота, очищается и передается в on_blocked.
+    """
+
+    def __init__(self, bot: Bot, rate: float = NOTIFY_RATE, chat_interval: float = CHAT_INTERVAL,
+                 max_pending: int = MAX_PENDING,
+                 on_blocked: Optional[Callable[[int], Awaitable[Any]]] = None):
+        self.bot = bot
+        self.interval = 1.0 / rate
+        self.chat_interval = chat_interval
+        self.max_pending = max_pending
+        self.on_blocked = on_blocked
+
+        self._chats: "OrderedDict[int, Deque[Outgoing]]" = OrderedDict()
+        self._chat_ready: Dict[int, float] = {}
+        self._pending = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {'sent': 0, 'failed': 0, 'dropped': 0, 'retry_after': 0, 'blocked': 0}
+
+    def put(self, chat_id: int, text: str, **kwargs: Any) -> bool:
+        """
+        Ставит сообщение в очередь
+
+        Args:
+            chat_id: Чат получателя
+            text: Текст сообщения
+            **kwargs: Параметры send_message (parse_mode, reply_markup...)
+
+        Returns:
+            False, если очередь переполнена и сообщение отброшено
+        """
+        if self._pending >= self.max_pending:
+            self._stats['dropped'] += 1
+            return False
+
+        self._chats.setdefault(chat_id, deque()).append((text, kwargs))
+        self._pending += 1
+        self._wakeup.set()
+        return True
+
+    def _next_chat(self, now: float) -> Tuple[Optional[int], float]:
+        """Первый по кругу чат, в который уже можно писать, или сколько ждать"""
+        wait = self.chat_interval
+        for chat_id in self._chats:
+            ready = self._chat_ready.get(chat_id, 0.0)
+            if ready <= now:
+                return chat_id, 0.0
+            wait = min(wait, ready - now)
+        return None, wait
+
+    async def _wait(self, timeout: Optional[float] = None):
+        """Ждет новых сообщений (или timeout секунд)"""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self):
+        """Цикл отправки (работает, пока задачу не отменят)"""
+        while True:
+            if not self._chats:
+                now = time.monotonic()
+                self._chat_ready = {chat_id: ready for chat_id, ready in self._chat_ready.items() if ready > now}
+                await self._wait()
+                continue
+
+            chat_id, wait = self._next_chat(time.monotonic())
+            if chat_id is None:
+                await self._wait(wait)
+                continue
+
+            # Чат уходит в конец круга
+            messages = self._chats.pop(chat_id)
+            text, kwargs = messages.popleft()
+            self._pending -= 1
+            if messages:
+                self._chats[chat_id] = messages
+
+            await self._send(chat_id, text, kwargs)
+            self._chat_ready[chat_id] = time.monotonic() + self.chat_interval
+            await asyncio.sleep(self.interval)
+
+    async def _send(self, chat_id: int, text: str, kwargs: Dict[str, Any]):
+        """Отправка одного сообщения с повтором после flood control"""
+        for _ in range(SEND_ATTEMPTS):
+            try:
+                await self.bot.send_message(chat_id, text, **kwargs)
+                self._stats['sent'] += 1
+                return
+            except TelegramRetryAfter as e:
+                self._stats['retry_after'] += 1
+                logger.warning(f"Flood control при отправке в {chat_id}, жду {e.retry_after} с")
+                await asyncio.sleep(e.retry_after)
+            except TelegramForbiddenError:
+                self._stats['blocked'] += 1
+                logger.info(f"Пользователь {chat_id} заблокировал бота, уведомления отменены")
+                self._pending -= len(self._chats.pop(chat_id, ()))
+                if self.on_blocked is not None:
+                    await self.on_blocked(chat_id)
+                return
+            except Exception as e:
+                logger.error(f"Ошибка при отправке уведомления в {chat_id}: {e}")
+                break
+
+        self._stats['failed'] += 1
+
+    def start(self) -> asyncio.Task:
+        """Запускает цикл отправки фоновой задачей"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run(), name="send_queue")
+        return self._task
+
+    async def stop(self):
+        """Останавливает цикл отправки (неотправленные сообщения теряются)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Отправлено, ошибки, отброшено, flood control, заблокировали бота, в очереди"""
+        return {**self._stats, 'pending': self._pending, 'chats': len(self._chats)}
+
+# Экспорт
+__all__ = [
+    'SendQueue'
+]
@@ -0,0 +1,115 @@
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message, CallbackQuery
+import logging
+
+from keyboards import make_subscriptions_keyboard, back_kb
+from textformat import format_error_message
+from config import add_subscription, get_user_subscriptions, delete_subscription
+from callbacks import CallbackTable, WatchCallback, UnwatchCallback
+from pagination import get_results
+from subscriptions import Subscription, MAX_SUBSCRIPTIONS_PER_USER
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Создаем роутер для подписок на новые объекты
+subscription_router = Router()
+
+# Таблица маршрутов callback-запросов роутера
+subscription_callbacks = CallbackTable(subscription_router)
+
+# ========== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ==========
+
+async def subscriptions_message(user_id: int):
+    """
+    Текст и клавиатура списка подписок пользователя
+
+    Returns:
+        Кортеж (текст в Markdown, клавиатура)
+    """
+    subscriptions = [Subscription(*row) for row in await get_user_subscriptions(user_id)]
+
+    if not subscriptions:
+        return (
+            "🔔 *У вас нет подписок.*\n\n"
+            "Чтобы следить за новыми объектами, нажмите "
+            "«🔔 Следить за новыми объектами» под результатами поиска.",
+            back_kb
+        )
+
+    text = "🔔 *Ваши подписки:*\n\n"
+    for number, subscription in enumerate(subscriptions, 1):
+        text += f"{number}. {subscription.describe()}\n"
+    text += "\nНовые объекты и снижения цен придут сообщениями."
+
+    keyboard = make_subscriptions_keyboard(
+        [(subscription.id, number) for number, subscription in enumerate(subscriptions, 1)]
+    )
+    return text, keyboard
+
+# ========== ОБРАБОТЧИКИ ==========
+
+@subscription_router.message(Command("subscriptions"))
+async def cmd_subscriptions(message: Message):
+    """
+    Список подписок пользователя
+    """
+    text, keyboard = await subscriptions_message(message.from_user.id)
+    await message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
+
+@subscription_callbacks.data(WatchCallback)
+async def watch_handler(call: CallbackQuery, callback_data: WatchCallback):
+    """
+    Подписка на новые объекты по параметрам выдачи
+    """
+    user_id = call.from_user.id
+
+    try:
+        result = get_results(callback_data.token)
+        if result is None:
+            await call.answer("⌛ Результаты поиска устарели, повторите поиск", show_alert=True)
+            return
+        if result.query is None:
+            await call.answer("❌ На этот поиск нельзя подписаться", show_alert=True)
+            return
+
+        if len(await get_user_subscriptions(user_id)) >= MAX_SUBSCRIPTIONS_PER_USER:
+            await call.answer(
+                f"❌ Не больше {MAX_SUBSCRIPTIONS_PER_USER} подписок. Удалите лишние: /subscriptions",
+                show_alert=True
+            )
+            return
+
+        subscription_id = await add_subscription(user_id, **result.query)
+        logger.info(f"Пользователь {user_id} подписался: {result.query} (ID {subscription_id})")
+
+        await call.answer(
+            "🔔 Подписка оформлена! Новые объекты и снижения цен придут сообщениями.\n\n"
+            "Управление подписками: /subscriptions",
+            show_alert=True
+        )
+
+    except Exception as e:
+        logger.error(f"Ошибка при оформлении подписки: {e}", exc_info=True)
+        await call.message.answer(format_error_message("Не удалось оформить подписку. Попробуйте позже."))
+        await call.answer()
+
+@subscription_callbacks.data(UnwatchCallback)
+async def unwatch_handler(call: CallbackQuery, callback_data: UnwatchCallback):
+    """
+    Отмена подписки из списка
+    """
+    user_id = call.from_user.id
+
+    if await delete_subscription(user_id, callback_data.id):
+        logger.info(f"Пользователь {user_id} отписался (ID {callback_data.id})")
+        await call.answer("✅ Подписка отменена")
+    else:
+        await call.answer("Подписка уже отменена")
+
+    text, keyboard = await subscriptions_message(user_id)
+    await call.message.edit_text(text, reply_markup=keyboard, parse_mode="Markdown")
+
+# Экспорт роутера
+__all__ = ['subscription_router']
@@ -0,0 +1,351 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.types import LinkPreviewOptions
+
+from catalog import SUBCATEGORY_BY_URL, Subcategory, subcategory_by_id
+from config import (
+    SUBSCRIPTION_CHECK_INTERVAL, PRICE_DROP_PERCENT, get_all_subscriptions, get_known_listings,
+    save_known_listings, delete_user_subscriptions, append_price_history, get_price_drops
+)
+from keyboards import make_property_keyboard
+from listing_index import listing_cities, merge_keys
+from models import Property
+from send_queue import SendQueue
+from textformat import (
+    escape_markdown, format_number_with_spaces, format_property_message, format_range, format_price_drops
+)
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Сколько подписок может быть у одного пользователя
+MAX_SUBSCRIPTIONS_PER_USER = 10
+
+# Сколько карточек (новые объекты и изменения цен) отправить пользователю за один проход краулера
+MAX_NOTIFICATIONS_PER_CYCLE = 10
+
+# Сколько снижений цен собирать в одно сообщение
+PRICE_DROP_BATCH = 10
+
+# ========== ПОДПИСКИ ==========
+
+class Subscription(NamedTuple):
+    """Подписка на новые объекты (строка таблицы subscriptions)"""
+    id: int
+    user_id: int
+    city: str
+    subcategory_id: Optional[str]  # None - все подкатегории
+    min_price: Optional[int]
+    max_price: Optional[int]
+    min_area: Optional[float]
+    max_area: Optional[float]
+
+    def matches(self, prop: Property, subcategory: Subcategory) -> bool:
+        """Подходит ли объект со страницы подкатегории под подписку"""
+        if self.subcategory_id is not None and subcategory.id != self.subcategory_id:
+            return False
+        if self.city not in listing_cities(prop):
+            return False
+        return (
+            _in_range(prop.price_rub, self.min_price, self.max_price)
+            and _in_range(prop.area_m2, self.min_area, self.max_area)
+        )
+
+    def describe(self) -> str:
+        """Описание подписки для списка: "Студии, Анапа, цена до 6 000 000 ₽" """
+        subcategory = subcategory_by_id(self.subcategory_id) if self.subcategory_id else None
+        parts = [subcategory.name if subcategory else "Все объекты", self.city]
+        if self.min_price is not None or self.max_price is not None:
+            parts.append("цена " + format_range(self.min_price, self.max_price, "₽"))
+        if self.min_area is not None or self.max_area is not None:
+            parts.append("площадь " + format_range(self.min_area, self.max_area, "м²"))
+        return ", ".join(parts)
+
+def _in_range(value: Optional[float], low: Optional[float], high: Optional[float]) -> bool:
+    """Значение в диапазоне; без ограничений подходит и неизвестное значение"""
+    if low is None and high is None:
+        return True
+    if value is None:
+        return False
+    return (low is None or value >= low) and (high is None or value <= high)
+
+def subscription_pages(subscriptions: Iterable[Subscription]) -> Dict[str, Subcategory]:
+    """Страницы каталога, которые нужно обойти для этих подписок: URL -> подкатегория"""
+    pages = {}
+    for subscription in subscriptions:
+        if subscription.subcategory_id is None:
+            return dict(SUBCATEGORY_BY_URL)
+        subcategory = subcategory_by_id(subscription.subcategory_id)
+        if subcategory is not None:
+            pages[subcategory.url] = subcategory
+    return pages
+
+# ========== ПОИСК ИЗМЕНЕНИЙ ==========
+
+class ListingChange(NamedTuple):
+    """Новый объект или объект с изменившейся ценой"""
+    prop: Property
+    kind: str  # 'new', 'price' или 'drop' (снижение цены больше PRICE_DROP_PERCENT)
+    old_price: Optional[int] = None
+
+def diff_listings(known: Dict[str, Optional[int]], properties: Iterable[Property]) -> List[ListingChange]:
+    """
+    Сравнивает свежую страницу каталога с уже известными объектами
+
+    Args:
+        known: Ссылка -> цена (руб.) объектов, виденных раньше
+        properties: Объекты страницы
+
+    Returns:
+        Новые объекты и объекты, цена которых изменилась
+    """
+    changes = []
+    for prop in properties:
+        if prop.link not in known:
+            changes.append(ListingChange(prop, 'new'))
+            continue
+        old_price = known[prop.link]
+        if prop.price_rub is not None and old_price != prop.price_rub:
+            changes.append(ListingChange(prop, 'price', old_price))
+    return changes
+
+# ========== КРАУЛЕР ==========
+
+_queue: Optional[SendQueue] = None
+_crawler: Optional[asyncio.Task] = None
+_stats = {'cycles': 0, 'pages': 0, 'new': 0, 'price': 0, 'drop': 0, 'notified': 0, 'last_cycle_s': 0.0}
+
+async def _crawl_page(url: str, seen_at: float) -> Tuple[List[ListingChange], bool]:
+    """
+    Загружает страницу, сравнивает с известными объектами, запоминает
+    их и дописывает изменившиеся цены в историю
+
+    Returns:
+        Кортеж (изменения, первый ли это обход страницы)
+    """
+    from parse_cards import fetch_all_properties, INDEX_PAGE_CARDS
+
+    properties = await fetch_all_properties(url, None, INDEX_PAGE_CARDS)
+    if not properties:
+        # Страница не загрузилась - известные объекты не трогаем
+        return [], False
+
+    known = await get_known_listings(url)
+    changes = diff_listings(known, properties)
+    await save_known_listings(url, [(prop.link, prop.price_rub) for prop in properties])
+    await append_price_history(
+        [(change.prop.link, change.prop.price_rub) for change in changes if change.prop.price_rub is not None],
+        seen_at
+    )
+
+    _stats['pages'] += 1
+    return changes, not known
+
+def _subscribers(subscriptions_by_city: Dict[str, List[Subscription]],
+                 prop: Property, subcategory: Subcategory) -> Iterable[int]:
+    """Пользователи, под подписки которых подходит объект"""
+    for city in listing_cities(prop):
+        for subscription in subscriptions_by_city.get(city, ()):
+            if subscription.matches(prop, subcategory):
+                yield subscription.user_id
+
+def format_change_message(change: ListingChange, subcategory: Subcategory) -> str:
+    """Карточка нового объекта или объекта с новой ценой в MarkdownV2"""
+    if change.kind == 'new':
+        header = "🆕 *Новый объект по подписке*"
+    else:
+        header = (
+            "💲 *Цена изменилась:* "
+            + escape_markdown(f"{format_number_with_spaces(change.old_price)} → "
+                              f"{format_number_with_spaces(change.prop.price_rub)} ₽")
+        )
+    return f"{header}\n\n{format_property_message(change.prop, subcategory.name)}"
+
+def notify_subscribers(queue: SendQueue, subscriptions: List[Subscription],
+                       changes: Iterable[Tuple[ListingChange, Subcategory]]) -> int:
+    """
+    Ставит в очередь уведомления подписчикам
+
+    Новые объекты и изменения цен приходят карточками: не больше
+    MAX_NOTIFICATIONS_PER_CYCLE за проход, об остальных - одно сообщение.
+    Снижения цен больше PRICE_DROP_PERCENT собираются в сводки по
+    PRICE_DROP_BATCH объектов. Один объект приходит пользователю один раз,
+    даже если подходит под несколько его подписок или выставлен в
+    нескольких подкатегориях (один ключ listing_index.merge_keys).
+
+    Returns:
+        Количество поставленных в очередь сообщений
+    """
+    subscriptions_by_city: Dict[str, List[Subscription]] = {}
+    for subscription in subscriptions:
+        subscriptions_by_city.setdefault(subscription.city, []).append(subscription)
+
+    changes = list(changes)
+    by_page: Dict[str, List[Property]] = {}
+    for change, subcategory in changes:
+        by_page.setdefault(subcategory.url, []).append(change.prop)
+    keys = merge_keys(by_page.values())
+
+    per_user: Dict[int, Dict[str, Tuple[ListingChange, Subcategory]]] = {}
+    for change, subcategory in changes:
+        for user_id in _subscribers(subscriptions_by_city, change.prop, subcategory):
+            per_user.setdefault(user_id, {}).setdefault(keys[change.prop.link], (change, subcategory))
+
+    queued = 0
+    for user_id, user_changes in per_user.items():
+        cards = [item for item in user_changes.values() if item[0].kind != 'drop']
+        drops = [(change.prop, change.old_price) for change, _ in user_changes.values() if change.kind == 'drop']
+
+        for change, subcategory in cards[:MAX_NOTIFICATIONS_PER_CYCLE]:
+            queued += queue.put(
+                user_id,
+                format_change_message(change, subcategory),
+                parse_mode='MarkdownV2',
+                reply_markup=make_property_keyboard(change.prop.link)
+            )
+
+        skipped = len(cards) - MAX_NOTIFICATIONS_PER_CYCLE
+        if skipped > 0:
+            queued += queue.put(
+                user_id,
+                f"🔔 *И еще {skipped} объектов по вашим подпискам.*\n"
+                "Откройте поиск, чтобы посмотреть все.\n\n"
+                "Управление подписками: /subscriptions",
+                parse_mode='Markdown'
+            )
+
+        for start in range(0, len(drops), PRICE_DROP_BATCH):
+            queued += queue.put(
+                user_id,
+                format_price_drops(drops[start:start + PRICE_DROP_BATCH]),
+                parse_mode='MarkdownV2',
+                link_preview_options=LinkPreviewOptions(is_disabled=True)
+            )
+
+    _stats['notified'] += queued
+    return queued
+
+async def check_subscriptions(queue: SendQueue) -> int:
+    """
+    Один проход краулера: обходит страницы каталога, на которые есть
+    подписки, и рассылает новые объекты, изменения цен и сводки снижений
+
+    Returns:
+        Количество поставленных в очередь уведомлений
+    """
+    from parse_cards import INDEX_REFRESH_CONCURRENCY
+
+    subscriptions = [Subscription(*row) for row in await get_all_subscriptions()]
+    if not subscriptions:
+        return 0
+
+    pages = subscription_pages(subscriptions)
+    semaphore = asyncio.Semaphore(INDEX_REFRESH_CONCURRENCY)
+
+    async def crawl(url: str):
+        async with semaphore:
+            try:
+                return await _crawl_page(url, cycle_start)
+            except Exception as e:
+                logger.error(f"Ошибка при обходе {url} для подписок: {e}", exc_info=True)
+                return [], False
+
+    cycle_start = time.time()
+    results = await asyncio.gather(*(crawl(url) for url in pages))
+
+    # Новые объекты; первый обход страницы только запоминает объекты,
+    # иначе пришли бы уведомления обо всех
+    changes = []
+    repriced: Dict[str, Tuple[ListingChange, Subcategory]] = {}
+    priced: Dict[str, Tuple[Property, Subcategory]] = {}
+    for subcategory, (page_changes, first_visit) in zip(pages.values(), results):
+        for change in page_changes:
+            _stats[change.kind] += 1
+            if change.kind == 'new' and not first_visit:
+                changes.append((change, subcategory))
+            elif change.kind == 'price' and change.old_price is not None:
+                repriced.setdefault(change.prop.link, (change, subcategory))
+            if change.prop.price_rub is not None:
+                priced.setdefault(change.prop.link, (change.prop, subcategory))
+
+    # Снижения цен - одним запросом к истории по всем записям этого прохода;
+    # такие объекты приходят в сводке, а не отдельной карточкой
+    for link, old_price, _ in await get_price_drops(cycle_start, PRICE_DROP_PERCENT):
+        if link in priced:
+            prop, subcategory = priced[link]
+            changes.append((ListingChange(prop, 'drop', old_price), subcategory))
+            repriced.pop(link, None)
+            _stats['drop'] += 1
+
+    # Остальные изменения цен (рост и небольшие снижения) - карточками
+    changes.extend(repriced.values())
+
+    queued = notify_subscribers(queue, subscriptions, changes) if changes else 0
+    logger.info(
+        f"Проверка подписок: {len(subscriptions)} подписок, {len(pages)} страниц, "
+        f"{len(changes)} изменений, {queued} уведомлений"
+    )
+    return queued
+
+async def run_subscription_crawler(queue: SendQueue, interval: float = SUBSCRIPTION_CHECK_INTERVAL):
+    """Проверяет подписки каждые interval секунд (работает, пока задачу не отменят)"""
+    while True:
+        start = time.perf_counter()
+        try:
+            await check_subscriptions(queue)
+        except Exception as e:
+            logger.error(f"Ошибка краулера подписок: {e}", exc_info=True)
+        _stats['cycles'] += 1
+        _stats['last_cycle_s'] = round(time.perf_counter() - start, 2)
+        await asyncio.sleep(interval)
+
+def start_subscription_crawler(bot: Bot):
+    """Запускает очередь уведомлений и краулер подписок"""
+    global _queue, _crawler
+
+    _queue = SendQueue(bot, on_blocked=delete_user_subscriptions)
+    _queue.start()
+    _crawler = asyncio.create_task(run_subscription_crawler(_queue), name="subscription_crawler")
+    logger.info(f"Краулер подписок запущен, интервал {SUBSCRIPTION_CHECK_INTERVAL} с")
+
+async def stop_subscription_crawler():
+    """Останавливает краулер и очередь уведомлений"""
+    global _queue, _crawler
+
+    if _crawler is not None:
+        _crawler.cancel()
+        try:
+            await _crawler
+        except asyncio.CancelledError:
+            pass
+        _crawler = None
+
+    if _queue is not None:
+        await _queue.stop()
+        _queue = None
+
+def subscription_stats() -> Dict[str, Any]:
+    """
+    Статистика краулера подписок
+
+    Returns:
+        Словарь: проходы, обойдено страниц, новые объекты и изменения цен,
+        уведомления, длительность последнего прохода и состояние очереди
+    """
+    return {**_stats, 'queue': _queue.stats() if _queue is not None else None}
+
+# Экспорт
+__all__ = [
+    'MAX_SUBSCRIPTIONS_PER_USER',
+    'Subscription',
+    'ListingChange',
+    'diff_listings',
+    'check_subscriptions',
+    'start_subscription_crawler',
+    'stop_subscription_crawler',
+    'subscription_stats'
+]
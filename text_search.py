@@ -0,0 +1,197 @@
+import heapq
+import math
+import re
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from models import Property
+
+# Доля веса триграмм каждого слова запроса, которая должна найтись в объекте
+MIN_SCORE = 0.5
+
+# Надбавки к оценке: запрос целиком и слова запроса подряд в том же порядке
+PHRASE_BONUS = 1.0
+WORD_ORDER_BONUS = 0.75
+
+# ========== ПОЛНОТЕКСТОВЫЙ ПОИСК ==========
+# Инвертированный индекс: триграмма -> ссылки объектов, в тексте которых
+# она есть. Триграммы заменяют стемминг: "вид на море" находит "видом на
+# море" и "моря", потому что у слов общие начала. Индекс обновляется по
+# одному объекту, без перестроения.
+
+_NON_WORD_RE = re.compile(r'[^0-9a-zа-я]+')
+
+def normalize_text(text: str) -> str:
+    """Нижний регистр, "ё" -> "е", все кроме букв и цифр - пробелы"""
+    return _NON_WORD_RE.sub(' ', text.lower().replace('ё', 'е')).strip()
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Триграммы слов нормализованного текста (с пробелами по краям слова)"""
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+def _word_order_pattern(query_words: List[str]) -> "re.Pattern[str]":
+    """
+    Регулярное выражение для слов запроса подряд и в том же порядке
+    с точностью до окончания: "вид на море" находит "видом на моря"
+    """
+    stems = [re.escape(word[:min(len(word), max(3, len(word) - 2))]) for word in query_words]
+    return re.compile('(?:^| )' + ' '.join(stem + '[0-9a-zа-я]*' for stem in stems))
+
+def searchable_text(prop: Property) -> str:
+    """Нормализованный текст объекта для поиска: название, локация, город, описание"""
+    return normalize_text(" ".join((prop.title, prop.location, prop.city, prop.description)))
+
+class TextIndex:
+    """
+    Триграммный индекс объектов
+
+    Объект может быть на нескольких страницах каталога, поэтому для
+    каждой ссылки хранятся страницы-источники: из индекса объект уходит,
+    когда исчезает со всех. Дубли с разными ссылками склеивает
+    ListingIndex при выдаче.
+    """
+
+    def __init__(self):
+        self.docs: Dict[str, Property] = {}
+        self.texts: Dict[str, str] = {}
+        self.grams: Dict[str, FrozenSet[str]] = {}
+        self.sources: Dict[str, Set[str]] = {}
+        self.postings: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, prop: Property, source: str):
+        """Добавляет объект со страницы source (или обновляет, если текст изменился)"""
+        link = prop.link
+        self.sources.setdefault(link, set()).add(source)
+        self.docs[link] = prop
+
+        text = searchable_text(prop)
+        if self.texts.get(link) == text:
+            return
+
+        self._unindex(link)
+        grams = trigrams(text)
+        self.texts[link] = text
+        self.grams[link] = grams
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(link)
+
+    def discard(self, link: str, source: str):
+        """Убирает объект со страницы source; из индекса - если его больше нет нигде"""
+        sources = self.sources.get(link)
+        if sources is None:
+            return
+        sources.discard(source)
+        if not sources:
+            del self.sources[link]
+            del self.docs[link]
+            self._unindex(link)
+
+    def _unindex(self, link: str):
+        """Убирает триграммы объекта из индекса"""
+        self.texts.pop(link, None)
+        for gram in self.grams.pop(link, ()):
+            links = self.postings.get(gram)
+            if links is not None:
+                links.discard(link)
+                if not links:
+                    del self.postings[gram]
+
+    def search(self, query: str, accept: Optional[Callable[[Property], bool]] = None,
+               limit: Optional[int] = None) -> List[Tuple[Property, float]]:
+        """
+        Ищет объекты по тексту
+
+        Триграммы взвешиваются по IDF, поэтому частые (" на", окончания)
+        почти не влияют на оценку. Каждое слово запроса должно совпасть
+        хотя бы на MIN_SCORE своего веса. К доле совпавшего веса
+        добавляются надбавки, если запрос встречается целиком или его
+        слова стоят подряд в том же порядке.
+
+        Args:
+            query: Текст запроса
+            accept: Фильтр объектов, например по городу (None - все)
+            limit: Сколько объектов вернуть (None - все)
+
+        Returns:
+            Пары (объект, оценка), лучшие первыми
+        """
+        phrase = normalize_text(query)
+        # Однобуквенные предлоги ("в", "у", "с") не обязательны
+        query_words = list(dict.fromkeys(word for word in phrase.split() if len(word) > 1))
+        if not query_words:
+            return []
+
+        # IDF триграммы: log(1 + N / df)
+        total_docs = len(self.docs)
+        idf: Dict[str, float] = {}
+        for gram in trigrams(phrase):
+            postings = self.postings.get(gram)
+            if postings:
+                idf[gram] = math.log(1 + total_docs / len(postings))
+
+        # Вес каждого слова запроса и совпавший вес по объектам
+        word_grams = [trigrams(word) for word in query_words]
+        word_weights = [sum(idf.get(gram, 0.0) for gram in grams) for grams in word_grams]
+        if not all(word_weights):
+            return []
+        matched: Dict[str, List[float]] = {}
+        for index, grams in enumerate(word_grams):
+            for gram in grams:
+                weight = idf.get(gram)
+                if weight is None:
+                    continue
+                for link in self.postings[gram]:
+                    matched.setdefault(link, [0.0] * len(query_words))[index] += weight
+
+        total_weight = sum(word_weights)
+        candidates = sorted(
+            (
+                (sum(weights) / total_weight, link) for link, weights in matched.items()
+                if all(weight >= MIN_SCORE * word_weight for weight, word_weight in zip(weights, word_weights))
+            ),
+            reverse=True
+        )
+
+        # Надбавки проверяются от лучших по весу кандидатов к худшим; когда
+        # даже с надбавкой кандидат не войдет в limit лучших, дальше не смотрим
+        word_order = _word_order_pattern(query_words)
+        results = []
+        best: List[float] = []
+        for coverage, link in candidates:
+            if limit is not None and len(best) >= limit and coverage + PHRASE_BONUS < best[0]:
+                break
+            prop = self.docs[link]
+            if accept is not None and not accept(prop):
+                continue
+            text = self.texts[link]
+            score = coverage
+            if phrase in text:
+                score += PHRASE_BONUS
+            elif word_order.search(text):
+                score += WORD_ORDER_BONUS
+            results.append((prop, score))
+            if limit is not None:
+                if len(best) < limit:
+                    heapq.heappush(best, score)
+                elif score > best[0]:
+                    heapq.heapreplace(best, score)
+
+        results.sort(key=lambda item: (-item[1], item[0].link))
+        return results if limit is None else results[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        """Объектов и триграмм в индексе"""
+        return {'docs': len(self.docs), 'grams': len(self.postings)}
+
+# Экспорт
+__all__ = [
+    'TextIndex',
+    'normalize_text',
+    'trigrams'
+]
@@ -1,4 +1,16 @@
-from typing import Dict, Any
+import functools
+from typing import Dict, Any, List, Optional, Tuple
+
+from models import Property
+
+# Специальные символы MarkdownV2, которые нужно экранировать
+MARKDOWN_ESCAPE_CHARS = r'_*[]()~`>#+-=|{}.!'
+
+# Таблица для str.translate: символ -> символ с обратным слешем
+_MARKDOWN_ESCAPE_TABLE = str.maketrans({char: '\\' + char for char in MARKDOWN_ESCAPE_CHARS})
+
+# Сколько отрисованных карточек хранить (на каждый формат)
+RENDER_CACHE_SIZE = 1024
 
 def escape_markdown(text: str) -> str:
     """
@@ -13,18 +25,7 @@ def escape_markdown(text: str) -> str:
     if not text:
         return ""
     
-    # Специальные символы MarkdownV2, которые нужно экранировать
-    escape_chars = r'_*[]()~`>#+-=|{}.!'
-    
-    # Экранируем каждый специальный символ
-    escaped_text = ''
-    for char in text:
-        if char in escape_chars:
-            escaped_text += '\\' + char
-        else:
-            escaped_text += char
-    
-    return escaped_text
+    return text.translate(_MARKDOWN_ESCAPE_TABLE)
 
 def format_currency(amount: float) -> str:
     """
@@ -50,7 +51,22 @@ def format_currency(amount: float) -> str:
     
     return f"{formatted} ₽"
 
-def format_property_message(property_data: Dict[str, Any], category_name: str = "") -> str:
+def _property_fields(property_data: Property) -> tuple:
+    """
+    Поля карточки, от которых зависит текст сообщения
+    
+    Кортеж служит ключом кеша: карточка с той же ссылкой, но измененной
+    ценой или названием отрисуется заново.
+    """
+    return (
+        property_data.link,
+        property_data.title or 'Без названия',
+        property_data.price or 'Цена не указана',
+        property_data.city or 'Не указан',
+        property_data.location
+    )
+
+def format_property_message(property_data: Property, category_name: str = "") -> str:
     """
     Форматирует сообщение для карточки недвижимости
     
@@ -61,12 +77,12 @@ def format_property_message(property_data: Dict[str, Any], category_name: str =
     Returns:
         Отформатированное сообщение в MarkdownV2
     """
-    # Извлекаем данные
-    title = property_data.get('title', 'Без названия')
-    price = property_data.get('price', 'Цена не указана')
-    city = property_data.get('city', 'Не указан')
-    location = property_data.get('location', '')
-    
+    return _render_property_markdown(*_property_fields(property_data), category_name)
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _render_property_markdown(link: Optional[str], title: str, price: str, city: str,
+                              location: str, category_name: str) -> str:
+    """Отрисовка карточки в MarkdownV2 (кешируется по ссылке и содержимому)"""
     # Экранируем специальные символы
     escaped_title = escape_markdown(title)
     escaped_price = escape_markdown(price)
@@ -91,7 +107,6 @@ def format_property_message(property_data: Dict[str, Any], category_name: str =
     message += f"\n\n💰 *{escaped_price}*"
     
     # Добавляем ссылку, если есть
-    link = property_data.get('link')
     if link:
         # В MarkdownV2 ссылки требуют двойного экранирования скобок
         escaped_link = link.replace('(', '\\(').replace(')', '\\)')
@@ -99,7 +114,7 @@ def format_property_message(property_data: Dict[str, Any], category_name: str =
     
     return message
 
-def format_property_message_html(property_data: Dict[str, Any], category_name: str = "") -> str:
+def format_property_message_html(property_data: Property, category_name: str = "") -> str:
     """
     Форматирует сообщение для карточки недвижимости с HTML
     
@@ -110,11 +125,12 @@ def format_property_message_html(property_data: Dict[str, Any], category_name: s
     Returns:
         Отформатированное сообщение в HTML
     """
-    title = property_data.get('title', 'Без названия')
-    price = property_data.get('price', 'Цена не указана')
-    city = property_data.get('city', 'Не указан')
-    location = property_data.get('location', '')
-    
+    return _render_property_html(*_property_fields(property_data), category_name)
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _render_property_html(link: Optional[str], title: str, price: str, city: str,
+                          location: str, category_name: str) -> str:
+    """Отрисовка карточки в HTML (кешируется по ссылке и содержимому)"""
     # Формируем сообщение
     message = f"<b>📍 {city}</b>"
     
@@ -127,12 +143,31 @@ def format_property_message_html(property_data: Dict[str, Any], category_name: s
     message += f"\n\n🏠 <b>{title}</b>"
     message += f"\n\n💰 <b>{price}</b>"
     
-    link = property_data.get('link')
     if link:
         message += f"\n\n🔗 <a href='{link}'>Подробнее на сайте</a>"
     
     return message
 
+def render_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Статистика кеша отрисованных карточек
+    
+    Returns:
+        Словарь: формат -> попадания, промахи, размер и доля попаданий (%)
+    """
+    stats = {}
+    for name, render in (('markdown', _render_property_markdown), ('html', _render_property_html)):
+        info = render.cache_info()
+        total = info.hits + info.misses
+        stats[name] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'maxsize': info.maxsize,
+            'hit_rate': round(info.hits / total * 100, 1) if total else 0.0
+        }
+    return stats
+
 def format_mortgage_result(result: Dict[str, Any]) -> str:
     """
     Форматирует результат расчета ипотеки
@@ -192,7 +227,10 @@ def format_mortgage_result(result: Dict[str, Any]) -> str:
     
     # Дополнительная информация
     if 'effective_rate' in result:
-        message += f"\n📊 *Эффективная ставка:* {result['effective_rate']}%\n"
+        message += f"\n📊 *Эффективная ставка (ПСК):* {result['effective_rate']}%"
+        if result.get('insurance_percent'):
+            message += f" (со страховкой {result['insurance_percent']}%)"
+        message += "\n"
     
     if 'available_payment' in result:
         message += f"\n💼 *Доступный платеж:* {format_currency(result['available_payment'])}/мес\n"
@@ -202,7 +240,7 @@ def format_mortgage_result(result: Dict[str, Any]) -> str:
     
     return message
 
-def format_short_property_info(property_data: Dict[str, Any]) -> str:
+def format_short_property_info(property_data: Property) -> str:
     """
     Короткий формат для карточки недвижимости
     
@@ -212,11 +250,7 @@ def format_short_property_info(property_data: Dict[str, Any]) -> str:
     Returns:
         Краткое описание
     """
-    title = property_data.get('title', '')[:50]
-    price = property_data.get('price', '')
-    city = property_data.get('city', '')
-    
-    return f"{city} | {title} | {price}"
+    return f"{property_data.city} | {property_data.title[:50]} | {property_data.price}"
 
 def format_city_selection(city_name: str) -> str:
     """
@@ -266,16 +300,66 @@ def format_number_with_spaces(number: float) -> str:
     """
     return f"{number:,.0f}".replace(",", " ")
 
+def format_range(low: Optional[float], high: Optional[float], unit: str) -> str:
+    """
+    Форматирует диапазон фильтра: "от 3 000 000 до 6 000 000 ₽" или "любая"
+    
+    Args:
+        low: Нижняя граница (None - без ограничения)
+        high: Верхняя граница (None - без ограничения)
+        unit: Единица измерения
+        
+    Returns:
+        Отформатированная строка
+    """
+    if low is None and high is None:
+        return "любая"
+    parts = []
+    if low is not None:
+        parts.append(f"от {format_number_with_spaces(low)}")
+    if high is not None:
+        parts.append(f"до {format_number_with_spaces(high)}")
+    return " ".join(parts) + f" {unit}"
+
+def format_price_drops(drops: List[Tuple[Property, int]]) -> str:
+    """
+    Форматирует сводку снижений цен для уведомления
+    
+    Args:
+        drops: Пары (объект, прежняя цена в рублях)
+        
+    Returns:
+        Отформатированное сообщение в MarkdownV2
+    """
+    message = "📉 *Снижение цен по вашим подпискам*\n"
+    
+    for number, (prop, old_price) in enumerate(drops, 1):
+        percent = (old_price - prop.price_rub) / old_price * 100
+        link = prop.link.replace('\\', '\\\\').replace(')', '\\)')
+        message += (
+            f"\n{number}\\. [{escape_markdown(prop.title)}]({link})\n"
+            + escape_markdown(
+                f"   {format_number_with_spaces(old_price)} → {format_number_with_spaces(prop.price_rub)} ₽ "
+                f"(−{percent:.0f}%), {prop.city}"
+            )
+            + "\n"
+        )
+    
+    return message
+
 # Экспорт функций
 __all__ = [
     'escape_markdown',
     'format_currency',
     'format_property_message',
     'format_property_message_html',
+    'render_cache_stats',
     'format_mortgage_result',
     'format_short_property_info',
     'format_city_selection',
     'format_error_message',
     'format_success_message',
-    'format_number_with_spaces'
+    'format_number_with_spaces',
+    'format_range',
+    'format_price_drops'
 ]
\ No newline at end of file